@@ -4,7 +4,10 @@ __all__ = [
     "Lock",
     "Semaphore",
     "RLock",
-    "cmp_to_key"
+    "cmp_to_key",
+    "numpy",
+    "pickle",
+    "replace"
 ]
 
 try:
@@ -107,3 +110,36 @@ except ImportError:
                 raise TypeError('hash not implemented')
 
         return K
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:  # Python 2.x
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    from os import replace
+except ImportError:  # Python 2.x
+    if sys.platform == "win32":
+        import ctypes
+
+        _MOVEFILE_REPLACE_EXISTING = 0x1
+        _MOVEFILE_WRITE_THROUGH = 0x8
+
+        def replace(src, dst):
+            """ os.rename() fails on Windows if `dst` exists
+            so MoveFileEx() is used to replace it instead. """
+            encoding = sys.getfilesystemencoding()
+            if isinstance(src, bytes):
+                src = src.decode(encoding)
+            if isinstance(dst, bytes):
+                dst = dst.decode(encoding)
+            if not ctypes.windll.kernel32.MoveFileExW(src, dst, _MOVEFILE_REPLACE_EXISTING |
+                                                      _MOVEFILE_WRITE_THROUGH):
+                raise ctypes.WinError()
+    else:
+        from os import rename as replace
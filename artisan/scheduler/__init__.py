@@ -1,13 +1,28 @@
+from .autoscaler import Autoscaler
+from .dispatcher import Dispatcher, DispatcherMetrics
+from .durable_job_queue import DurableJobQueue
 from .job import Job, JobStatus
-from .job_queue import JobQueue, PriorityRule
+from .job_queue import JobQueue
 from .label import Label, LabelExpr, string_to_label_expr
+from .label_index import LabelIndex
+from .label_registry import LabelRegistry
+from .priority import BatchPriorityRule, PriorityRule
+from .sharded_job_queue import ShardedJobQueue
 
 __all__ = [
+    "Autoscaler",
+    "Dispatcher",
+    "DispatcherMetrics",
+    "DurableJobQueue",
     "Job",
     "JobQueue",
     "JobStatus",
+    "BatchPriorityRule",
     "PriorityRule",
+    "ShardedJobQueue",
     "Label",
     "LabelExpr",
+    "LabelIndex",
+    "LabelRegistry",
     "string_to_label_expr"
 ]
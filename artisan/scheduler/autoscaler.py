@@ -0,0 +1,125 @@
+""" Autoscaler that resizes a WorkerPool between a floor and a
+ceiling based on the depth of a JobQueue and how many of the
+pool's workers are in use. """
+import math
+import threading
+from ..compat import monotonic
+
+__all__ = [
+    "Autoscaler"
+]
+
+
+class Autoscaler(object):
+    """ Every `interval` seconds compares the Jobs waiting in `queue`,
+    the workers that threads are waiting to acquire from `pool` and
+    the workers in use in `pool` to the pool's `max_workers`.
+
+    The pool grows straight to the number of workers needed to run
+    every waiting Job, up to `max_workers`, once Jobs are waiting and
+    at least `scale_up_utilization` of the workers are in use. It only
+    shrinks when the queue is empty, fewer than `scale_down_utilization`
+    of the workers are in use and the pool hasn't been resized for
+    `cooldown` seconds. Shrinking leaves room for the workers in use to
+    stay below `scale_up_utilization` and never goes below `min_workers`.
+    Keeping the two thresholds apart stops the pool from flapping. """
+    def __init__(self, queue, pool, min_workers, max_workers,
+                 scale_up_utilization=0.8, scale_down_utilization=0.4,
+                 cooldown=60.0, interval=1.0):
+        if min_workers < 0:
+            raise ValueError("min_workers must not be negative.")
+        if max_workers < max(1, min_workers):
+            raise ValueError("max_workers must be at least one and at least min_workers.")
+        if not 0.0 < scale_up_utilization <= 1.0:
+            raise ValueError("scale_up_utilization must be above 0.0 and at most 1.0.")
+        if not 0.0 <= scale_down_utilization < scale_up_utilization:
+            raise ValueError("scale_down_utilization must be below scale_up_utilization.")
+        if cooldown < 0.0 or interval <= 0.0:
+            raise ValueError("cooldown must not be negative and interval must be positive.")
+        self._queue = queue
+        self._pool = pool
+        self._min_workers = min_workers
+        self._max_workers = max_workers
+        self._scale_up_utilization = scale_up_utilization
+        self._scale_down_utilization = scale_down_utilization
+        self._cooldown = cooldown
+        self._interval = interval
+        self._last_resize_time = None
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def min_workers(self):
+        return self._min_workers
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    @property
+    def running(self):
+        with self._lock:
+            return self._thread is not None
+
+    def start(self):
+        """ Starts the thread that resizes the pool every `interval` seconds. """
+        with self._lock:
+            if self._thread is not None:
+                raise ValueError("Autoscaler is already running.")
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._autoscale)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stops resizing the pool. Returns True if the thread has stopped. """
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return True
+        self._stopped.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            return False
+        with self._lock:
+            if self._thread is thread:
+                self._thread = None
+        return True
+
+    def _autoscale(self):
+        while not self._stopped.is_set():
+            self.scale()
+            self._stopped.wait(self._interval)
+
+    def scale(self):
+        """ Resizes the pool once if it needs to grow or shrink
+        and returns the pool's `max_workers` afterwards. """
+        current = self._pool.max_workers
+
+        # Jobs are popped before a worker is acquired for them so Jobs
+        # waiting in the pool count the same as Jobs waiting in the queue.
+        waiting = self._queue.size + self._pool.workers_waiting
+        target = self._target_workers(current, waiting, self._pool.workers_used)
+        if target != current:
+            self._pool.resize(target)
+            self._last_resize_time = monotonic()
+        return target
+
+    def _target_workers(self, current, waiting, used):
+        # Resizing the pool from outside is corrected right away.
+        if current < self._min_workers:
+            return self._min_workers
+        if current > self._max_workers:
+            return self._max_workers
+
+        if waiting and used >= current * self._scale_up_utilization:
+            return max(current, min(self._max_workers, used + waiting))
+
+        if (not waiting and used < current * self._scale_down_utilization and
+                (self._last_resize_time is None or
+                 monotonic() - self._last_resize_time >= self._cooldown)):
+            needed = int(math.ceil(used / self._scale_up_utilization))
+            return max(self._min_workers, needed)
+        return current
@@ -0,0 +1,260 @@
+""" Dispatcher that drains a JobQueue by running each Job
+on a Worker acquired from a WorkerPool. """
+import threading
+from collections import namedtuple
+from .job import JobStatus
+from .label import LabelExpr, string_to_label_expr
+from ..compat import monotonic
+from ..exceptions import JobFailureException
+
+__all__ = [
+    "Dispatcher",
+    "DispatcherMetrics"
+]
+
+
+DispatcherMetrics = namedtuple("DispatcherMetrics", ["jobs_active",
+                                                     "jobs_succeeded",
+                                                     "jobs_unstable",
+                                                     "jobs_failed",
+                                                     "total_queue_time",
+                                                     "max_queue_time",
+                                                     "total_acquire_time",
+                                                     "max_acquire_time",
+                                                     "total_run_time",
+                                                     "max_run_time"])
+
+
+class Dispatcher(object):
+    """ Runs `concurrency` threads which each block popping a Job
+    from `queue`, block acquiring a Worker from `pool`, run the Job
+    on that Worker, and release the Worker back into the pool.
+
+    Jobs with a `label_expr` are given an idle Worker that matches it
+    if there is one. If the Worker they're given doesn't match, the
+    Worker is released and the Job is pushed into the queue again once
+    a matching Worker is idle or after `retry_interval` seconds. A Job
+    fails with JobFailureException once it has been given
+    `match_attempts` Workers that don't match, and a Job fails if
+    acquiring a Worker for it raises. Times are measured
+    in seconds: the queue time is from when the Job was pushed until it
+    was popped, and the acquire time is spent waiting for a Worker.
+
+    If `slots` is True Jobs are run with slots acquired by
+    `WorkerPool.acquire_slot()` for their `cost` so that Jobs
+    share Workers instead of each having a Worker to itself. """
+    def __init__(self, queue, pool, concurrency=1, slots=False,
+                 retry_interval=1.0, match_attempts=3):
+        if concurrency < 1:
+            raise ValueError("Dispatcher must have a concurrency of at least one.")
+        if match_attempts < 1:
+            raise ValueError("Dispatcher must have at least one match attempt.")
+        self._queue = queue
+        self._pool = pool
+        self._concurrency = concurrency
+        self._slots = slots
+        self._retry_interval = retry_interval
+        self._match_attempts = match_attempts
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+
+        # Jobs waiting for a matching Worker as (Job, LabelExpr,
+        # deferred time) and the number of Workers each Job was
+        # given that didn't match keyed by the Job's id().
+        self._deferred = []
+        self._attempts = {}
+
+        self._jobs_active = 0
+        self._jobs_finished = {JobStatus.SUCCESS: 0,
+                               JobStatus.UNSTABLE: 0,
+                               JobStatus.FAILURE: 0}
+        self._total_queue_time = 0.0
+        self._max_queue_time = 0.0
+        self._total_acquire_time = 0.0
+        self._max_acquire_time = 0.0
+        self._total_run_time = 0.0
+        self._max_run_time = 0.0
+
+    @property
+    def concurrency(self):
+        return self._concurrency
+
+    @property
+    def running(self):
+        with self._lock:
+            return bool(self._threads)
+
+    @property
+    def metrics(self):
+        """ Snapshot of how many Jobs have been run and how long they
+        spent waiting in the queue, waiting for a Worker and running. """
+        with self._lock:
+            return DispatcherMetrics(self._jobs_active,
+                                     self._jobs_finished[JobStatus.SUCCESS],
+                                     self._jobs_finished[JobStatus.UNSTABLE],
+                                     self._jobs_finished[JobStatus.FAILURE],
+                                     self._total_queue_time,
+                                     self._max_queue_time,
+                                     self._total_acquire_time,
+                                     self._max_acquire_time,
+                                     self._total_run_time,
+                                     self._max_run_time)
+
+    def start(self):
+        """ Starts the threads that dispatch Jobs. """
+        with self._lock:
+            if self._threads:
+                raise ValueError("Dispatcher is already running.")
+            self._stopping = False
+            self._threads = [threading.Thread(target=self._dispatch_jobs)
+                             for _ in range(self._concurrency)]
+            for thread in self._threads:
+                thread.daemon = True
+                thread.start()
+
+    def stop(self, timeout=None):
+        """ Stops popping Jobs from the queue and waits up to
+        `timeout` seconds for Jobs that are running to finish.
+        Returns True if every thread has stopped. """
+        with self._lock:
+            self._stopping = True
+            threads = self._threads
+        end_time = None if timeout is None else monotonic() + timeout
+        for thread in threads:
+            while thread.is_alive():
+                # A thread may check whether the Dispatcher is stopping
+                # right before it starts waiting so wake it until it stops.
+                self._queue.wakeup()
+                if end_time is None:
+                    thread.join(0.1)
+                else:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0.0:
+                        return False
+                    thread.join(min(remaining, 0.1))
+        with self._lock:
+            if self._threads is threads:
+                self._threads = []
+        self._push_deferred(force=True)
+        return True
+
+    def _dispatch_jobs(self):
+        while not self._stopping:
+            self._push_deferred()
+            with self._lock:
+                timeout = self._retry_interval if self._deferred else None
+            job = self._queue.pop_job(block=True, timeout=timeout)
+            if job is not None:
+                self._dispatch_job(job)
+
+    def _push_deferred(self, force=False):
+        """ Pushes Jobs into the queue again that were deferred for
+        `retry_interval` seconds or that match an idle Worker, or
+        every Job if `force`. """
+        with self._lock:
+            if not self._deferred:
+                return
+            retry_time = None if force else monotonic() - self._retry_interval
+            jobs = []
+            deferred = []
+            for job, label_expr, deferred_time in self._deferred:
+                if (retry_time is None or deferred_time <= retry_time or
+                        self._pool.find_idle_workers(label_expr)):
+                    jobs.append(job)
+                else:
+                    deferred.append((job, label_expr, deferred_time))
+            self._deferred = deferred
+            if force:
+                for job in jobs:
+                    self._attempts.pop(id(job), None)
+        if jobs:
+            self._queue.push_jobs(jobs)
+
+    def _defer_job(self, job, label_expr):
+        """ Defers a Job that was given a Worker which doesn't match
+        `label_expr`. Returns False if the Job has no attempts left. """
+        with self._lock:
+            attempts = self._attempts.get(id(job), 0) + 1
+            if attempts >= self._match_attempts:
+                self._attempts.pop(id(job), None)
+                return False
+            self._attempts[id(job)] = attempts
+            self._deferred.append((job, label_expr, monotonic()))
+            return True
+
+    def _dispatch_job(self, job):
+        pop_time = monotonic()
+        queue_time = 0.0 if job.queued_time is None else max(0.0, pop_time - job.queued_time)
+        with self._lock:
+            self._jobs_active += 1
+
+        cost = job.cost
+        label_expr = job.label_expr
+        try:
+            if label_expr is not None and not isinstance(label_expr, LabelExpr):
+                label_expr = string_to_label_expr(label_expr)
+            if self._slots:
+                worker = self._pool.acquire_slot(cost, label_expr=label_expr)
+            else:
+                worker = self._pool.acquire(label_expr=label_expr)
+        except Exception as e:
+            job.exception = e
+            self._finish_job(job, JobStatus.FAILURE, queue_time, monotonic() - pop_time, 0.0)
+            return
+        run_time = monotonic()
+        acquire_time = run_time - pop_time
+
+        status = None
+        try:
+            if label_expr is not None and not label_expr.compile()(worker.labels):
+                # Wait for a matching Worker to be released or created.
+                if not self._defer_job(job, label_expr):
+                    raise JobFailureException("No Worker matches %s." % label_expr)
+            else:
+                with self._lock:
+                    self._attempts.pop(id(job), None)
+                job.exception = None
+                job._set_status(JobStatus.ACTIVE)
+                status = job.run(worker)
+                if not isinstance(status, JobStatus) or status not in self._jobs_finished:
+                    status = JobStatus.SUCCESS
+        except Exception as e:
+            job.exception = e
+            status = JobStatus.FAILURE
+        finally:
+            run_time = monotonic() - run_time
+            self._release(worker, cost)
+
+        if status is None:
+            with self._lock:
+                self._jobs_active -= 1
+            return
+        self._finish_job(job, status, queue_time, acquire_time, run_time)
+
+        # The released Worker may match a deferred Job.
+        self._push_deferred()
+
+    def _release(self, worker, cost):
+        """ Releases a Worker into the pool. Errors from cleanup
+        steps are ignored as the pool closes the Worker and they
+        have nowhere to be raised to from a dispatch thread. """
+        try:
+            if self._slots:
+                self._pool.release_slot(worker, cost)
+            else:
+                self._pool.release(worker)
+        except Exception:
+            pass
+
+    def _finish_job(self, job, status, queue_time, acquire_time, run_time):
+        job._set_status(status)
+        with self._lock:
+            self._jobs_active -= 1
+            self._jobs_finished[status] += 1
+            self._total_queue_time += queue_time
+            self._max_queue_time = max(self._max_queue_time, queue_time)
+            self._total_acquire_time += acquire_time
+            self._max_acquire_time = max(self._max_acquire_time, acquire_time)
+            self._total_run_time += run_time
+            self._max_run_time = max(self._max_run_time, run_time)
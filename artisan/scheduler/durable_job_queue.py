@@ -0,0 +1,303 @@
+""" JobQueue that records every push and pop in a write-ahead
+log on disk so that pending Jobs survive a restart of the
+process that owns the queue. """
+import itertools
+import os
+import struct
+import threading
+import zlib
+from .job_queue import JobQueue
+from ..compat import monotonic, pickle, replace
+
+__all__ = [
+    "DurableJobQueue"
+]
+
+_LOG_MAGIC = b"ARTISAN-WAL-1\n"
+_RECORD_HEADER = struct.Struct("<BQII")
+_RECORD_PUSH = 1
+_RECORD_POP = 2
+
+# Pops don't wait for the log to be written so their
+# records are written once this many bytes are buffered.
+_MAX_BUFFERED_BYTES = 64 * 1024
+
+
+def _encode_record(record_type, sequence, payload=b""):
+    """ Encodes a record as a header containing the type, sequence
+    number, length and checksum followed by the payload. """
+    crc = zlib.crc32(payload, zlib.crc32(struct.pack("<BQ", record_type, sequence)))
+    return _RECORD_HEADER.pack(record_type, sequence, len(payload), crc & 0xffffffff) + payload
+
+
+def _recover_log(path):
+    """ Reads every valid record in the log in one pass. Returns
+    the payloads of Jobs that were pushed and never popped keyed
+    by their sequence number, the next sequence number to use,
+    the number of valid records, and the offset of the end of
+    the last valid record. A record that is incomplete or fails
+    its checksum ends the log as it was never fully written. """
+    jobs = {}
+    next_sequence = 0
+    records = 0
+    if not os.path.exists(path):
+        return jobs, next_sequence, records, 0
+
+    with open(path, "rb") as f:
+        magic = f.read(len(_LOG_MAGIC))
+        if magic != _LOG_MAGIC:
+            if _LOG_MAGIC.startswith(magic):
+                return jobs, next_sequence, records, 0
+            raise ValueError("`%s` is not a JobQueue write-ahead log." % path)
+        offset = len(_LOG_MAGIC)
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                break
+            record_type, sequence, length, crc = _RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                break
+            if _encode_record(record_type, sequence, payload)[:_RECORD_HEADER.size] != header:
+                break
+            if record_type == _RECORD_PUSH:
+                jobs[sequence] = payload
+            elif record_type == _RECORD_POP:
+                jobs.pop(sequence, None)
+            else:
+                break
+            next_sequence = max(next_sequence, sequence + 1)
+            records += 1
+            offset += _RECORD_HEADER.size + length
+
+    return jobs, next_sequence, records, offset
+
+
+def _fsync_directory(path):
+    """ Syncs the directory containing `path` so that
+    a rename within the directory is durable. """
+    if not hasattr(os, "O_DIRECTORY"):  # Platform-specific: Windows
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _WriteAheadLog(object):
+    """ Append-only log where records are buffered in memory and
+    written by whichever thread first needs them to be durable.
+    Every thread waiting at the same time shares that write and
+    fsync rather than each doing their own. """
+    def __init__(self, path, offset, fsync=True):
+        self._path = path
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+        self._failed = False
+
+        self._file = open(path, "ab")
+        if offset == 0:
+            self._file.truncate(0)
+            self._file.write(_LOG_MAGIC)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        elif self._file.tell() != offset:
+            # Remove a record that wasn't completely written.
+            self._file.truncate(offset)
+
+    @property
+    def buffered_bytes(self):
+        return self._buffered_bytes
+
+    def append(self, data):
+        """ Adds data to the log without waiting for it to be written. """
+        with self._lock:
+            self._buffer.append(data)
+            self._buffered_bytes += len(data)
+            self._appended += 1
+
+    def sync(self):
+        """ Waits until everything appended so far has been
+        written to the log, and synced to disk if `fsync` is set. """
+        with self._lock:
+            target = self._appended
+            while self._synced < target:
+                if self._failed:
+                    raise IOError("Writing to the write-ahead log `%s` failed." % self._path)
+                if self._syncing:
+                    self._written.wait()
+                    continue
+
+                # Become the thread that writes everything
+                # that has been appended up to this point.
+                self._syncing = True
+                buffer = self._buffer
+                appended = self._appended
+                self._buffer = []
+                self._buffered_bytes = 0
+                self._lock.release()
+                try:
+                    self._file.write(b"".join(buffer))
+                    self._file.flush()
+                    if self._fsync:
+                        os.fsync(self._file.fileno())
+                except Exception:
+                    # The records that were buffered are lost so
+                    # nothing after them can be written either.
+                    self._failed = True
+                    raise
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                    self._written.notify_all()
+                self._synced = appended
+
+    def rewrite(self, data):
+        """ Replaces the entire log with `data` which
+        must describe everything appended so far. """
+        with self._lock:
+            while self._syncing:
+                self._written.wait()
+            compact_path = self._path + ".compact"
+            try:
+                with open(compact_path, "wb") as f:
+                    f.write(_LOG_MAGIC)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # Windows can't replace a file that's open.
+                self._file.close()
+                try:
+                    replace(compact_path, self._path)
+                finally:
+                    self._file = open(self._path, "ab")
+            except EnvironmentError:
+                # The old log is still complete and stays in use.
+                _remove(compact_path)
+                raise
+            _fsync_directory(self._path)
+            self._buffer = []
+            self._buffered_bytes = 0
+            self._synced = self._appended
+            self._written.notify_all()
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+
+class DurableJobQueue(JobQueue):
+    """ JobQueue that records every push and pop in a write-ahead
+    log at `path` and recovers pending Jobs from it when created.
+    Jobs must be picklable.
+
+    Pushes wait until their record is written, and synced to disk
+    if `sync` is True. Threads pushing at the same time share one
+    write and fsync. Pops are written along with later pushes so
+    a Job popped right before a crash may be recovered again.
+
+    The log is compacted to only contain pending Jobs once it has
+    `compact_records` more records than there are pending Jobs.
+    Compaction happens after a pop has been recorded and if it fails
+    the log is left as it was and compacted again later. """
+    def __init__(self, path, sync=True, compact_records=10000):
+        super(DurableJobQueue, self).__init__()
+        self._path = path
+        self._compact_records = compact_records
+
+        jobs, next_sequence, records, offset = _recover_log(path)
+        self._log_records = records
+        self._next_compact_records = 0
+
+        # Sorted by sequence number with no rules means
+        # the entries are already in heap order.
+        self._heap = [(-0.0, sequence, pickle.loads(jobs[sequence]), [])
+                      for sequence in sorted(jobs)]
+
+        # Monotonic times from another process are meaningless
+        # so recovered Jobs are treated as if just pushed.
+        queued_time = monotonic()
+        for entry in self._heap:
+            entry[2].queued_time = queued_time
+        self._counter = itertools.count(next_sequence)
+        self._wal = _WriteAheadLog(path, offset, fsync=sync)
+
+    @property
+    def path(self):
+        return self._path
+
+    def push_job(self, job):
+        super(DurableJobQueue, self).push_job(job)
+        self._wal.sync()
+
+    def push_jobs(self, jobs):
+        super(DurableJobQueue, self).push_jobs(jobs)
+        self._wal.sync()
+
+    def pop_job(self, block=False, timeout=None):
+        job = super(DurableJobQueue, self).pop_job(block, timeout)
+        self._after_pop()
+        return job
+
+    def pop_jobs(self, count, block=False, timeout=None):
+        jobs = super(DurableJobQueue, self).pop_jobs(count, block, timeout)
+        self._after_pop()
+        return jobs
+
+    def _after_pop(self):
+        with self._lock:
+            compact = self._log_records - len(self._heap) >= self._compact_records and \
+                self._log_records >= self._next_compact_records
+        if compact:
+            try:
+                self.compact()
+            except EnvironmentError:
+                # Popped Jobs have been removed from the queue
+                # so try again after as many records again.
+                with self._lock:
+                    self._next_compact_records = self._log_records + self._compact_records
+        if self._wal.buffered_bytes >= _MAX_BUFFERED_BYTES:
+            self._wal.sync()
+
+    def flush(self):
+        """ Waits until every push and pop has been written to the log. """
+        self._wal.sync()
+
+    def compact(self):
+        """ Rewrites the log to only contain the Jobs
+        that are currently pending in the queue. """
+        with self._lock:
+            self._wal.rewrite(b"".join(self._encode_push(entry) for entry in self._heap))
+            self._log_records = len(self._heap)
+
+    def close(self):
+        """ Writes any buffered records and closes the log. """
+        self._wal.close()
+
+    def _encode_push(self, entry):
+        return _encode_record(_RECORD_PUSH, entry[1],
+                              pickle.dumps(entry[2], pickle.HIGHEST_PROTOCOL))
+
+    def _on_push(self, entries):
+        self._wal.append(b"".join(self._encode_push(entry) for entry in entries))
+        self._log_records += len(entries)
+
+    def _on_pop(self, entries):
+        self._wal.append(b"".join(_encode_record(_RECORD_POP, entry[1]) for entry in entries))
+        self._log_records += len(entries)
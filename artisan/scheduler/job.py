@@ -19,7 +19,40 @@ class Job(object):
         self._status = JobStatus.SCHEDULED
         self._lock = threading.Lock()
 
+        # LabelExpr that a Worker must match to run the Job.
+        self.label_expr = None
+
+        # Slots of a Worker the Job uses while it runs.
+        self.cost = 1
+
+        # Monotonic time the Job was last pushed into a JobQueue.
+        self.queued_time = None
+
+        # Exception raised by the last run of the Job.
+        self.exception = None
+
     @property
     def status(self):
         with self._lock:
             return self._status
+
+    def _set_status(self, status):
+        with self._lock:
+            self._status = status
+
+    def run(self, worker):
+        """ Runs the Job on a Worker that was acquired for it by
+        a Dispatcher. May return a JobStatus, otherwise the Job
+        is a success. Raising an exception fails the Job. """
+        raise NotImplementedError()
+
+    def __getstate__(self):
+        # Locks can't be pickled so a new one is
+        # created when the Job is unpickled.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
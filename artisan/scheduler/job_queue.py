@@ -1,95 +1,236 @@
-import random
+import heapq
+import itertools
+import math
 import threading
-from .priority import PriorityRule
-from ..compat import cmp_to_key
+from .priority import BatchPriorityRule, PriorityRule
+from ..compat import monotonic, numpy
 
 __all__ = [
     "JobQueue"
 ]
 
 
-def _random_cmp(a, b):
-    """ Similar to a regular compare except
-    that on equality will return a random
-    choice rather than a 0. """
-    if a > b:
-        return 1
-    elif b > a:
-        return -1
-    else:
-        return random.choice([-1, 1])
+def _sum_priority(scores):
+    """ Sums the scores of each PriorityRule for a Job
+    in the same order that they were added to the queue
+    so the total is identical however it was reached. """
+    priority = 0.0
+    for score in scores:
+        priority += score
+    return priority
+
+
+def _score_jobs(rules, jobs):
+    """ Scores each Job against each PriorityRule one
+    rule at a time. Returns a list of the total priority
+    and a list of the scores from each rule for each Job. """
+    if not rules:
+        return [0.0] * len(jobs), [[] for _ in jobs]
+    rule_scores = [rule.get_priorities(jobs) for rule in rules]
+    if numpy is not None:
+        rule_scores = [numpy.asarray(scores, dtype=numpy.float64) for scores in rule_scores]
+        totals = numpy.zeros(len(jobs), dtype=numpy.float64)
+        for scores in rule_scores:
+            totals += scores
+        return totals.tolist(), numpy.column_stack(rule_scores).tolist()
+    job_scores = [list(scores) for scores in zip(*rule_scores)]
+    return [_sum_priority(scores) for scores in job_scores], job_scores
 
 
 class JobQueue(object):
     def __init__(self):
         self._lock = threading.RLock()
-        self._job_queue = []
-        self._job_priority = []
+        self._not_empty = threading.Condition(self._lock)
+        self._peek_waiters = 0
+        self._wakeups = 0
+        self._counter = itertools.count()
+        self._heap = []
         self._priority_rules = []
 
     def push_job(self, job):
         """ Pushes a Job into the queue. """
+        job.queued_time = monotonic()
         with self._lock:
-            priority = 0.0
-            for rule in self._priority_rules:
-                priority += rule.get_priority(job)
-            job_len = len(self._job_priority)
-            if not job_len:
-                self._job_priority.append(priority)
-                self._job_queue.append(job)
+            scores = [rule.get_priority(job) for rule in self._priority_rules]
+
+            # Entries are ordered by negated priority so that the highest
+            # priority is at the top of the heap and by a sequence number
+            # so that Jobs with equal priority are popped in FIFO order.
+            # The score from each rule is cached with the entry so that
+            # changing the rules doesn't require evaluating every rule again.
+            entry = (-_sum_priority(scores), next(self._counter), job, scores)
+            self._on_push([entry])
+            heapq.heappush(self._heap, entry)
+            self._notify_waiters()
+
+    def push_jobs(self, jobs):
+        """ Pushes many Jobs into the queue at once. Jobs
+        are scored before the lock is taken so consumers
+        aren't blocked while a large batch is scored. """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        queued_time = monotonic()
+        for job in jobs:
+            job.queued_time = queued_time
+        rules = self._priority_rules
+        totals, job_scores = _score_jobs(rules, jobs)
+        with self._lock:
+            # Score again if the rules changed while scoring.
+            if rules is not self._priority_rules:
+                totals, job_scores = _score_jobs(self._priority_rules, jobs)
+            entries = [(-total, next(self._counter), job, scores)
+                       for total, job, scores in zip(totals, jobs, job_scores)]
+            self._on_push(entries)
+
+            # Merging with a heapify is O(n + k) rather than O(k log n)
+            # for pushing each entry so use whichever is cheaper.
+            total = len(self._heap) + len(entries)
+            if len(entries) * math.log(total + 1, 2) > total:
+                self._heap.extend(entries)
+                heapq.heapify(self._heap)
             else:
-                for i in range(job_len):
-                    if self._job_priority[i] < priority:
-                        self._job_priority.insert(i, priority)
-                        self._job_queue.insert(i, job)
-                        break
-                else:
-                    self._job_priority.append(priority)
-                    self._job_queue.append(job)
-
-    def peek_job(self):
-        """ Peeks at but doesn't remove the next
-        Job in the queue. Returns None if it's empty. """
+                for entry in entries:
+                    heapq.heappush(self._heap, entry)
+            self._notify_waiters(len(entries))
+
+    def _notify_waiters(self, count=1):
+        """ Wakes up threads that are blocked waiting for
+        a Job. Peeking threads don't remove the Job so all
+        threads are woken if any of them are peeking. """
+        if self._peek_waiters:
+            self._not_empty.notify_all()
+        else:
+            self._not_empty.notify(count)
+
+    def _wait_for_job(self, block, timeout):
+        """ Waits for a Job to be in the queue. Must be
+        called while holding the lock. Returns True if
+        there is a Job in the queue. """
+        if not block or self._heap:
+            return bool(self._heap)
+        wakeups = self._wakeups
+        if timeout is None:
+            while not self._heap:
+                if self._wakeups != wakeups:
+                    return False
+                self._not_empty.wait()
+            return True
+        end_time = monotonic() + timeout
+        while not self._heap:
+            remaining = end_time - monotonic()
+            if remaining <= 0.0 or self._wakeups != wakeups:
+                return False
+            self._not_empty.wait(remaining)
+        return True
+
+    def wakeup(self):
+        """ Wakes every thread that is blocked waiting for a Job
+        to be pushed. Those calls return as if they timed out. """
         with self._lock:
-            if not self._job_queue:
-                return None
-            return self._job_queue[0]
+            self._wakeups += 1
+            self._not_empty.notify_all()
 
-    def pop_job(self):
-        """ Removes and returns the next Job in the
-        queue. Returns None if it's empty. """
+    def peek_job(self, block=False, timeout=None):
+        """ Peeks at but doesn't remove the next Job in
+        the queue. If `block` is True then waits up to
+        `timeout` seconds for a Job to be pushed. Returns
+        None if the queue is empty. """
         with self._lock:
-            if not self._job_queue:
+            self._peek_waiters += 1
+            try:
+                if not self._wait_for_job(block, timeout):
+                    return None
+            finally:
+                self._peek_waiters -= 1
+            return self._heap[0][2]
+
+    def pop_job(self, block=False, timeout=None):
+        """ Removes and returns the next Job in the queue.
+        If `block` is True then waits up to `timeout` seconds
+        for a Job to be pushed. Returns None if the queue is empty. """
+        with self._lock:
+            if not self._wait_for_job(block, timeout):
                 return None
-            job = self._job_queue[0]
-            del self._job_queue[0]
-            del self._job_priority[0]
-            return job
+            entry = heapq.heappop(self._heap)
+            self._on_pop([entry])
+            return entry[2]
+
+    def pop_jobs(self, count, block=False, timeout=None):
+        """ Removes and returns up to `count` Jobs from the
+        queue in order. If `block` is True then waits up to
+        `timeout` seconds for at least one Job to be pushed.
+        Returns an empty list if the queue is empty. """
+        with self._lock:
+            if count <= 0 or not self._wait_for_job(block, timeout):
+                return []
+            if count >= len(self._heap):
+                entries = sorted(self._heap)
+                self._heap = []
+            else:
+                entries = [heapq.heappop(self._heap) for _ in range(count)]
+            self._on_pop(entries)
+            return [entry[2] for entry in entries]
+
+    def _on_push(self, entries):
+        """ Called while holding the lock with the entries
+        of Jobs that are about to be pushed into the queue. """
+        pass
+
+    def _on_pop(self, entries):
+        """ Called while holding the lock with the entries
+        of Jobs that were popped from the queue. """
+        pass
 
     @property
     def empty(self):
-        with self._lock:
-            return False if self._job_queue else True
+        # Reading the heap is atomic so the lock isn't required.
+        return False if self._heap else True
+
+    @property
+    def size(self):
+        """ Number of Jobs in the queue. """
+        return len(self._heap)
 
     @property
     def jobs(self):
         with self._lock:
-            return self._job_queue[:]
+            entries = self._heap[:]
+        return [entry[2] for entry in sorted(entries)]
 
     @property
     def priority_rules(self):
-        with self._lock:
-            return self._priority_rules[:]
+        # The list of rules is never modified in place.
+        return self._priority_rules[:]
+
+    def add_priority_rule(self, func, batch=False):
+        """ Adds a rule to how priority of Jobs is
+        calculated. If `batch` is True then the function
+        is given a sequence of Jobs and must return a
+        sequence of priorities such as a NumPy array.
+        Returns the rule for use with removing. """
+        if batch:
+            rule = BatchPriorityRule(func)
+        else:
+            rule = PriorityRule(func)
+        self._add_priority_rule(rule)
+        return rule
 
-    def add_priority_rule(self, func):
-        """ Adds a rule to how priority of
-        Jobs is calculated. Returns the rule
-        for use with removing. """
-        rule = PriorityRule(func)
+    def _add_priority_rule(self, rule):
+        """ Adds an already created PriorityRule to the queue. """
         with self._lock:
-            self._priority_rules.append(rule)
+            # Only the new rule is evaluated for each queued Job.
+            if self._heap:
+                priorities = rule.get_priorities([entry[2] for entry in self._heap])
+                if numpy is not None and isinstance(priorities, numpy.ndarray):
+                    priorities = priorities.tolist()
+                for entry, priority in zip(self._heap, priorities):
+                    entry[3].append(priority)
+
+            # The list of rules is replaced rather than modified so
+            # that push_jobs() can detect a change while scoring.
+            self._priority_rules = self._priority_rules + [rule]
             self._reorganize_queue()
-        return rule
 
     def remove_priority_rule(self, rule):
         """ Removes a rule about how
@@ -100,24 +241,17 @@ class JobQueue(object):
                     break
             else:
                 raise ValueError("PriorityRule not found within JobQueue's rules.")
-            del self._priority_rules[i]
+            self._priority_rules = self._priority_rules[:i] + self._priority_rules[i + 1:]
+
+            # Drop the cached score of the removed rule from each queued Job.
+            for _, _, _, scores in self._heap:
+                del scores[i]
             self._reorganize_queue()
 
     def _reorganize_queue(self):
-        """ Reorganizes the queue of Jobs against the rules
-        that have been added to the JobQueue. """
+        """ Reorganizes the queue of Jobs against the cached
+        scores for the rules that have been added to the JobQueue. """
         with self._lock:
-            new_priority = {}
-            for job in self._job_queue:
-                priority = 0.0
-                for rule in self._priority_rules:
-                    assert isinstance(rule, PriorityRule)
-                    priority += rule.get_priority(job)
-                new_priority[job] = priority
-
-            compare_func = cmp_to_key(lambda a, b: _random_cmp(
-                                      new_priority[a],
-                                      new_priority[b]))
-            new_queue = sorted(new_priority.keys(), key=compare_func, reverse=True)
-            self._job_queue = new_queue
-            self._job_priority = [new_priority[job] for job in self._job_queue]
+            self._heap = [(-_sum_priority(scores), count, job, scores)
+                          for _, count, job, scores in self._heap]
+            heapq.heapify(self._heap)
@@ -1,11 +1,75 @@
 import re
+import threading
+from collections import deque
 __all__ = [
     "Label",
     "LabelExpr",
     "string_to_label_expr"
 ]
 
-_LABEL_REGEX = re.compile(r"([^'\[\]\(\)&\|~\s]+)")
+_TOKEN_REGEX = re.compile(r"\s*(?:([\[\]\(\)&\|~])|([^'\[\]\(\)&\|~\s]+))")
+_OPENING_TOKENS = {"(": ")", "[": "]"}
+_BINARY_PRECEDENCE = {"&": 2, "|": 1}
+
+# Canonical keys are tuples of a tag followed by a payload.
+_KEY_FALSE = (0, None)
+_KEY_TRUE = (1, None)
+_KEY_LABEL = 2
+_KEY_NOT = 3
+_KEY_AND = 4
+_KEY_OR = 5
+
+# Number of parsed expressions kept by string_to_label_expr() and
+# compiled expressions kept by LabelExpr.compile().
+_PARSE_CACHE_SIZE = 1024
+_COMPILE_CACHE_SIZE = 1024
+
+
+class _LRUCache(object):
+    """ Thread-safe mapping that only keeps the `size` most
+    recently used entries. Each use is recorded in a queue
+    with a counter so the least recently used entry is found
+    without OrderedDict which isn't available in Python 2.6. """
+    def __init__(self, size):
+        self._size = size
+        self._entries = {}
+        self._uses = deque()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._use(key, entry[0])
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._use(key, value)
+            while len(self._entries) > self._size:
+                key, counter = self._uses.popleft()
+                # Uses that aren't the latest for the key are skipped.
+                if self._entries[key][1] == counter:
+                    del self._entries[key]
+
+    def _use(self, key, value):
+        """ Must be called while holding the lock. """
+        self._counter += 1
+        self._entries[key] = (value, self._counter)
+        self._uses.append((key, self._counter))
+
+        # Drop uses that have been superseded so the queue
+        # doesn't grow without bound for a few hot keys.
+        if len(self._uses) > 2 * self._size + 16:
+            self._uses = deque(sorted(((key, counter) for key, (_, counter)
+                                       in self._entries.items()),
+                                      key=lambda use: use[1]))
+
+
+_parse_cache = _LRUCache(_PARSE_CACHE_SIZE)
+_compile_cache = _LRUCache(_COMPILE_CACHE_SIZE)
 
 
 class _LabelExprOperator(object):
@@ -52,24 +116,86 @@ class _LabelOperatorNot(_LabelExprOperator):
 
 
 class LabelExpr(object):
+    """ Expressions are treated as immutable once created as their
+    canonical key is computed once and cached on each instance. """
     def __init__(self, left_label, right_label=None, operator=None):
         if right_label and not operator:
             raise ValueError("right_label and operator must be given together.")
         self.left_label = left_label
         self.right_label = right_label
         self.operator = operator
+        self._key = None
+        self._hash = None
+
+    @property
+    def canonical_key(self):
+        """ Hashable key that is the same for every expression that
+        normalizes to the same expression, such as `a & b`, `b & a`,
+        `a & ~~b` and `a & b & a`. """
+        if self._key is None:
+            _post_order(self, _key_children, _visit_key)
+        return self._key
+
+    def normalize(self):
+        """ Returns an equivalent expression where chains of `&` and `|`
+        are flattened with their operands sorted and deduplicated,
+        double negations are removed and constant sub-expressions
+        such as `a & ~a` are folded into constants. """
+        return _post_order(self.canonical_key, _key_operands, _visit_normalized)
 
     def __eq__(self, other):
-        if not isinstance(other, LabelExpr):
-            return False
-        for attr in ["operator", "left_label", "right_label"]:
-            self_attr = getattr(self, attr)
-            other_attr = getattr(other, attr)
-            if bool(self_attr) != bool(other_attr):
-                return False
-            if self_attr and self_attr != other_attr:
-                return False
-        return True
+        """ Expressions are equal if they normalize to the same expression. """
+        if self is other:
+            return True
+        if isinstance(other, LabelExpr):
+            return self.canonical_key == other.canonical_key
+        if isinstance(other, str):
+            return self.canonical_key == (_KEY_LABEL, other)
+        return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        if self._hash is None:
+            key = self.canonical_key
+            # Hashes the same as the string a Label is equal to.
+            self._hash = hash(key[1] if key[0] == _KEY_LABEL else key)
+        return self._hash
+
+    def __getstate__(self):
+        # String hashes differ between processes so the
+        # hash is computed again once the expression is unpickled.
+        state = self.__dict__.copy()
+        state["_hash"] = None
+        return state
+
+    def compile(self):
+        """ Compiles the expression into a function which takes
+        the same `labels` argument as `matches()` and returns the
+        same result without walking the expression tree. Compiled
+        functions are shared between equal expressions. """
+        try:
+            key = self.canonical_key
+        except ValueError:
+            return self._compile()
+        evaluate = _compile_cache.get(key)
+        if evaluate is None:
+            evaluate = self.normalize()._compile()
+            _compile_cache.set(key, evaluate)
+        return evaluate
+
+    def _compile(self):
+        names = {}
+        try:
+            source = "def _evaluate(labels):\n    return %s\n" % _compile_source(self, names)
+            evaluate = _compile_function(source, names)
+        except RuntimeError:
+            evaluate = None
+        if evaluate is None:
+            # The expression is nested too deeply for the compiler.
+            return self.matches
+        return evaluate
 
     def matches(self, labels):
         if isinstance(self.left_label, LabelExpr):
@@ -128,17 +254,323 @@ class Label(LabelExpr):
         return self.label
 
     def __eq__(self, other):
-        assert isinstance(other, (str, Label))
         if isinstance(other, str):
             return self.label == other
-        else:
+        elif isinstance(other, Label):
             return self.label == other.label
+        return super(Label, self).__eq__(other)
+
+    def __hash__(self):
+        return hash(self.label)
+
+
+class _LabelExprConstant(LabelExpr):
+    """ Expression that always or never matches which
+    is only created by folding constants in normalize(). """
+    def __init__(self, value):
+        super(_LabelExprConstant, self).__init__(None)
+        self.value = value
+
+    def matches(self, labels):
+        return self.value
+
+    def __str__(self):
+        return str(self.value)
+
+    def __repr__(self):
+        return "<LabelExpr %s>" % self.value
+
+
+def _flatten_operands(label_expr, operator_type):
+    """ Flattens a chain of the same associative operator into a
+    list of operands without recursing for each level of the chain. """
+    operands = []
+    stack = [label_expr]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Label) and type(node.operator) is operator_type:
+            stack.append(node.right_label)
+            stack.append(node.left_label)
+        else:
+            operands.append(node)
+    return operands
+
+
+def _post_order(root, children, visit):
+    """ Calls `visit(node, results)` on every node after it's been
+    called on the children of that node, without recursing, and
+    returns the result for `root`. `results` are the results for
+    each of `children(node)` in order. """
+    results = {}
+    stack = [(root, None)]
+    while stack:
+        node, node_children = stack.pop()
+        if id(node) in results:
+            continue
+        if node_children is None:
+            node_children = children(node)
+            if node_children:
+                stack.append((node, node_children))
+                stack.extend((child, None) for child in node_children)
+                continue
+        results[id(node)] = visit(node, [results[id(child)] for child in node_children])
+    return results[id(root)]
+
+
+def _key_children(node):
+    if not isinstance(node, LabelExpr) or node._key is not None:
+        return ()
+    if isinstance(node, (Label, _LabelExprConstant)):
+        return ()
+    operator = node.operator
+    if operator is None:
+        if isinstance(node.left_label, LabelExpr):
+            return (node.left_label,)
+        return (node.right_label,)
+    elif type(operator) is _LabelOperatorNot:
+        return (node.right_label,)
+    elif type(operator) in (_LabelOperatorAnd, _LabelOperatorOr):
+        return _flatten_operands(node, type(operator))
+    raise ValueError("Can't normalize the operator `%s`." % str(operator).strip())
+
+
+def _visit_key(node, child_keys):
+    """ Computes and caches the canonical key of a node
+    from the canonical keys of its children. """
+    if not isinstance(node, LabelExpr):
+        return _KEY_FALSE
+    if node._key is None:
+        if isinstance(node, Label):
+            node._key = (_KEY_LABEL, node.label)
+        elif isinstance(node, _LabelExprConstant):
+            node._key = _KEY_TRUE if node.value else _KEY_FALSE
+        elif node.operator is None:
+            node._key = child_keys[0]
+        elif type(node.operator) is _LabelOperatorNot:
+            node._key = _negate_key(child_keys[0])
+        elif type(node.operator) is _LabelOperatorAnd:
+            node._key = _combine_keys(_KEY_AND, child_keys)
+        else:
+            node._key = _combine_keys(_KEY_OR, child_keys)
+    return node._key
+
+
+def _negate_key(key):
+    if key == _KEY_TRUE:
+        return _KEY_FALSE
+    elif key == _KEY_FALSE:
+        return _KEY_TRUE
+    elif key[0] == _KEY_NOT:
+        return key[1]
+    return (_KEY_NOT, key)
+
+
+def _combine_keys(tag, keys):
+    """ Combines the keys of the operands of `&` or `|` into one
+    key with nested chains flattened, duplicates removed, and
+    constants and complementary operands folded. """
+    if tag == _KEY_AND:
+        identity, absorbing = _KEY_TRUE, _KEY_FALSE
+    else:
+        identity, absorbing = _KEY_FALSE, _KEY_TRUE
+    operands = set()
+    for key in keys:
+        if key[0] == tag:
+            operands.update(key[1])
+        elif key == absorbing:
+            return absorbing
+        elif key != identity:
+            operands.add(key)
+    for key in operands:
+        if key[0] == _KEY_NOT and key[1] in operands:
+            return absorbing
+    if not operands:
+        return identity
+    if len(operands) == 1:
+        return operands.pop()
+    return (tag, tuple(sorted(operands)))
+
+
+def _key_operands(key):
+    if key[0] == _KEY_NOT:
+        return (key[1],)
+    elif key[0] in (_KEY_AND, _KEY_OR):
+        return key[1]
+    return ()
+
+
+def _visit_normalized(key, operands):
+    """ Builds the expression for a canonical key
+    from the expressions built for its operands. """
+    if key[0] == _KEY_LABEL:
+        label_expr = Label(key[1])
+    elif key[0] == _KEY_NOT:
+        label_expr = ~operands[0]
+    elif key[0] in (_KEY_AND, _KEY_OR):
+        label_expr = operands[0]
+        for operand in operands[1:]:
+            if key[0] == _KEY_AND:
+                label_expr = label_expr & operand
+            else:
+                label_expr = label_expr | operand
+    else:
+        label_expr = _LabelExprConstant(key == _KEY_TRUE)
+    label_expr._key = key
+    return label_expr
+
+
+def _compile_source(label_expr, names, label_source=None, bitwise=False):
+    """ Generates the source of a Python expression that evaluates
+    `label_expr` against `labels`. Values that are referenced by the
+    source are added to `names` to be used as globals.
+
+    `label_source` may be given to generate the source for each
+    Label instead, and `bitwise` uses `&`, `|` and `~` instead of
+    `and`, `or` and `not` so the source works with NumPy arrays. """
+    if isinstance(label_expr, _LabelExprConstant):
+        return "True" if label_expr.value else "False"
+    if isinstance(label_expr, Label):
+        if label_source is not None:
+            return label_source(label_expr)
+        name = "_label_%d" % len(names)
+        names[name] = label_expr.label
+        return "%s in labels" % name
+    if not isinstance(label_expr, LabelExpr):
+        return "False"
+
+    operator = label_expr.operator
+    if operator is None:
+        if isinstance(label_expr.left_label, LabelExpr):
+            return _compile_source(label_expr.left_label, names, label_source, bitwise)
+        return _compile_source(label_expr.right_label, names, label_source, bitwise)
+    elif type(operator) is _LabelOperatorNot:
+        source = _compile_source(label_expr.right_label, names, label_source, bitwise)
+        if source in ("True", "False"):
+            # `~True` is -2 so constants are negated here.
+            return "False" if source == "True" else "True"
+        return ("~(%s)" if bitwise else "not %s") % source
+    elif type(operator) in (_LabelOperatorAnd, _LabelOperatorOr):
+        if type(operator) is _LabelOperatorAnd:
+            joiner = " & " if bitwise else " and "
+        else:
+            joiner = " | " if bitwise else " or "
+        operands = _flatten_operands(label_expr, type(operator))
+        return "(%s)" % joiner.join(_compile_source(operand, names, label_source, bitwise)
+                                    for operand in operands)
+    elif label_source is not None:
+        raise ValueError("Can't compile the operator `%s`." % str(operator).strip())
+
+    # Unknown operators are evaluated the same way as matches().
+    name = "_label_expr_%d" % len(names)
+    names[name] = label_expr
+    return "%s.matches(labels)" % name
+
+
+def _compile_function(source, names):
+    """ Compiles `source` as a function that takes a single
+    argument and returns it. Returns None if the expression is
+    nested too deeply for the Python compiler. """
+    try:
+        code = compile(source, "<LabelExpr>", "exec")
+    except (MemoryError, RuntimeError, SyntaxError):
+        return None
+    exec(code, names)
+    return names["_evaluate"]
+
+
+def _tokenize(string):
+    """ Splits a string into a list of labels, operators and
+    brackets. Raises ValueError on any character that isn't
+    part of a label, an operator or a bracket. """
+    tokens = []
+    position = 0
+    string = string.rstrip()
+    while position < len(string):
+        match = _TOKEN_REGEX.match(string, position)
+        if match is None:
+            raise ValueError("Invalid character `%s` in label expression `%s`." %
+                             (string[position:].lstrip()[:1], string))
+        tokens.append(match.group(1) or match.group(2))
+        position = match.end()
+    return tokens
+
+
+def _apply_operator(operator, operands):
+    if operator == "~":
+        operands.append(~operands.pop())
+    else:
+        right = operands.pop()
+        left = operands.pop()
+        if operator == "&":
+            operands.append(left & right)
+        else:
+            operands.append(left | right)
+
+
+def _parse_tokens(tokens, string):
+    """ Builds a LabelExpr from tokens using the same precedence as
+    the LabelExpr operators: `~` binds tightest, then `&`, then `|`.
+    Both `()` and `[]` group so the output of str() can be parsed. """
+    operands = []
+    operators = []
+    expect_operand = True
+    for token in tokens:
+        if token in _OPENING_TOKENS or token == "~":
+            if not expect_operand:
+                raise ValueError("Unexpected `%s` in label expression `%s`." % (token, string))
+            operators.append(token)
+        elif token in _BINARY_PRECEDENCE:
+            if expect_operand:
+                raise ValueError("Unexpected `%s` in label expression `%s`." % (token, string))
+            precedence = _BINARY_PRECEDENCE[token]
+            while operators and operators[-1] not in _OPENING_TOKENS and \
+                    (operators[-1] == "~" or _BINARY_PRECEDENCE[operators[-1]] >= precedence):
+                _apply_operator(operators.pop(), operands)
+            operators.append(token)
+            expect_operand = True
+        elif token in (")", "]"):
+            if expect_operand:
+                raise ValueError("Unexpected `%s` in label expression `%s`." % (token, string))
+            while operators and operators[-1] not in _OPENING_TOKENS:
+                _apply_operator(operators.pop(), operands)
+            if not operators or _OPENING_TOKENS[operators.pop()] != token:
+                raise ValueError("Unbalanced `%s` in label expression `%s`." % (token, string))
+        else:
+            if not expect_operand:
+                raise ValueError("Unexpected label `%s` in label expression `%s`." %
+                                 (token, string))
+            operands.append(Label(token))
+            expect_operand = False
+
+    if expect_operand:
+        raise ValueError("Incomplete label expression `%s`." % string)
+    while operators:
+        operator = operators.pop()
+        if operator in _OPENING_TOKENS:
+            raise ValueError("Unbalanced `%s` in label expression `%s`." % (operator, string))
+        _apply_operator(operator, operands)
+    return operands[0]
 
 
 def string_to_label_expr(string):
     """ Given a string that is most likely user-generated,
     convert that string into an actual LabelExpr value.
-    Make sure to sanitize the values by not allowing `'`
-    characters to escape the string. All non-bool logic
-    characters become a label. """
-    return eval(_LABEL_REGEX.sub(r"Label('\1')", string))
+    All non-bool logic characters become a label and any
+    invalid expression raises ValueError. Recently parsed
+    expressions are cached so the returned LabelExpr may be
+    shared between callers and must not be modified. """
+    label_expr = _parse_cache.get(string)
+    if label_expr is not None:
+        return label_expr
+
+    # Strings that only differ by whitespace share the same
+    # LabelExpr and the original string is cached for next time.
+    tokens = _tokenize(string)
+    key = " ".join(tokens)
+    label_expr = _parse_cache.get(key)
+    if label_expr is None:
+        label_expr = _parse_tokens(tokens, string)
+        _parse_cache.set(key, label_expr)
+    if key != string:
+        _parse_cache.set(string, label_expr)
+    return label_expr
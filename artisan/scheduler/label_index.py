@@ -0,0 +1,130 @@
+""" Inverted index from each label to the workers that have
+that label so that the workers matching a LabelExpr can be
+found without testing every worker. """
+import threading
+from .label import (
+    Label,
+    LabelExpr,
+    _LabelOperatorAnd,
+    _LabelOperatorNot,
+    _LabelExprConstant,
+    _LabelOperatorOr,
+    _flatten_operands,
+    string_to_label_expr
+)
+
+__all__ = [
+    "LabelIndex"
+]
+
+_NO_WORKERS = frozenset()
+
+
+class LabelIndex(object):
+    """ Maps each label to the set of workers that have it. The
+    labels of a worker are read when it's added so `update_worker()`
+    must be called if they change while the worker is indexed. """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._label_workers = {}
+        self._worker_labels = {}
+
+    @property
+    def workers(self):
+        with self._lock:
+            return set(self._worker_labels)
+
+    def add_worker(self, worker, labels=None):
+        """ Indexes a worker under `labels` or `worker.labels`. """
+        if labels is None:
+            labels = worker.labels
+        labels = frozenset(label.label if isinstance(label, Label) else label
+                           for label in labels)
+        with self._lock:
+            if worker in self._worker_labels:
+                raise ValueError("Worker is already in this LabelIndex.")
+            self._worker_labels[worker] = labels
+            for label in labels:
+                self._label_workers.setdefault(label, set()).add(worker)
+
+    def remove_worker(self, worker):
+        with self._lock:
+            labels = self._worker_labels.pop(worker, None)
+            if labels is None:
+                raise ValueError("Worker is not in this LabelIndex.")
+            for label in labels:
+                workers = self._label_workers[label]
+                workers.discard(worker)
+                if not workers:
+                    del self._label_workers[label]
+
+    def update_worker(self, worker, labels=None):
+        """ Re-indexes a worker after its labels have changed. """
+        self.remove_worker(worker)
+        self.add_worker(worker, labels)
+
+    def workers_with_label(self, label):
+        if isinstance(label, Label):
+            label = label.label
+        with self._lock:
+            return set(self._label_workers.get(label, _NO_WORKERS))
+
+    def find_workers(self, label_expr):
+        """ Returns the set of workers that match a LabelExpr or a
+        string expression. `&` and `|` are resolved by intersecting
+        and joining the sets of workers with each label so the cost
+        grows with the number of matches rather than the number of
+        workers. Only `~` without an `&` has to visit every worker. """
+        if not isinstance(label_expr, LabelExpr):
+            label_expr = string_to_label_expr(label_expr)
+        label_expr = label_expr.normalize()
+        with self._lock:
+            return set(self._find(label_expr))
+
+    def _find(self, label_expr):
+        """ Returns the workers matching a normalized `label_expr`
+        which may be a collection from the index so must not be
+        modified. """
+        if isinstance(label_expr, Label):
+            return self._label_workers.get(label_expr.label, _NO_WORKERS)
+        if isinstance(label_expr, _LabelExprConstant):
+            return self._worker_labels if label_expr.value else _NO_WORKERS
+
+        operator = label_expr.operator
+        if type(operator) is _LabelOperatorNot:
+            return set(self._worker_labels).difference(self._find(label_expr.right_label))
+        elif type(operator) is _LabelOperatorOr:
+            workers = set()
+            for operand in _flatten_operands(label_expr, _LabelOperatorOr):
+                workers.update(self._find(operand))
+            return workers
+        return self._find_and(_flatten_operands(label_expr, _LabelOperatorAnd))
+
+    def _find_and(self, operands):
+        """ Intersects the operands starting from the smallest set
+        of workers and removes the workers matching each negated
+        operand rather than building the complement of it. """
+        negated = []
+        workers = []
+        for operand in operands:
+            if not isinstance(operand, Label) and type(operand.operator) is _LabelOperatorNot:
+                negated.append(operand.right_label)
+            else:
+                workers.append(self._find(operand))
+
+        if workers:
+            workers.sort(key=len)
+            result = set(workers[0])
+            for other in workers[1:]:
+                if not result:
+                    break
+                result.intersection_update(other)
+        else:
+            result = set(self._worker_labels)
+
+        for operand in negated:
+            if not result:
+                break
+            excluded = self._find(operand)
+            result = set(worker for worker in result if worker not in excluded)
+        return result
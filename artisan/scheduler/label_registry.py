@@ -0,0 +1,163 @@
+""" Registry that interns labels to bit positions so that
+sets of labels become integer bitmasks and many LabelExprs
+can be matched against many sets of labels at once. """
+import threading
+from .label import (
+    Label,
+    _COMPILE_CACHE_SIZE,
+    _LRUCache,
+    _compile_function,
+    _compile_source
+)
+from ..compat import numpy
+
+__all__ = [
+    "LabelRegistry"
+]
+
+
+class LabelRegistry(object):
+    """ Interns every label it sees to a bit position. A set of
+    labels is then an integer mask with the bit of each label set
+    and a compiled LabelExpr only has to test bits of that mask. """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bits = {}
+        self._labels = []
+        self._compiled = _LRUCache(_COMPILE_CACHE_SIZE)
+        self._compiled_arrays = _LRUCache(_COMPILE_CACHE_SIZE)
+
+    @property
+    def labels(self):
+        """ Every interned label ordered by bit position. """
+        return self._labels[:]
+
+    def intern(self, label):
+        """ Returns the bit position of a label string or
+        Label, assigning the next position if it's new. """
+        if isinstance(label, Label):
+            label = label.label
+        bit = self._bits.get(label)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.get(label)
+                if bit is None:
+                    bit = len(self._labels)
+                    self._labels.append(label)
+                    self._bits[label] = bit
+        return bit
+
+    def mask(self, labels):
+        """ Returns the integer mask for a collection of labels. """
+        mask = 0
+        for label in labels:
+            mask |= 1 << self.intern(label)
+        return mask
+
+    def mask_labels(self, mask):
+        """ Returns the labels that are set in `mask` ordered by bit position. """
+        labels = []
+        bit = 0
+        while mask:
+            if mask & 1:
+                labels.append(self._labels[bit])
+            mask >>= 1
+            bit += 1
+        return labels
+
+    def compile(self, label_expr):
+        """ Compiles a LabelExpr into a function which takes a mask
+        returned by `mask()` and returns whether the labels match.
+        Compiled functions are shared between equal expressions. """
+        evaluate = self._compiled.get(label_expr.canonical_key)
+        if evaluate is None:
+            evaluate = self._compile(label_expr.normalize())
+            self._compiled.set(label_expr.canonical_key, evaluate)
+        return evaluate
+
+    def _compile(self, label_expr):
+        names = {}
+        try:
+            source = _compile_source(label_expr, names, self._mask_source)
+            evaluate = _compile_function("def _evaluate(mask):\n    return %s\n" % source, names)
+        except RuntimeError:
+            evaluate = None
+        if evaluate is None:
+            # The expression is nested too deeply for the compiler.
+            def evaluate(mask):
+                return label_expr.matches(self.mask_labels(mask))
+        return evaluate
+
+    def match_matrix(self, label_exprs, label_sets):
+        """ Matches every LabelExpr against every collection of labels.
+        Returns a matrix with a row for each LabelExpr and a column for
+        each collection of labels. The matrix is a NumPy array of bools
+        if NumPy is installed otherwise it's a list of lists. Equal
+        expressions are only evaluated once. """
+        label_exprs = list(label_exprs)
+        label_sets = list(label_sets)
+        if numpy is None:
+            masks = [self.mask(labels) for labels in label_sets]
+            results = {}
+            for label_expr in label_exprs:
+                if label_expr not in results:
+                    evaluate = self.compile(label_expr)
+                    results[label_expr] = [evaluate(mask) for mask in masks]
+            return [results[label_expr][:] for label_expr in label_exprs]
+
+        # Compiling first interns every label in the expressions.
+        evaluators = {}
+        for label_expr in label_exprs:
+            if label_expr not in evaluators:
+                evaluators[label_expr] = self._compile_array(label_expr)
+        rows = []
+        columns = []
+        for column, labels in enumerate(label_sets):
+            for label in labels:
+                rows.append(self.intern(label))
+                columns.append(column)
+
+        # Row `bit` of `has` is True for every collection with that label
+        # so each LabelExpr is evaluated over every collection at once.
+        has = numpy.zeros((len(self._labels), len(label_sets)), dtype=bool)
+        has[rows, columns] = True
+        results = {}
+        for label_expr, evaluate in evaluators.items():
+            if evaluate is None:
+                results[label_expr] = [label_expr.matches(list(labels)) for labels in label_sets]
+            else:
+                results[label_expr] = evaluate(has)
+        matrix = numpy.empty((len(label_exprs), len(label_sets)), dtype=bool)
+        for row, label_expr in enumerate(label_exprs):
+            matrix[row] = results[label_expr]
+        return matrix
+
+    def match_workers(self, label_exprs, workers):
+        """ Same as `match_matrix()` with a column for the `labels` of each Worker. """
+        return self.match_matrix(label_exprs, [worker.labels for worker in workers])
+
+    def _mask_source(self, label):
+        return "mask & %d != 0" % (1 << self.intern(label))
+
+    def _array_source(self, label):
+        return "has[%d]" % self.intern(label)
+
+    def _compile_array(self, label_expr):
+        """ Compiles a LabelExpr into a function which takes the
+        2D array of bools built by `match_matrix()` and returns
+        a row of bools. Returns None if it can't be compiled. """
+        key = label_expr.canonical_key
+        evaluate = self._compiled_arrays.get(key)
+        if evaluate is None:
+            names = {}
+            try:
+                source = _compile_source(label_expr.normalize(), names, self._array_source,
+                                         bitwise=True)
+                evaluate = _compile_function("def _evaluate(has):\n    return %s\n" % source,
+                                             names)
+            except RuntimeError:
+                evaluate = None
+            if evaluate is None:
+                return None
+            self._compiled_arrays.set(key, evaluate)
+        return evaluate
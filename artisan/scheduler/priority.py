@@ -1,4 +1,6 @@
+from ..compat import numpy
 __all__ = [
+    "BatchPriorityRule",
     "PriorityRule"
 ]
 
@@ -12,3 +14,38 @@ class PriorityRule(object):
         if not isinstance(priority, (float, int)):
             raise ValueError("PriorityRule must return a float or int.")
         return priority
+
+    def get_priorities(self, jobs):
+        """ Gets the priority of each Job in a sequence
+        of Jobs. Returns a sequence in the same order. """
+        return [self.get_priority(job) for job in jobs]
+
+
+class BatchPriorityRule(PriorityRule):
+    """ PriorityRule where the function is given a sequence
+    of Jobs and returns a sequence of priorities in the same
+    order, usually a NumPy array, rather than being called
+    for every Job separately. """
+    def get_priority(self, job):
+        priorities = self.get_priorities([job])
+        if numpy is not None:
+            priorities = priorities.tolist()
+        return priorities[0]
+
+    def get_priorities(self, jobs):
+        priorities = self._func(jobs)
+        if numpy is not None:
+            priorities = numpy.asarray(priorities)
+            if priorities.ndim != 1 or priorities.shape[0] != len(jobs):
+                raise ValueError("BatchPriorityRule must return a priority for each Job.")
+            if priorities.dtype.kind not in "biuf":
+                raise ValueError("PriorityRule must return a float or int.")
+            return priorities
+
+        priorities = list(priorities)
+        if len(priorities) != len(jobs):
+            raise ValueError("BatchPriorityRule must return a priority for each Job.")
+        for priority in priorities:
+            if not isinstance(priority, (float, int)):
+                raise ValueError("PriorityRule must return a float or int.")
+        return priorities
@@ -0,0 +1,241 @@
+""" JobQueue that spreads Jobs over many independently
+locked shards so that many producer and consumer threads
+don't all contend for a single lock. """
+import heapq
+import itertools
+import threading
+from .job_queue import JobQueue
+from .priority import BatchPriorityRule, PriorityRule
+from ..compat import monotonic
+
+__all__ = [
+    "ShardedJobQueue"
+]
+
+
+class ShardedJobQueue(object):
+    def __init__(self, shards=4):
+        if shards < 1:
+            raise ValueError("ShardedJobQueue must have at least one shard.")
+        self._shards = [JobQueue() for _ in range(shards)]
+
+        # All shards share a sequence counter so that Jobs of equal
+        # priority are still popped in FIFO order across shards.
+        counter = itertools.count()
+        for shard in self._shards:
+            shard._counter = counter
+        self._next_shard = itertools.count()
+
+        # Consumers only take this lock when they have to wait
+        # for a Job to be pushed into an empty queue.
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._waiters = 0
+        self._peek_waiters = 0
+        self._wakeups = 0
+
+    @property
+    def shards(self):
+        return len(self._shards)
+
+    def _choose_shard(self):
+        return self._shards[next(self._next_shard) % len(self._shards)]
+
+    def _notify_waiters(self, count=1):
+        """ Wakes up threads that are blocked waiting for a Job.
+        The lock is only taken if there are threads waiting. """
+        if self._waiters:
+            with self._lock:
+                if self._peek_waiters:
+                    self._not_empty.notify_all()
+                else:
+                    self._not_empty.notify(count)
+
+    def push_job(self, job):
+        """ Pushes a Job into one of the shards. """
+        self._choose_shard().push_job(job)
+        self._notify_waiters()
+
+    def push_jobs(self, jobs):
+        """ Pushes many Jobs into the queue spread
+        evenly across all of the shards. """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        shards = len(self._shards)
+        start = next(self._next_shard)
+        for i in range(min(shards, len(jobs))):
+            self._shards[(start + i) % shards].push_jobs(jobs[i::shards])
+        self._notify_waiters(len(jobs))
+
+    def _best_shard(self):
+        """ Finds the shard with the highest priority Job
+        at the head of its heap without taking any locks.
+        Returns None if every shard is empty. """
+        best_shard = None
+        best_entry = None
+        for shard in self._shards:
+            heap = shard._heap
+            if not heap:
+                continue
+            try:
+                entry = heap[0]
+            except IndexError:
+                continue
+
+            # Sequence numbers are unique so the comparison
+            # never goes further than the priority and sequence.
+            if best_entry is None or entry < best_entry:
+                best_shard = shard
+                best_entry = entry
+        return best_shard
+
+    def _pop_best(self):
+        while True:
+            shard = self._best_shard()
+            if shard is None:
+                return None
+            job = shard.pop_job()
+
+            # Another consumer may have emptied the shard first.
+            if job is not None:
+                return job
+
+    def _peek_best(self):
+        while True:
+            shard = self._best_shard()
+            if shard is None:
+                return None
+            job = shard.peek_job()
+            if job is not None:
+                return job
+
+    def _wait_for(self, func, block, timeout, peek=False):
+        """ Calls `func` until it returns a Job, waiting for
+        a Job to be pushed between calls if `block` is True. """
+        job = func()
+        if job is not None or not block:
+            return job
+        end_time = None if timeout is None else monotonic() + timeout
+        with self._lock:
+            wakeups = self._wakeups
+            self._waiters += 1
+            if peek:
+                self._peek_waiters += 1
+            try:
+                while True:
+                    job = func()
+                    if job is not None or self._wakeups != wakeups:
+                        return job
+                    if end_time is None:
+                        self._not_empty.wait()
+                    else:
+                        remaining = end_time - monotonic()
+                        if remaining <= 0.0:
+                            return None
+                        self._not_empty.wait(remaining)
+            finally:
+                self._waiters -= 1
+                if peek:
+                    self._peek_waiters -= 1
+
+    def wakeup(self):
+        """ Wakes every thread that is blocked waiting for a Job
+        to be pushed. Those calls return as if they timed out. """
+        with self._lock:
+            self._wakeups += 1
+            self._not_empty.notify_all()
+
+    def peek_job(self, block=False, timeout=None):
+        """ Peeks at but doesn't remove the highest priority
+        Job at the head of any shard. If `block` is True then
+        waits up to `timeout` seconds for a Job to be pushed.
+        Returns None if the queue is empty. """
+        return self._wait_for(self._peek_best, block, timeout, peek=True)
+
+    def pop_job(self, block=False, timeout=None):
+        """ Removes and returns the highest priority Job at
+        the head of any shard. If `block` is True then waits
+        up to `timeout` seconds for a Job to be pushed.
+        Returns None if the queue is empty. """
+        return self._wait_for(self._pop_best, block, timeout)
+
+    def pop_jobs(self, count, block=False, timeout=None):
+        """ Removes and returns up to `count` Jobs from the
+        queue in order. If `block` is True then waits up to
+        `timeout` seconds for at least one Job to be pushed.
+        Returns an empty list if the queue is empty. """
+        if count <= 0:
+            return []
+        job = self.pop_job(block, timeout)
+        if job is None:
+            return []
+        jobs = [job]
+        while len(jobs) < count:
+            job = self._pop_best()
+            if job is None:
+                break
+            jobs.append(job)
+        return jobs
+
+    @property
+    def empty(self):
+        for shard in self._shards:
+            if shard._heap:
+                return False
+        return True
+
+    @property
+    def size(self):
+        return sum(len(shard._heap) for shard in self._shards)
+
+    @property
+    def jobs(self):
+        shard_entries = []
+        for shard in self._shards:
+            with shard._lock:
+                entries = shard._heap[:]
+            entries.sort()
+            shard_entries.append(entries)
+        return [entry[2] for entry in heapq.merge(*shard_entries)]
+
+    @property
+    def priority_rules(self):
+        return self._shards[0].priority_rules
+
+    def _lock_shards(self):
+        for shard in self._shards:
+            shard._lock.acquire()
+
+    def _unlock_shards(self):
+        for shard in reversed(self._shards):
+            shard._lock.release()
+
+    def add_priority_rule(self, func, batch=False):
+        """ Adds a rule to how priority of Jobs is
+        calculated to every shard. Returns the rule
+        for use with removing. """
+        if batch:
+            rule = BatchPriorityRule(func)
+        else:
+            rule = PriorityRule(func)
+
+        # Every shard is locked so that Jobs are never
+        # popped while the shards have different rules.
+        self._lock_shards()
+        try:
+            for shard in self._shards:
+                shard._add_priority_rule(rule)
+        finally:
+            self._unlock_shards()
+        return rule
+
+    def remove_priority_rule(self, rule):
+        """ Removes a rule about how the priority
+        of each Job is calculated from every shard. """
+        self._lock_shards()
+        try:
+            for shard in self._shards:
+                shard.remove_priority_rule(rule)
+        finally:
+            self._unlock_shards()
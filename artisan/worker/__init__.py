@@ -1,3 +1,4 @@
+import sys
 from .base_command import BaseCommand
 from .base_worker import BaseWorker
 from .local import (
@@ -8,16 +9,34 @@ from .ssh import (
     SshCommand,
     SshWorker
 )
-from .pool import WorkerPool
+from .output import OutputBuffer
+from .pool import AcquireStats, WorkerPool
 from .group import WorkerGroup
 
 __all__ = [
+    "AcquireStats",
     "BaseCommand",
     "BaseWorker",
     "LocalCommand",
     "LocalWorker",
+    "OutputBuffer",
     "SshCommand",
     "SshWorker",
     "WorkerPool",
     "WorkerGroup"
 ]
+
+# Async workers use syntax that requires Python 3.6+.
+if sys.version_info >= (3, 6):
+    from .asyncio_worker import (  # noqa: F401
+        AsyncCommand,
+        AsyncLocalCommand,
+        AsyncLocalWorker,
+        AsyncSshWorker,
+        AsyncWorker
+    )
+    __all__.extend(["AsyncCommand",
+                    "AsyncLocalCommand",
+                    "AsyncLocalWorker",
+                    "AsyncSshWorker",
+                    "AsyncWorker"])
@@ -0,0 +1,368 @@
+""" Workers and commands for asyncio which let one event loop
+drive many commands without a thread for each of them.
+Requires Python 3.6+. """
+import asyncio
+import functools
+import os
+import sys
+from .local import LocalWorker
+from .output import _READ_SIZE, OutputBuffer, _CommandOutput, _split_lines
+from .ssh import SshWorker
+
+__all__ = [
+    "AsyncCommand",
+    "AsyncLocalCommand",
+    "AsyncLocalWorker",
+    "AsyncSshWorker",
+    "AsyncWorker"
+]
+
+# Seconds an executor thread waits on a blocking command at a time
+# so that cancelling the command is noticed.
+_WAIT_INTERVAL = 1.0
+
+
+class AsyncCommand(_CommandOutput):
+    """ Command that's waited on and streamed from coroutines.
+    Output and callbacks work the same as in BaseCommand except
+    that `wait()` and the iterators must be awaited. """
+    def __init__(self, worker, command):
+        self.worker = worker
+        self.command = command
+
+        self._cancelled = False
+        self._exit_status = None
+        self._stdout = OutputBuffer()
+        self._stderr = OutputBuffer()
+        self._callbacks = []
+        self._done = asyncio.Event()
+
+        # Replaced with a new Event every time output
+        # is read so iterators can wait for the next chunk.
+        self._changed = asyncio.Event()
+
+    @property
+    def stdout(self):
+        return self._stdout.getvalue()
+
+    @property
+    def stderr(self):
+        return self._stderr.getvalue()
+
+    @property
+    def exit_status(self):
+        return self._exit_status
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def add_callback(self, callback):
+        """ Adds a function which is called with the command once it
+        completes or right away if it has already completed. """
+        if self._done.is_set():
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    async def wait(self, timeout=None):
+        """ Waits up to `timeout` seconds for the command
+        to complete and returns its exit status. """
+        if not self._done.is_set():
+            waiter = asyncio.ensure_future(self._done.wait())
+            done, _ = await asyncio.wait([waiter], timeout=timeout)
+            if not done:
+                waiter.cancel()
+        return self._exit_status
+
+    async def iter_lines(self, timeout=None, stderr=False):
+        """ Asynchronous iterator of each line of stdout,
+        or stderr, as soon as it's complete. """
+        pending = []
+        async for chunk in self._iter_output(self._stderr if stderr else self._stdout, timeout):
+            for line in _split_lines(chunk, pending):
+                yield line
+        if pending and self._done.is_set():
+            yield b''.join(pending)
+
+    async def _iter_output(self, output, timeout):
+        subscriber = output.subscribe()
+        try:
+            loop = asyncio.get_event_loop()
+            end_time = None if timeout is None else loop.time() + timeout
+            while True:
+                while subscriber:
+                    yield subscriber.popleft()
+                if self._done.is_set() or self._cancelled:
+                    break
+                changed = self._changed
+                if end_time is None:
+                    await changed.wait()
+                else:
+                    remaining = end_time - loop.time()
+                    if remaining <= 0.0:
+                        break
+                    try:
+                        await asyncio.wait_for(changed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+        finally:
+            output.unsubscribe(subscriber)
+
+    def cancel(self):
+        raise NotImplementedError()
+
+    def _append(self, output, data):
+        output.append(data)
+        self._notify()
+
+    def _notify(self):
+        changed = self._changed
+        self._changed = asyncio.Event()
+        changed.set()
+
+    def _finish(self, exit_status):
+        self._exit_status = exit_status
+        self._done.set()
+        self._notify()
+        callbacks = self._callbacks
+        self._callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+
+class AsyncLocalCommand(AsyncCommand):
+    """ Command run by `asyncio.create_subprocess_shell()` whose
+    pipes are read by the event loop. Use `AsyncLocalWorker.execute()`
+    to create one. """
+    def __init__(self, worker, command, process):
+        super(AsyncLocalCommand, self).__init__(worker, command)
+        self._process = process
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        await asyncio.gather(self._read(self._process.stdout, self._stdout),
+                             self._read(self._process.stderr, self._stderr))
+        exit_status = await self._process.wait()
+        self._finish(None if self._cancelled else exit_status)
+
+    async def _read(self, stream, output):
+        while True:
+            data = await stream.read(_READ_SIZE)
+            if not data:
+                break
+            self._append(output, data)
+
+    def cancel(self):
+        if self._cancelled:
+            raise ValueError("Command is already cancelled.")
+        self._cancelled = True
+        try:
+            self._process.kill()
+        except ProcessLookupError:
+            pass
+        self._notify()
+
+
+class _AsyncCommandAdapter(AsyncCommand):
+    """ Drives a blocking BaseCommand and passes its output to the
+    event loop as it's read. Commands with a file descriptor to wait
+    on, such as SSH channels, are read by the event loop whenever it's
+    readable. Others are waited on from an executor thread. """
+    def __init__(self, worker, command, executor):
+        super(_AsyncCommandAdapter, self).__init__(worker, command.command)
+        self._command = command
+        self._executor = executor
+        self._loop = asyncio.get_event_loop()
+
+        # (descriptor, future) while the event loop waits on the command.
+        self._readable = None
+
+        # Subscribing before adding callbacks means that every chunk
+        # the blocking command reads is handed over exactly once.
+        self._subscribers = [(command._stdout.subscribe(), command._stdout, self._stdout),
+                             (command._stderr.subscribe(), command._stderr, self._stderr)]
+        command.add_stdout_callback(self._wakeup)
+        command.add_stderr_callback(self._wakeup)
+        self._task = asyncio.ensure_future(self._run())
+
+    def _wakeup(self, _):
+        self._loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        for subscriber, _, output in self._subscribers:
+            while subscriber:
+                self._append(output, subscriber.popleft())
+
+    async def _run(self):
+        command = self._command
+        try:
+            while not self._cancelled and command._is_not_complete():
+                fd = command._fileno()
+                if fd is None or not await self._wait_readable(fd):
+                    await self._loop.run_in_executor(self._executor, command._read_all,
+                                                     _WAIT_INTERVAL)
+                elif not self._cancelled:
+                    command._read_all(0.0)
+            if not self._cancelled:
+                await self._loop.run_in_executor(self._executor, command._check_exit)
+        finally:
+            for subscriber, buffer, _ in self._subscribers:
+                buffer.unsubscribe(subscriber)
+            self._drain()
+        self._finish(None if self._cancelled else command._exit_status)
+
+    async def _wait_readable(self, fd):
+        """ Waits for `fd` to be readable. Returns False if the
+        event loop can't wait on file descriptors. """
+        readable = self._loop.create_future()
+        try:
+            self._loop.add_reader(fd, _set_result, readable)
+        except NotImplementedError:
+            return False
+        self._readable = (fd, readable)
+        try:
+            await readable
+        finally:
+            if self._readable is not None and self._readable[1] is readable:
+                self._readable = None
+                self._loop.remove_reader(fd)
+        return True
+
+    def cancel(self):
+        if self._cancelled:
+            raise ValueError("Command is already cancelled.")
+        self._cancelled = True
+
+        # Cancelling may close the descriptor so it's not waited on anymore.
+        if self._readable is not None:
+            fd, readable = self._readable
+            self._readable = None
+            self._loop.remove_reader(fd)
+            _set_result(readable)
+        self._command.cancel()
+        self._notify()
+
+    def close(self):
+        super(_AsyncCommandAdapter, self).close()
+        self._command.close()
+
+
+def _set_result(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AsyncWorker(object):
+    """ Adapts a blocking BaseWorker for asyncio by calling its
+    methods in `executor`, or the default executor of the event
+    loop, and waiting for its commands from the executor. """
+    def __init__(self, worker, executor=None):
+        self._worker = worker
+        self._executor = executor
+
+    @property
+    def worker(self):
+        return self._worker
+
+    @property
+    def user(self):
+        return self._worker.user
+
+    @property
+    def host(self):
+        return self._worker.host
+
+    @property
+    def environ(self):
+        return self._worker.environ
+
+    @property
+    def labels(self):
+        return self._worker.labels
+
+    @property
+    def closed(self):
+        return self._worker.closed
+
+    def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def execute(self, command, environment=None):
+        """ Returns an AsyncCommand for the command once it's started. """
+        command = await self._call(self._worker.execute, command, environment)
+        return _AsyncCommandAdapter(self, command, self._executor)
+
+    async def cwd(self):
+        return await self._call(lambda: self._worker.cwd)
+
+    async def change_directory(self, path):
+        return await self._call(self._worker.change_directory, path)
+
+    async def list_directory(self, path="."):
+        return await self._call(self._worker.list_directory, path)
+
+    async def get_file(self, remote_path, local_path):
+        return await self._call(self._worker.get_file, remote_path, local_path)
+
+    async def put_file(self, local_path, remote_path):
+        return await self._call(self._worker.put_file, local_path, remote_path)
+
+    async def stat_file(self, path, follow_symlinks=True):
+        return await self._call(self._worker.stat_file, path, follow_symlinks)
+
+    async def is_directory(self, path):
+        return await self._call(self._worker.is_directory, path)
+
+    async def is_file(self, path):
+        return await self._call(self._worker.is_file, path)
+
+    async def remove_file(self, path):
+        return await self._call(self._worker.remove_file, path)
+
+    async def close(self):
+        return await self._call(self._worker.close)
+
+
+class AsyncLocalWorker(AsyncWorker):
+    """ Runs commands on the local machine with
+    `asyncio.create_subprocess_shell()` so that they're
+    read and waited on by the event loop itself. """
+    def __init__(self, executor=None):
+        super(AsyncLocalWorker, self).__init__(LocalWorker(), executor)
+
+    async def execute(self, command, environment=None):
+        if environment is None:
+            environment = self._worker.environ.copy()
+
+        # PATH should be in the environment to be able to find binaries.
+        if "PATH" not in environment and "PATH" in os.environ:
+            environment["PATH"] = os.environ["PATH"]
+
+        # Windows requires this environment variable to be set before executing.
+        if sys.platform == "win32" and "SYSTEMROOT" in os.environ:
+            environment["SYSTEMROOT"] = os.environ["SYSTEMROOT"]
+
+        process = await asyncio.create_subprocess_shell(command,
+                                                        cwd=self._worker.cwd,
+                                                        stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE,
+                                                        env=environment)
+        return AsyncLocalCommand(self, command, process)
+
+
+class AsyncSshWorker(AsyncWorker):
+    """ SshWorker driven from asyncio. Commands are waited on
+    from the executor so that connections aren't blocked. """
+    @classmethod
+    async def connect(cls, host, username, *args, executor=None, **kwargs):
+        """ Connects to `host` in the executor and returns an AsyncSshWorker. """
+        loop = asyncio.get_event_loop()
+        worker = await loop.run_in_executor(executor, functools.partial(SshWorker, host, username,
+                                                                        *args, **kwargs))
+        return cls(worker, executor)
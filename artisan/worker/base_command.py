@@ -1,13 +1,18 @@
 import subprocess
 from .base_worker import BaseWorker
+from .output import OutputBuffer, _CommandOutput, _split_lines
 from ..compat import RLock, monotonic
 
 __all__ = [
     "BaseCommand"
 ]
 
+# Seconds to read for at a time while streaming output
+# so that chunks are yielded soon after they're read.
+_STREAM_READ_TIMEOUT = 0.05
 
-class BaseCommand(object):
+
+class BaseCommand(_CommandOutput):
     def __init__(self, worker, command):
         assert isinstance(worker, BaseWorker)
         self._lock = RLock()
@@ -16,8 +21,8 @@ class BaseCommand(object):
 
         self._cancelled = False
         self._exit_status = None
-        self._stdout = b''
-        self._stderr = b''
+        self._stdout = OutputBuffer()
+        self._stderr = OutputBuffer()
         self._callbacks_called = False
         self._callbacks = []
 
@@ -30,12 +35,59 @@ class BaseCommand(object):
     @property
     def stderr(self):
         self._check_exit()
-        return self._stderr
+        return self._stderr.getvalue()
 
     @property
     def stdout(self):
         self._check_exit()
-        return self._stdout
+        return self._stdout.getvalue()
+
+    @property
+    def stdout_tail(self):
+        """ The stdout that's kept in memory which is the last
+        `max_bytes` if output retention has been limited. """
+        self._check_exit()
+        return self._stdout.tail()
+
+    @property
+    def stderr_tail(self):
+        self._check_exit()
+        return self._stderr.tail()
+
+    def iter_lines(self, timeout=None, stderr=False):
+        """ Yields each line of stdout, or stderr, as soon as it's
+        complete including the line ending. The last line is yielded
+        without an ending once the command completes. """
+        pending = []
+        for chunk in self._iter_output(self._stderr if stderr else self._stdout, timeout):
+            for line in _split_lines(chunk, pending):
+                yield line
+        if pending and not self._is_not_complete():
+            yield b''.join(pending)
+
+    def _iter_output(self, output, timeout):
+        subscriber = output.subscribe()
+        try:
+            end_time = None if timeout is None else monotonic() + timeout
+            while True:
+                while subscriber:
+                    yield subscriber.popleft()
+                if self._cancelled:
+                    break
+                if not self._is_not_complete():
+                    self._on_complete()
+                    while subscriber:
+                        yield subscriber.popleft()
+                    break
+                read_timeout = _STREAM_READ_TIMEOUT
+                if end_time is not None:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0.0:
+                        break
+                    read_timeout = min(read_timeout, remaining)
+                self._read_all(read_timeout)
+        finally:
+            output.unsubscribe(subscriber)
 
     @property
     def exit_status(self):
@@ -46,7 +98,7 @@ class BaseCommand(object):
         start_time = monotonic()
         read_timeout = timeout
         not_complete = self._is_not_complete()
-        while self._is_not_complete():
+        while self._is_not_complete() and not self._cancelled:
             self._read_all(read_timeout)
             if timeout is not None:
                 current_time = monotonic()
@@ -62,6 +114,12 @@ class BaseCommand(object):
     def _read_all(self, timeout=0.0):
         raise NotImplementedError()
 
+    def _fileno(self):
+        """ File descriptor that's readable whenever `_read_all(0.0)`
+        would read more output so an event loop can wait on it, or None
+        if the command has to be waited on by calling `_read_all()`. """
+        return None
+
     def cancel(self):
         raise NotImplementedError()
 
@@ -10,6 +10,10 @@ __all__ = [
     "FileAttributes"
 ]
 _VERSION_INFO_REGEX = re.compile(b'^\((\d+), (\d+), (\d+).*$')
+_CPU_COUNT_REGEX = re.compile(br'^(\d+)$')
+
+# Number of commands a worker tracks before pruning completed commands.
+_MIN_COMMANDS_PRUNED = 64
 
 
 FileAttributes = namedtuple("FileAttributes", ["st_mode",
@@ -30,14 +34,19 @@ class BaseWorker(object):
         self.user = user
         self.host = host
         self.environ = {}
+        self.labels = set()
 
         self._dist_info = None
         self._tempdir = None
         self._python_version = None
         self._python_executable = None
+        self._slots = None
         self._virtualenv_path = None
         self._pool = None
         self._commands = []
+        self._commands_pruned = 0
+        self._output_max_bytes = None
+        self._output_spill = False
         self._closed = False
 
     def __str__(self):
@@ -49,6 +58,29 @@ class BaseWorker(object):
     def execute(self, command, environment=None):
         raise NotImplementedError()
 
+    def set_output_retention(self, max_bytes=None, spill=False):
+        """ Limits the output that's kept in memory for each command
+        executed from now on. See `BaseCommand.set_output_retention()`. """
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must not be negative.")
+        with self._lock:
+            self._output_max_bytes = max_bytes
+            self._output_spill = spill
+
+    def _add_command(self, command):
+        """ Tracks a command so that it's cancelled when the worker is
+        closed. Commands that have completed are no longer tracked once
+        twice as many commands are tracked as after the last pruning
+        so that the list doesn't keep every command alive. """
+        with self._lock:
+            if self._output_max_bytes is not None or self._output_spill:
+                command.set_output_retention(self._output_max_bytes, self._output_spill)
+            if len(self._commands) >= max(_MIN_COMMANDS_PRUNED, 2 * self._commands_pruned):
+                self._commands = [other for other in self._commands
+                                  if not other.cancelled and other._is_not_complete()]
+                self._commands_pruned = len(self._commands)
+            self._commands.append(command)
+
     @property
     def pool(self):
         return self._pool
@@ -137,6 +169,29 @@ class BaseWorker(object):
                         self._python_version = tuple(int(x) for x in match.groups())
         return self._python_version
 
+    @property
+    def slots(self):
+        """ Number of slots of capacity the worker has for jobs running
+        at the same time. Unless it's been set this is the number of
+        CPUs on the host or 1 if that can't be found. """
+        if self._slots is None:
+            with self._lock:
+                if self._slots is None:
+                    cpu_count_code = ("import multiprocessing, sys; "
+                                      "sys.stdout.write(str(multiprocessing.cpu_count()))")
+                    command = self.execute_python(cpu_count_code)
+                    command.wait(1.0)
+                    match = _CPU_COUNT_REGEX.match(command.stdout.strip())
+                    self._slots = max(1, int(match.group(1))) if match else 1
+        return self._slots
+
+    @slots.setter
+    def slots(self, slots):
+        if slots < 1:
+            raise ValueError("Worker must have at least one slot.")
+        with self._lock:
+            self._slots = slots
+
     @property
     def python_executable(self):
         if self._python_executable is None:
@@ -175,3 +230,4 @@ class BaseWorker(object):
                     command.cancel()
                 except ValueError:
                     pass
+                command.close()
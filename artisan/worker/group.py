@@ -1,5 +1,6 @@
 import threading
 from .base_worker import BaseWorker
+from ..scheduler.label_index import LabelIndex
 
 __all__ = [
     "WorkerGroup"
@@ -34,11 +35,21 @@ class WorkerGroup(object):
         self._workers = []
         self._locks = {}
         self._barriers = {}
+        self._label_index = LabelIndex()
 
     @property
     def workers(self):
         return self._workers[:]
 
+    @property
+    def label_index(self):
+        return self._label_index
+
+    def find_workers(self, label_expr):
+        """ Returns the set of workers in the group that
+        match a LabelExpr or a string expression. """
+        return self._label_index.find_workers(label_expr)
+
     def add_worker(self, worker):
         if not isinstance(worker, BaseWorker):
             raise ValueError("Non-worker added to WorkerGroup.")
@@ -47,6 +58,7 @@ class WorkerGroup(object):
                 raise ValueError("Worker already in this group.")
             with worker._lock:
                 self._workers.append(worker)
+                self._label_index.add_worker(worker)
 
     def remove_worker(self, worker):
         with self._lock:
@@ -54,6 +66,7 @@ class WorkerGroup(object):
                 raise ValueError("Worker is not in this group.")
             with worker._lock:
                 self._workers.remove(worker)
+                self._label_index.remove_worker(worker)
 
     def create_lock(self, name):
         with self._lock:
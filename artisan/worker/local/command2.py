@@ -81,9 +81,9 @@ class LocalCommand(BaseCommand):
                 stdout = b''.join(stdout)
                 stderr = b''.join(stderr)
                 if stdout:
-                    self._stdout += stdout
+                    self._stdout.append(stdout)
                 if stderr:
-                    self._stderr += stderr
+                    self._stderr.append(stderr)
                 if stdout or stderr or self._exit_status is not None:
                     return self._exit_status, stdout, stderr
 
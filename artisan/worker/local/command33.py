@@ -38,9 +38,9 @@ class LocalCommand(BaseCommand):
                 if self._proc and self._proc.returncode is not None:
                     self._exit_status = self._proc.returncode
             if stdout:
-                self._stdout += stdout
+                self._stdout.append(stdout)
             if stderr:
-                self._stderr += stderr
+                self._stderr.append(stderr)
             return self._exit_status, stdout, stderr
 
     def cancel(self):
@@ -0,0 +1,135 @@
+""" Worker implementation for Python 3.4+ on POSIX which
+reads the pipes of every command with a shared reactor
+and waits for commands to complete without polling. """
+import os
+import sys
+import threading
+from .reactor import get_reactor, set_nonblocking
+from ..base_command import BaseCommand
+from ..output import _READ_SIZE
+__all__ = [
+    "LocalCommand"
+]
+
+
+class LocalCommand(BaseCommand):
+    def __init__(self, worker, command, environment=None):
+        super(LocalCommand, self).__init__(worker, command)
+        if environment is None:
+            environment = worker.environ.copy()
+
+        # PATH should be in the environment to be able to find binaries.
+        if "PATH" not in environment and "PATH" in os.environ:
+            environment["PATH"] = os.environ["PATH"]
+
+        # Windows requires this environment variable to be set before executing.
+        if sys.platform == "win32" and "SYSTEMROOT" in os.environ:
+            environment["SYSTEMROOT"] = os.environ["SYSTEMROOT"]
+
+        # Notified whenever output is read or the command completes.
+        self._changed = threading.Condition(threading.Lock())
+        self._finished = threading.Event()
+        self._open_streams = 2
+        self._returncode = None
+
+        self._proc = self._create_subprocess(environment)
+
+        # A pidfd becomes readable when the process exits. Without
+        # one the process is polled once both pipes are closed. It's
+        # opened before the pipes are registered since the readers
+        # check for it as soon as a pipe is closed.
+        self._pidfd = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                self._pidfd = os.pidfd_open(self._proc.pid)
+            except OSError:
+                pass
+
+        reactor = get_reactor()
+        for stream, output in ((self._proc.stdout, self._stdout),
+                               (self._proc.stderr, self._stderr)):
+            set_nonblocking(stream.fileno())
+            reactor.register(stream, self._reader(stream, output))
+        if self._pidfd is not None:
+            reactor.register(self._pidfd, self._poll_exit)
+
+    def _reader(self, stream, output):
+        fd = stream.fileno()
+
+        def read():
+            try:
+                data = os.read(fd, _READ_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                data = b''
+            if data:
+                try:
+                    output.append(data)
+                except Exception:
+                    # Output callbacks have nowhere to raise to from the
+                    # reactor thread and mustn't stop the pipe being read.
+                    pass
+                self._notify()
+                return True
+
+            with self._changed:
+                self._open_streams -= 1
+                closed = self._open_streams == 0
+            if closed and self._pidfd is None:
+                get_reactor().add_poll(self._poll_exit)
+            self._check_finished()
+            return False
+        return read
+
+    def _poll_exit(self):
+        """ Returns False once the process has exited. """
+        returncode = self._proc.poll()
+        if returncode is None:
+            return True
+        with self._changed:
+            self._returncode = returncode
+        self._check_finished()
+        return False
+
+    def _check_finished(self):
+        with self._changed:
+            if self._open_streams == 0 and self._returncode is not None:
+                if self._exit_status is None and not self._cancelled:
+                    self._exit_status = self._returncode
+                self._finished.set()
+            self._changed.notify_all()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _read_all(self, timeout=0.0):
+        """ Output is read by the reactor so this only waits
+        up to `timeout` seconds for the command to change. """
+        with self._changed:
+            if not self._finished.is_set() and not self._cancelled and timeout != 0.0:
+                self._changed.wait(timeout)
+            return self._exit_status, b'', b''
+
+    def _is_not_complete(self):
+        return not self._finished.is_set() or self._exit_status is None
+
+    def wait(self, timeout=None):
+        not_complete = self._is_not_complete()
+        if not self._cancelled:
+            self._finished.wait(timeout)
+        if not_complete:
+            self._on_complete()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                raise ValueError("Command is already cancelled.")
+            with self._changed:
+                self._cancelled = True
+                self._changed.notify_all()
+            try:
+                self._proc.kill()
+            except OSError:
+                pass
@@ -0,0 +1,127 @@
+""" Reactor that waits on the pipes of every LocalCommand with a
+single selector in one thread rather than a thread or a polling
+loop for each command. Requires the `selectors` module. """
+import errno
+import fcntl
+import os
+import selectors
+import threading
+
+__all__ = [
+    "get_reactor",
+    "set_nonblocking"
+]
+
+# Seconds between calls to poll functions.
+_POLL_INTERVAL = 0.01
+
+_reactor = None
+_reactor_lock = threading.Lock()
+
+
+def get_reactor():
+    """ Returns the reactor that's shared by every LocalCommand,
+    starting its thread the first time it's called. """
+    global _reactor
+    if _reactor is None:
+        with _reactor_lock:
+            if _reactor is None:
+                _reactor = _Reactor()
+    return _reactor
+
+
+class _Reactor(object):
+    """ Calls a function whenever a registered file is readable.
+    Files are unregistered and closed once their function returns
+    False. Poll functions are called every `_POLL_INTERVAL` seconds
+    until they return False for things that can't be waited on. """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._pending = []
+        self._polls = []
+
+        # Writing to this pipe wakes the thread so that it
+        # picks up files that were registered from other threads.
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        for fd in (self._wakeup_read, self._wakeup_write):
+            set_nonblocking(fd)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def register(self, fileobj, callback):
+        """ Calls `callback` from the reactor thread every time `fileobj`
+        is readable until it returns False. `fileobj` is then closed. """
+        with self._lock:
+            self._pending.append((fileobj, callback))
+        self._wakeup()
+
+    def add_poll(self, callback):
+        """ Calls `callback` from the reactor thread
+        repeatedly until it returns False. """
+        with self._lock:
+            self._pending.append((None, callback))
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_write, b'\0')
+        except OSError as e:
+            # The pipe is full so the thread is going to wake anyways.
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _run(self):
+        while True:
+            with self._lock:
+                pending = self._pending
+                self._pending = []
+            for fileobj, callback in pending:
+                if fileobj is None:
+                    self._polls.append(callback)
+                else:
+                    self._selector.register(fileobj, selectors.EVENT_READ, callback)
+
+            for key, _ in self._selector.select(_POLL_INTERVAL if self._polls else None):
+                if key.data is None:
+                    self._drain_wakeup()
+                elif not self._call(key.data):
+                    self._selector.unregister(key.fileobj)
+                    _close(key.fileobj)
+
+            if self._polls:
+                self._polls = [callback for callback in self._polls if self._call(callback)]
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+
+    def _call(self, callback):
+        """ An error must not stop the thread so the
+        callback is dropped if it raises. """
+        try:
+            return callback()
+        except Exception:
+            return False
+
+
+def set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+def _close(fileobj):
+    try:
+        if isinstance(fileobj, int):
+            os.close(fileobj)
+        else:
+            fileobj.close()
+    except OSError:
+        pass
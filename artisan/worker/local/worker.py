@@ -7,7 +7,9 @@ from ..base_worker import BaseWorker, FileAttributes
 from ..getuser import getuser
 
 # Use LocalCommand implementation based on Python version.
-if sys.version_info >= (3, 3):
+if sys.version_info >= (3, 4) and sys.platform != "win32":
+    from .command34 import LocalCommand
+elif sys.version_info >= (3, 3):
     from .command33 import LocalCommand
 else:
     from .command2 import LocalCommand
@@ -88,7 +90,7 @@ class LocalWorker(BaseWorker):
 
     def execute(self, command, environment=None):
         command = LocalCommand(self, command, environment)
-        self._commands.append(command)
+        self._add_command(command)
         return command
 
     def _find_python_executable(self):
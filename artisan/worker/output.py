@@ -0,0 +1,234 @@
+""" Buffer for the output of a command that stores chunks
+as they're read instead of building a new bytes object for
+every read and hands each chunk to streaming consumers. """
+import tempfile
+import threading
+from collections import deque
+
+__all__ = [
+    "OutputBuffer"
+]
+
+# Bytes to read from a pipe or channel at a time.
+_READ_SIZE = 65536
+
+
+def _split_lines(chunk, pending):
+    """ Returns the lines that are completed by `chunk` and leaves
+    the rest of it in `pending`, a list of the incomplete line. """
+    lines = []
+    start = 0
+    end = chunk.find(b'\n')
+    while end != -1:
+        pending.append(chunk[start:end + 1])
+        lines.append(b''.join(pending))
+        del pending[:]
+        start = end + 1
+        end = chunk.find(b'\n', start)
+    if start < len(chunk):
+        pending.append(chunk[start:])
+    return lines
+
+
+class OutputBuffer(object):
+    """ Keeps the chunks appended to it in a deque which are only
+    joined when the whole output is requested. Every subscriber gets
+    a deque of chunks it hasn't consumed yet and callbacks are called
+    with each chunk. If `retain` is False chunks are only kept until
+    every subscriber has consumed them.
+
+    Retention can be limited with `set_limit()` to the last bytes of
+    output and the whole output can be spilled to a temporary file
+    instead of being kept in memory. """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chunks = deque()
+        self._size = 0
+        self._total_size = 0
+        self._max_size = None
+        self._spill_file = None
+        self._retain = True
+        self._subscribers = []
+        self._callbacks = []
+
+    @property
+    def size(self):
+        """ Number of bytes being retained in memory. """
+        return self._size
+
+    @property
+    def total_size(self):
+        """ Number of bytes that have been appended. """
+        return self._total_size
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def spilled(self):
+        return self._spill_file is not None
+
+    def set_limit(self, max_size=None, spill=False):
+        """ Only keeps the last `max_size` bytes in memory. If `spill`
+        is True every chunk retained from now on is also written to a
+        temporary file which `getvalue()` reads back from so the whole
+        output is still available. """
+        if max_size is not None and max_size < 0:
+            raise ValueError("max_size must not be negative.")
+        with self._lock:
+            self._max_size = max_size
+            if spill and self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile(prefix="artisan-output-")
+                for chunk in self._chunks:
+                    self._spill_file.write(chunk)
+            self._trim()
+
+    def close(self):
+        """ Closes and removes the spill file if there is one. """
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    @property
+    def retain(self):
+        return self._retain
+
+    @retain.setter
+    def retain(self, retain):
+        with self._lock:
+            self._retain = retain
+            if not retain:
+                self._chunks = deque()
+                self._size = 0
+
+    def append(self, data):
+        if not data:
+            return
+        with self._lock:
+            self._total_size += len(data)
+            if self._retain:
+                self._chunks.append(data)
+                self._size += len(data)
+                if self._spill_file is not None:
+                    self._spill_file.write(data)
+                self._trim()
+            for subscriber in self._subscribers:
+                subscriber.append(data)
+            callbacks = self._callbacks[:]
+        for callback in callbacks:
+            callback(data)
+
+    def _trim(self):
+        """ Drops the oldest bytes over `max_size` from memory. """
+        if self._max_size is None:
+            return
+        while self._size > self._max_size:
+            excess = self._size - self._max_size
+            chunk = self._chunks[0]
+            if len(chunk) <= excess:
+                self._chunks.popleft()
+                self._size -= len(chunk)
+            else:
+                self._chunks[0] = chunk[excess:]
+                self._size -= excess
+
+    def getvalue(self):
+        """ Returns the retained output as one bytes object. This is
+        read from the spill file if output is being spilled. """
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.flush()
+                self._spill_file.seek(0)
+                try:
+                    return self._spill_file.read()
+                finally:
+                    self._spill_file.seek(0, 2)
+            return self._tail()
+
+    def tail(self):
+        """ Returns the output that's retained in memory which
+        is the last `max_size` bytes if there's a limit. """
+        with self._lock:
+            return self._tail()
+
+    def _tail(self):
+        if len(self._chunks) > 1:
+            self._chunks = deque([b''.join(self._chunks)])
+        return self._chunks[0] if self._chunks else b''
+
+    def subscribe(self):
+        """ Returns a deque which starts with the retained chunks and
+        has every chunk appended afterwards added to it until it's
+        passed to `unsubscribe()`. """
+        with self._lock:
+            subscriber = deque(self._chunks)
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for i, other in enumerate(self._subscribers):
+                if other is subscriber:
+                    del self._subscribers[i]
+                    break
+
+    def add_callback(self, callback):
+        """ Adds a function which is called with every chunk that's appended. """
+        with self._lock:
+            self._callbacks.append(callback)
+
+
+class _CommandOutput(object):
+    """ Output methods shared by blocking and asyncio commands. Classes
+    using it set `_stdout` and `_stderr` to OutputBuffers and implement
+    `_iter_output()` to stream the chunks of one of them. """
+    @property
+    def retain_output(self):
+        """ If False output isn't kept for `stdout` and `stderr` once
+        it's been given to iterators and callbacks. Output that has
+        already been kept is dropped when this is set to False. """
+        return self._stdout.retain
+
+    @retain_output.setter
+    def retain_output(self, retain):
+        self._stdout.retain = retain
+        self._stderr.retain = retain
+
+    def set_output_retention(self, max_bytes=None, spill=False):
+        """ Only keeps the last `max_bytes` of stdout and of stderr in
+        memory. If `spill` is True all of the output is also written to
+        temporary files and `stdout` and `stderr` read the whole output
+        back from them when they're accessed. """
+        self._stdout.set_limit(max_bytes, spill)
+        self._stderr.set_limit(max_bytes, spill)
+
+    def close(self):
+        """ Closes and removes the temporary files that output has
+        been spilled to. Only the output kept in memory is available
+        from `stdout` and `stderr` afterwards. The command isn't cancelled. """
+        self._stdout.close()
+        self._stderr.close()
+
+    def add_stdout_callback(self, callback):
+        """ Adds a function which is called with
+        every chunk of stdout as it's read. """
+        self._stdout.add_callback(callback)
+
+    def add_stderr_callback(self, callback):
+        """ Same as `add_stdout_callback()` for stderr. """
+        self._stderr.add_callback(callback)
+
+    def iter_stdout(self, timeout=None):
+        """ Yields chunks of stdout as they're read until the command
+        completes or `timeout` seconds pass. Output that was already
+        read is yielded first if output is being retained. """
+        return self._iter_output(self._stdout, timeout)
+
+    def iter_stderr(self, timeout=None):
+        """ Same as `iter_stdout()` for stderr. """
+        return self._iter_output(self._stderr, timeout)
+
+    def _iter_output(self, output, timeout):
+        raise NotImplementedError()
@@ -1,20 +1,84 @@
-from ..compat import Semaphore, Lock
+import heapq
+import itertools
+import threading
+from collections import deque, namedtuple
+from ..compat import Lock, monotonic
+from .group import WorkerGroup
+from ..scheduler.label import LabelExpr, string_to_label_expr
+from ..scheduler.label_index import LabelIndex
 __all__ = [
+    "AcquireStats",
     "WorkerPool"
 ]
 
 
+AcquireStats = namedtuple("AcquireStats", ["acquired",
+                                           "timed_out",
+                                           "waiting",
+                                           "total_wait_time",
+                                           "max_wait_time"])
+
+
+class _Waiter(object):
+    """ Thread waiting in `WorkerPool.acquire()` for capacity. """
+    __slots__ = ["key", "count", "granted", "condition"]
+
+    def __init__(self, key, count, condition):
+        self.key = key
+        self.count = count
+        self.granted = False
+        self.condition = condition
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
 class WorkerPool(object):
     def __init__(self, max_workers, factory, *args, **kwargs):
         self._lock = Lock()
-        self._semaphore = Semaphore(max_workers)
         self._pool = []
         self._max_workers = max_workers
+
+        # Number of workers that are acquired or being built for
+        # an acquire. Can be above `max_workers` after shrinking.
+        self._reserved = 0
+
+        # Threads waiting for capacity ordered by the highest priority
+        # then by tenant fairness tag then in the order they arrived.
+        self._waiters = []
+        self._waiter_counter = itertools.count()
+        self._tenant_fairness = False
+        self._tenant_tags = {}
+        self._virtual_tag = 0
+        self._acquire_stats = {}
+
+        # Slots in use on each worker acquired by `acquire_slot()`.
+        self._slots_used = {}
+        self._slots_available = threading.Condition(self._lock)
         self._factory = factory
         self._args = args
         self._kwargs = kwargs
         self._setup_steps = []
         self._cleanup_steps = []
+        self._label_index = LabelIndex()
+
+        # Released workers waiting to be acquired again
+        # as (worker, release time) with the newest last.
+        self._reuse_workers = False
+        self._max_idle_time = None
+        self._max_uses = None
+        self._health_check = None
+        self._idle = deque()
+        self._uses = {}
+
+        # Background thread that keeps `min_idle` workers ready.
+        self._min_idle = 0
+        self._creation_interval = 0.0
+        self._next_creation_time = 0.0
+        self._creating = 0
+        self._closing = False
+        self._prewarm_thread = None
+        self._prewarm_wakeup = threading.Condition(self._lock)
 
     @property
     def max_workers(self):
@@ -25,7 +89,7 @@ class WorkerPool(object):
         """ Gets the number of workers that
         are free in the pool. """
         with self._lock:
-            return self._max_workers - len(self._pool)
+            return max(0, self._max_workers - len(self._pool))
 
     @property
     def workers_used(self):
@@ -34,28 +98,493 @@ class WorkerPool(object):
         with self._lock:
             return len(self._pool)
 
-    def _create_new_worker(self):
-        """ Creates a new worker from the
-        factory method. """
+    @property
+    def workers_idle(self):
+        """ Gets the number of released workers
+        that are waiting to be acquired again. """
         with self._lock:
-            worker = self._factory(*self._args, **self._kwargs)
-            self._pool.append(worker)
-            return worker
+            return len(self._idle)
 
-    def acquire(self, timeout=None):
-        """ Acquires a worker from the pool. """
-        success = self._semaphore.acquire(timeout=timeout)
-        if not success:
-            return None
-        worker = self._create_new_worker()
-        worker._pool = self
+    @property
+    def workers_waiting(self):
+        """ Gets the number of workers that threads are
+        waiting to acquire while the pool is full. """
+        with self._lock:
+            return sum(waiter.count for waiter in self._waiters)
+
+    @property
+    def label_index(self):
+        return self._label_index
+
+    def find_workers(self, label_expr):
+        """ Returns the set of workers acquired from the pool
+        that match a LabelExpr or a string expression. """
+        return self._label_index.find_workers(label_expr)
+
+    def find_idle_workers(self, label_expr):
+        """ Returns the list of idle workers in the pool
+        that match a LabelExpr or a string expression. """
+        matches = _compile_label_expr(label_expr)
+        with self._lock:
+            return [worker for worker, _ in self._idle if matches(worker.labels)]
+
+    def resize(self, max_workers):
+        """ Changes the maximum number of workers in the pool. When
+        shrinking, idle workers over the new maximum are closed and
+        acquired workers are released as usual but no more workers
+        are acquired until fewer than `max_workers` are in use. """
+        if max_workers < 0:
+            raise ValueError("max_workers must not be negative.")
         with self._lock:
-            for setup_step in self._setup_steps:
+            self._max_workers = max_workers
+            self._grant_waiters()
+            self._prewarm_wakeup.notify()
+            expired = self._pop_expired_workers()
+        self._close_workers(expired)
+
+    def enable_tenant_fairness(self, enabled=True):
+        """ Shares capacity between tenants waiting at the same priority
+        so that a tenant waiting for many workers only gets every other
+        worker while another tenant is waiting instead of every worker
+        until it's done. Without it waiters of equal priority are served
+        in the order they arrived. """
+        with self._lock:
+            self._tenant_fairness = enabled
+            self._tenant_tags.clear()
+            self._virtual_tag = 0
+
+    @property
+    def acquire_stats(self):
+        """ Dictionary from each priority that has been passed to
+        `acquire()` to an AcquireStats of how many acquires succeeded,
+        timed out and are waiting and the seconds spent waiting for
+        capacity. The time building a worker isn't included. """
+        with self._lock:
+            return dict((priority, AcquireStats(*stats))
+                        for priority, stats in self._acquire_stats.items())
+
+    def _reserve(self, timeout, priority=0, tenant=None, count=1):
+        """ Waits up to `timeout` seconds for `count` workers to be
+        free and reserves them. Threads are given capacity strictly in
+        order of priority then fairness then arrival so a thread can't
+        take capacity from a thread that has been waiting longer.
+        Returns True if the workers were reserved. """
+        start_time = monotonic()
+        with self._lock:
+            stats = self._acquire_stats.get(priority)
+            if stats is None:
+                stats = self._acquire_stats[priority] = [0, 0, 0, 0.0, 0.0]
+            if not self._has_waiters() and self._has_capacity(count):
+                self._reserved += count
+                stats[0] += 1
+                return True
+            if timeout is not None and timeout <= 0.0:
+                stats[1] += 1
+                return False
+
+            waiter = _Waiter((-priority, self._fairness_tag(tenant), next(self._waiter_counter)),
+                             count, threading.Condition(self._lock))
+            heapq.heappush(self._waiters, waiter)
+            stats[2] += 1
+
+            # Waiters that are skipped may be all that's in the way.
+            self._grant_waiters()
+            try:
+                end_time = None if timeout is None else start_time + timeout
+                while not waiter.granted:
+                    if end_time is None:
+                        waiter.condition.wait()
+                    else:
+                        remaining = end_time - monotonic()
+                        if remaining <= 0.0:
+                            break
+                        waiter.condition.wait(remaining)
+            finally:
+                stats[2] -= 1
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                    # The waiter may have been blocking the waiters behind it.
+                    self._grant_waiters()
+
+            if not waiter.granted:
+                stats[1] += 1
+                return False
+            wait_time = monotonic() - start_time
+            stats[0] += 1
+            stats[3] += wait_time
+            stats[4] = max(stats[4], wait_time)
+            return True
+
+    def _has_waiters(self):
+        """ Returns True if any waiter could be given capacity
+        before a new caller. Must be called while holding the lock. """
+        return any(waiter.count <= self._max_workers for waiter in self._waiters)
+
+    def _has_capacity(self, count):
+        """ Returns True if `count` more workers can be reserved. Workers
+        being pre-warmed are counted as they'll be idle once they're built.
+        Must be called while holding the lock. """
+        return self._reserved + self._creating + count <= self._max_workers
+
+    def _fairness_tag(self, tenant):
+        """ Tags each waiter of a tenant one after the last waiter of
+        that tenant but never before the tag that's being served so
+        that waiters of different tenants are interleaved. """
+        if not self._tenant_fairness:
+            return 0
+        tag = max(self._tenant_tags.get(tenant, 0), self._virtual_tag) + 1
+        self._tenant_tags[tenant] = tag
+        return tag
+
+    def _grant_waiters(self):
+        """ Gives capacity to the waiters at the head of the queue
+        while there is enough. Waiters for more workers than the pool
+        has, after it has shrunk, are skipped so they don't block the
+        waiters behind them until the pool grows or they time out.
+        Must be called while holding the lock. """
+        skipped = []
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.count > self._max_workers:
+                skipped.append(heapq.heappop(self._waiters))
+                continue
+            if not self._has_capacity(waiter.count):
+                break
+            heapq.heappop(self._waiters)
+            self._reserved += waiter.count
+            self._virtual_tag = max(self._virtual_tag, waiter.key[1])
+            waiter.granted = True
+            waiter.condition.notify()
+        for waiter in skipped:
+            heapq.heappush(self._waiters, waiter)
+        if not self._waiters:
+            self._tenant_tags.clear()
+        self._slots_available.notify_all()
+
+    def _unreserve(self, count=1):
+        with self._lock:
+            self._return_reserved(count)
+
+    def _return_reserved(self, count):
+        """ Frees `count` reserved workers. Must
+        be called while holding the lock. """
+        self._reserved -= count
+        self._grant_waiters()
+
+        # Pre-warming counts reserved workers against `max_workers`.
+        self._prewarm_wakeup.notify()
+
+    def enable_worker_reuse(self, max_idle_time=None, max_uses=None, health_check=None):
+        """ Keeps released workers open so they are acquired again
+        rather than creating a new worker every time. Idle workers
+        are closed after `max_idle_time` seconds and workers are closed
+        once they've been acquired `max_uses` times. `health_check`
+        is called with an idle worker before it's acquired again and
+        the worker is closed instead if it returns False or raises.
+
+        Setup steps are taken once when a worker is created and
+        cleanup steps are taken every time a worker is released. """
+        with self._lock:
+            self._reuse_workers = True
+            self._max_idle_time = max_idle_time
+            self._max_uses = max_uses
+            self._health_check = health_check
+
+    def set_min_idle(self, min_idle, creation_interval=1.0):
+        """ Starts a background thread that keeps `min_idle` workers
+        created, set up and waiting to be acquired, as long as there
+        is capacity in the pool. At most one worker is created every
+        `creation_interval` seconds so hosts aren't flooded with new
+        connections. Enables worker reuse if it's not enabled. The
+        thread also closes idle workers once they've expired. """
+        if min_idle < 0:
+            raise ValueError("min_idle must not be negative.")
+        with self._lock:
+            if self._closing:
+                raise ValueError("WorkerPool is closed.")
+            self._reuse_workers = True
+            self._min_idle = min_idle
+            self._creation_interval = creation_interval
+            if self._prewarm_thread is None:
+                self._prewarm_thread = threading.Thread(target=self._prewarm_workers)
+                self._prewarm_thread.daemon = True
+                self._prewarm_thread.start()
+            self._prewarm_wakeup.notify()
+
+    def close(self):
+        """ Stops keeping idle workers ready and closes every idle
+        worker. Workers that are acquired are closed on release. """
+        with self._lock:
+            self._closing = True
+            self._reuse_workers = False
+            self._prewarm_wakeup.notify_all()
+            thread = self._prewarm_thread
+        if thread is not None:
+            thread.join()
+        self.close_idle_workers()
+
+    def _build_worker(self):
+        """ Creates a worker from the factory method and takes
+        the setup steps. The lock isn't held while doing either so
+        many workers can be built at the same time and threads that
+        acquire idle workers or release workers don't wait. """
+        with self._lock:
+            setup_steps = self._setup_steps[:]
+        worker = self._factory(*self._args, **self._kwargs)
+        worker._pool = self
+        try:
+            for setup_step in setup_steps:
                 setup_step(worker)
+        except Exception:
+            self._close_workers([worker])
+            raise
+        return worker
+
+    def _prewarm_worker(self):
+        """ Builds a worker for the idle cache on its own
+        thread so that slow workers are built in parallel. """
+        worker = None
+        try:
+            worker = self._build_worker()
+        except Exception:
+            # Try again once the creation interval has passed.
+            pass
+        finally:
+            with self._lock:
+                self._creating -= 1
+                closing = self._closing
+                if worker is not None and not closing:
+                    self._idle.append((worker, monotonic()))
+                self._grant_waiters()
+                self._prewarm_wakeup.notify_all()
+        if worker is not None and closing:
+            self._close_workers([worker])
+
+    def _prewarm_workers(self):
+        while True:
+            create = False
+            with self._lock:
+                if self._closing:
+                    return
+                expired = self._pop_expired_workers()
+                now = monotonic()
+                timeout = None
+                # Reserved workers include the ones being built for acquires.
+                total_workers = self._reserved + len(self._idle) + self._creating
+                if len(self._idle) + self._creating < self._min_idle and \
+                        total_workers < self._max_workers:
+                    if now >= self._next_creation_time:
+                        create = True
+                        self._creating += 1
+                        self._next_creation_time = now + self._creation_interval
+                    else:
+                        timeout = self._next_creation_time - now
+                if not create and not expired:
+                    if self._max_idle_time is not None and self._idle:
+                        expire_timeout = self._idle[0][1] + self._max_idle_time - now
+                        if timeout is None or expire_timeout < timeout:
+                            timeout = expire_timeout
+                    self._prewarm_wakeup.wait(timeout)
+                    continue
+
+            self._close_workers(expired)
+            if create:
+                thread = threading.Thread(target=self._prewarm_worker)
+                thread.daemon = True
+                thread.start()
+
+    def close_idle_workers(self):
+        """ Closes every worker that is waiting to be acquired again. """
+        with self._lock:
+            workers = [worker for worker, _ in self._idle]
+            self._idle.clear()
+        self._close_workers(workers)
+
+    def _pop_expired_workers(self):
+        """ Removes idle workers that have been idle for longer than
+        `max_idle_time` and the oldest idle workers if there are more
+        workers than `max_workers`. Must be called while holding the
+        lock. """
+        expired = []
+        if self._max_idle_time is not None:
+            expire_time = monotonic() - self._max_idle_time
+            while self._idle and self._idle[0][1] <= expire_time:
+                expired.append(self._idle.popleft()[0])
+        while self._idle and len(self._pool) + len(self._idle) > self._max_workers:
+            expired.append(self._idle.popleft()[0])
+        if expired:
+            self._prewarm_wakeup.notify()
+        return expired
+
+    def _pop_excess_idle_workers(self):
+        """ Removes the oldest idle workers while there are more
+        workers than `max_workers`, counting the reserved workers that
+        are about to be built. Must be called while holding the lock. """
+        excess = []
+        while self._idle and \
+                self._reserved + self._creating + len(self._idle) > self._max_workers:
+            excess.append(self._idle.popleft()[0])
+        return excess
+
+    def _close_workers(self, workers):
+        for worker in workers:
+            with self._lock:
+                self._uses.pop(worker, None)
+            try:
+                worker.close()
+            except Exception:
+                pass
+
+    def _is_healthy(self, worker):
+        if worker.closed:
+            return False
+        if self._health_check is None:
+            return True
+        try:
+            return bool(self._health_check(worker))
+        except Exception:
+            return False
+
+    def _take_idle_worker(self, label_expr=None):
+        """ Takes the most recently released idle worker that matches
+        `label_expr` and passes the health check. Returns None if
+        there isn't one. """
+        matches = None if label_expr is None else _compile_label_expr(label_expr)
+        while True:
+            with self._lock:
+                expired = self._pop_expired_workers()
+                worker = None
+                for i in range(len(self._idle) - 1, -1, -1):
+                    if matches is None or matches(self._idle[i][0].labels):
+                        worker = self._idle[i][0]
+                        del self._idle[i]
+                        break
+                if worker is not None:
+                    self._prewarm_wakeup.notify()
+            self._close_workers(expired)
+            if worker is None or self._is_healthy(worker):
+                return worker
+            self._close_workers([worker])
+
+    def acquire(self, timeout=None, priority=0, tenant=None, label_expr=None):
+        """ Acquires a worker from the pool. When the pool is full
+        the threads waiting with the highest `priority` get a worker
+        first and threads with equal priority get one in the order they
+        started waiting, or shared between each `tenant` if tenant
+        fairness is enabled. Returns None after `timeout` seconds.
+
+        If `label_expr` is given an idle worker matching it is acquired
+        before any other idle worker, otherwise a new worker is created
+        and the oldest idle workers are closed to keep the pool within
+        `max_workers`. A new worker may not match so callers must check
+        its labels. Workers being pre-warmed count against `max_workers`. """
+        if not self._reserve(timeout, priority, tenant):
+            return None
+        try:
+            worker = self._take_idle_worker(label_expr) if self._reuse_workers else None
+            if worker is None:
+                # Idle workers that don't match make way for the new worker.
+                with self._lock:
+                    excess = self._pop_excess_idle_workers()
+                self._close_workers(excess)
+                worker = self._build_worker()
+        except Exception:
+            self._unreserve()
+            raise
+        self._add_acquired_workers([worker])
         return worker
 
+    def acquire_many(self, count, timeout=None, priority=0, tenant=None):
+        """ Acquires `count` workers at once and returns them in a new
+        WorkerGroup. Capacity for every worker is reserved together so
+        either all of the workers are acquired or none of them are and
+        threads acquiring groups never hold part of a group while waiting
+        for the rest. Workers that have to be created are built in
+        parallel. Returns None after `timeout` seconds. If building any
+        worker fails the other workers are closed and the error is raised. """
+        if count < 1:
+            raise ValueError("Must acquire at least one worker.")
+        if count > self._max_workers:
+            raise ValueError("Can't acquire more than max_workers workers at once.")
+        if not self._reserve(timeout, priority, tenant, count):
+            return None
+        workers = []
+        try:
+            while self._reuse_workers and len(workers) < count:
+                worker = self._take_idle_worker()
+                if worker is None:
+                    break
+                workers.append(worker)
+            with self._lock:
+                excess = self._pop_excess_idle_workers()
+            self._close_workers(excess)
+            workers.extend(self._build_workers(count - len(workers)))
+        except Exception:
+            self._close_workers(workers)
+            self._unreserve(count)
+            raise
+        self._add_acquired_workers(workers)
+        group = WorkerGroup()
+        for worker in workers:
+            group.add_worker(worker)
+        return group
+
+    def release_many(self, workers):
+        """ Releases every worker of a WorkerGroup or a collection
+        of workers. Every worker is released even if releasing one
+        raises, then the first error is raised. """
+        if isinstance(workers, WorkerGroup):
+            workers = workers.workers
+        error = None
+        for worker in workers:
+            try:
+                self.release(worker)
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+    def _build_workers(self, count):
+        """ Builds `count` workers with a thread for each worker after
+        the first. If any fail the rest are closed and an error is raised. """
+        if count <= 1:
+            return [self._build_worker() for _ in range(count)]
+        results = [None] * count
+
+        def build(i):
+            try:
+                results[i] = (self._build_worker(), None)
+            except Exception as e:
+                results[i] = (None, e)
+        threads = [threading.Thread(target=build, args=(i,)) for i in range(1, count)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        build(0)
+        for thread in threads:
+            thread.join()
+
+        workers = [worker for worker, _ in results if worker is not None]
+        for _, error in results:
+            if error is not None:
+                self._close_workers(workers)
+                raise error
+        return workers
+
+    def _add_acquired_workers(self, workers):
+        with self._lock:
+            for worker in workers:
+                self._pool.append(worker)
+                self._uses[worker] = self._uses.get(worker, 0) + 1
+
+                # Setup steps may have given the worker its labels.
+                self._label_index.add_worker(worker)
+
     def release(self, worker):
-        """ Releases a worker back into the pool. """
+        """ Releases a worker back into the pool. The worker
+        is closed unless worker reuse has been enabled. """
         with self._lock:
             for i, other_worker in enumerate(self._pool):
                 if other_worker is worker:
@@ -63,24 +592,120 @@ class WorkerPool(object):
                     break
             else:
                 raise ValueError("Worker is not from this pool.")
-            for cleanup_step in self._cleanup_steps:
+            self._label_index.remove_worker(worker)
+            cleanup_steps = self._cleanup_steps[:]
+
+        try:
+            for cleanup_step in cleanup_steps:
                 cleanup_step(worker)
-            try:
-                worker.close()
-            except Exception:
-                pass
-        self._semaphore.release()
+        except Exception:
+            self._close_workers([worker])
+            self._unreserve()
+            raise
+
+        with self._lock:
+            reuse = (self._reuse_workers and not worker.closed and
+                     (self._max_uses is None or self._uses[worker] < self._max_uses))
+            if reuse:
+                self._idle.append((worker, monotonic()))
+            expired = self._pop_expired_workers()
+
+            # The worker stops being reserved as it becomes idle so
+            # it's never counted twice against `max_workers`.
+            self._return_reserved(1)
+        if not reuse:
+            expired.append(worker)
+        self._close_workers(expired)
+
+    def acquire_slot(self, cost=1, timeout=None, priority=0, tenant=None, label_expr=None):
+        """ Acquires `cost` slots on a worker so that many jobs can share
+        one worker up to its `slots`. Jobs are packed onto the worker
+        acquired through this method with the fewest free slots that
+        still fit `cost` and a new worker is only acquired when none of
+        them fit. A job costing more than a worker's slots gets the whole
+        worker. The worker must be released with `release_slot()` and the
+        same `cost`. Returns None after `timeout` seconds. Only workers
+        matching `label_expr` are shared the same way as `acquire()`. """
+        if cost < 1:
+            raise ValueError("Cost must be at least one slot.")
+        end_time = None if timeout is None else monotonic() + timeout
+        while True:
+            with self._lock:
+                worker = self._find_slot_worker(cost, label_expr)
+                if worker is not None:
+                    self._slots_used[worker] += min(cost, worker.slots)
+                    return worker
+                can_acquire = not self._has_waiters() and self._has_capacity(1)
+
+            if can_acquire:
+                worker = self.acquire(0.0, priority, tenant, label_expr)
+                if worker is not None:
+                    # Probing the slots of a new worker may run a command.
+                    slots = worker.slots
+                    with self._lock:
+                        self._slots_used[worker] = min(cost, slots)
+                        self._slots_available.notify_all()
+                    return worker
+
+            with self._lock:
+                if (self._find_slot_worker(cost, label_expr) is not None or
+                        (not self._has_waiters() and self._has_capacity(1))):
+                    continue
+                if end_time is None:
+                    self._slots_available.wait()
+                else:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0.0:
+                        return None
+                    self._slots_available.wait(remaining)
+
+    def release_slot(self, worker, cost=1):
+        """ Releases `cost` slots of a worker acquired with `acquire_slot()`.
+        The worker is released into the pool once none of its slots are used. """
+        with self._lock:
+            used = self._slots_used.get(worker)
+            if used is None:
+                raise ValueError("Worker wasn't acquired with acquire_slot().")
+            used -= min(cost, worker.slots)
+            if used > 0:
+                self._slots_used[worker] = used
+                self._slots_available.notify_all()
+                return
+            del self._slots_used[worker]
+        self.release(worker)
+
+    def _find_slot_worker(self, cost, label_expr=None):
+        """ Returns the worker matching `label_expr` with the fewest free
+        slots that fit `cost` or None. Must be called while holding the lock. """
+        matches = None if label_expr is None else _compile_label_expr(label_expr)
+        best_worker = None
+        best_free = None
+        for worker, used in self._slots_used.items():
+            free = worker.slots - used
+            if free >= cost and not worker.closed and (best_free is None or free < best_free) \
+                    and (matches is None or matches(worker.labels)):
+                best_worker = worker
+                best_free = free
+        return best_worker
 
     def add_worker_setup_step(self, func):
         """ Adds a step that is taken whenever a worker
-        is acquired from the pool. The only parameter
-        for the function is the reserved worker. """
+        is created for the pool before it's acquired. The
+        only parameter for the function is the new worker.
+        Steps may be taken for many workers at once. """
         with self._lock:
             self._setup_steps.append(func)
 
     def add_worker_cleanup_step(self, func):
         """ Adds a step that is taken whenever a worker
         is released into the pool. The only parameter
-        for the function is the released worker. """
+        for the function is the released worker.
+        Steps may be taken for many workers at once. """
         with self._lock:
             self._cleanup_steps.append(func)
+
+
+def _compile_label_expr(label_expr):
+    if not isinstance(label_expr, LabelExpr):
+        label_expr = string_to_label_expr(label_expr)
+    return label_expr.compile()
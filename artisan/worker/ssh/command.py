@@ -1,5 +1,8 @@
+import math
+import select
 import paramiko
 from ..base_command import BaseCommand
+from ..output import _READ_SIZE
 from ...compat import monotonic
 
 __all__ = [
@@ -18,51 +21,85 @@ class SshCommand(BaseCommand):
         self._channel = stdout_file.channel
 
     def _read_all(self, timeout=0.0):
+        """ Reads whatever the channel has buffered then blocks on the
+        channel's file descriptor, which is readable while it has stdout
+        or stderr buffered, until more is received or `timeout` seconds
+        pass. Once the remote end has sent EOF the exit status is waited
+        for on the channel's status event instead. """
         with self._lock:
-            if self._channel is None:
+            channel = self._channel
+            if channel is None:
                 return self._exit_status, b'', b''
-            if timeout is None:
-                self._channel.setblocking(True)
-            else:
-                self._channel.setblocking(False)
-            start_time = monotonic()
+            end_time = None if timeout is None else monotonic() + timeout
             stdout = []
             stderr = []
             try:
                 while True:
-                    if self._channel.recv_ready():
-                        stdout.append(self._channel.recv(8192))
-                    if self._channel.recv_stderr_ready():
-                        stderr.append(self._channel.recv_stderr(8192))
-                    if self._channel.exit_status_ready():
-                        self._exit_status = self._channel.recv_exit_status()
+                    self._recv_ready(channel, stdout, stderr)
+                    if self._cancelled:
                         break
-                    if timeout is None or monotonic() - start_time > timeout:
+                    if channel.exit_status_ready():
+                        self._exit_status = channel.recv_exit_status()
+                        self._recv_ready(channel, stdout, stderr)
                         break
-            except paramiko.SSHException:
-                pass
-
-            # One last attempt to read from the channel.
-            try:
-                if self._channel.recv_ready():
-                    stdout.append(self._channel.recv(8192))
-                if self._channel.recv_stderr_ready():
-                    stderr.append(self._channel.recv_stderr(8192))
-            except paramiko.SSHException:
+                    remaining = None
+                    if end_time is not None:
+                        remaining = end_time - monotonic()
+                        if remaining <= 0.0:
+                            break
+                    if channel.eof_received:
+                        # The descriptor stays readable after EOF.
+                        channel.status_event.wait(remaining)
+                    elif not stdout and not stderr:
+                        _wait_readable(channel.fileno(), remaining)
+                    else:
+                        break
+            except (paramiko.SSHException, EnvironmentError):
                 pass
 
             stdout = b''.join(stdout)
             stderr = b''.join(stderr)
 
-            self._stdout += stdout
-            self._stderr += stderr
+            self._stdout.append(stdout)
+            self._stderr.append(stderr)
 
             return self._exit_status, stdout, stderr
 
+    def _fileno(self):
+        # The descriptor stays readable after EOF so the exit
+        # status has to be waited for on the status event.
+        channel = self._channel
+        if channel is None or channel.eof_received or channel.closed:
+            return None
+        return channel.fileno()
+
+    def _recv_ready(self, channel, stdout, stderr):
+        while channel.recv_ready():
+            stdout.append(channel.recv(_READ_SIZE))
+        while channel.recv_stderr_ready():
+            stderr.append(channel.recv_stderr(_READ_SIZE))
+
     def cancel(self):
+        channel = self._channel
+        if self._cancelled:
+            raise ValueError("Command is already cancelled.")
+        self._cancelled = True
+
+        # Closing the channel wakes any thread that's waiting on it
+        # so the channel is closed before waiting for the lock.
+        if channel is not None:
+            channel.close()
         with self._lock:
-            if self._cancelled:
-                raise ValueError("Command is already cancelled.")
-            self._channel.close()
             self._channel = None
-            self._cancelled = True
+
+
+def _wait_readable(fd, timeout):
+    """ Blocks until `fd` is readable or `timeout` seconds pass.
+    poll() is used where it's available because select()
+    can't wait on descriptors above FD_SETSIZE. """
+    if hasattr(select, "poll"):
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        poller.poll(None if timeout is None else int(math.ceil(timeout * 1000)))
+    else:
+        select.select([fd], [], [], timeout)
@@ -19,7 +19,7 @@ class SshWorker(BaseWorker):
 
     def execute(self, command, environment=None):
         command = SshCommand(self._ssh, self, command)
-        self._commands.append(command)
+        self._add_command(command)
         return command
 
     def close(self):
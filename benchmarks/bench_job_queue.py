@@ -0,0 +1,133 @@
+""" Benchmark for pushing and popping Jobs through the
+heap-backed JobQueue compared to the list-backed JobQueue
+that it replaced, and through JobQueue.push_jobs() and
+JobQueue.pop_jobs() in batches of 1000.
+
+    python -m benchmarks.bench_job_queue --jobs 1000000
+
+The list-backed implementation is O(n) per push and pop so
+it is only run up to `--list-limit` jobs by default. """
+import argparse
+import random
+import threading
+from artisan.compat import monotonic
+from artisan.scheduler import Job, JobQueue
+
+
+class ListJobQueue(object):
+    """ The list-backed JobQueue implementation kept
+    here only as a reference for comparison. """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._job_queue = []
+        self._job_priority = []
+        self._priority_rules = []
+
+    def add_priority_rule(self, func):
+        self._priority_rules.append(func)
+
+    def push_job(self, job):
+        with self._lock:
+            priority = 0.0
+            for rule in self._priority_rules:
+                priority += rule(job)
+            job_len = len(self._job_priority)
+            if not job_len:
+                self._job_priority.append(priority)
+                self._job_queue.append(job)
+            else:
+                for i in range(job_len):
+                    if self._job_priority[i] < priority:
+                        self._job_priority.insert(i, priority)
+                        self._job_queue.insert(i, job)
+                        break
+                else:
+                    self._job_priority.append(priority)
+                    self._job_queue.append(job)
+
+    def pop_job(self):
+        with self._lock:
+            if not self._job_queue:
+                return None
+            job = self._job_queue[0]
+            del self._job_queue[0]
+            del self._job_priority[0]
+            return job
+
+
+class WeightedJob(Job):
+    def __init__(self, weight):
+        super(WeightedJob, self).__init__()
+        self.weight = weight
+
+
+def weight_rule(job):
+    return job.weight
+
+
+def run_benchmark(queue_type, jobs):
+    queue = queue_type()
+    queue.add_priority_rule(weight_rule)
+
+    start_time = monotonic()
+    for job in jobs:
+        queue.push_job(job)
+    push_time = monotonic() - start_time
+
+    start_time = monotonic()
+    for _ in range(len(jobs)):
+        queue.pop_job()
+    pop_time = monotonic() - start_time
+
+    return push_time, pop_time
+
+
+def run_bulk_benchmark(jobs, batch_size=1000):
+    queue = JobQueue()
+    queue.add_priority_rule(weight_rule)
+
+    start_time = monotonic()
+    for i in range(0, len(jobs), batch_size):
+        queue.push_jobs(jobs[i:i + batch_size])
+    push_time = monotonic() - start_time
+
+    start_time = monotonic()
+    while queue.pop_jobs(batch_size):
+        pass
+    pop_time = monotonic() - start_time
+
+    return push_time, pop_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--jobs", type=int, default=1000000,
+                        help="Number of jobs to push and pop.")
+    parser.add_argument("--list-limit", type=int, default=20000,
+                        help="Largest number of jobs to run against the list-backed queue.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rand = random.Random(args.seed)
+    sizes = []
+    size = 1000
+    while size < args.jobs:
+        sizes.append(size)
+        size *= 10
+    sizes.append(args.jobs)
+
+    print("%10s %14s %12s %12s" % ("jobs", "queue", "push (s)", "pop (s)"))
+    for size in sizes:
+        jobs = [WeightedJob(rand.randint(0, 100)) for _ in range(size)]
+        for name, queue_type in [("list", ListJobQueue), ("heap", JobQueue)]:
+            if queue_type is ListJobQueue and size > args.list_limit:
+                print("%10d %14s %12s %12s" % (size, name, "skipped", "skipped"))
+                continue
+            push_time, pop_time = run_benchmark(queue_type, jobs)
+            print("%10d %14s %12.3f %12.3f" % (size, name, push_time, pop_time))
+        push_time, pop_time = run_bulk_benchmark(jobs)
+        print("%10d %14s %12.3f %12.3f" % (size, "heap (bulk)", push_time, pop_time))
+
+
+if __name__ == "__main__":
+    main()
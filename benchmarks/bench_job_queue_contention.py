@@ -0,0 +1,85 @@
+""" Benchmark for many producer and consumer threads pushing
+and popping Jobs through a JobQueue and a ShardedJobQueue.
+
+    python -m benchmarks.bench_job_queue_contention --producers 8 --consumers 64
+
+Consumers check `empty` between blocking pops to know when
+every producer has finished. """
+import argparse
+import random
+import threading
+from artisan.compat import monotonic
+from artisan.scheduler import Job, JobQueue, ShardedJobQueue
+
+
+class WeightedJob(Job):
+    def __init__(self, weight):
+        super(WeightedJob, self).__init__()
+        self.weight = weight
+
+
+def weight_rule(job):
+    return job.weight
+
+
+def run_benchmark(queue, jobs, producers, consumers):
+    queue.add_priority_rule(weight_rule)
+    popped = [0] * consumers
+    done = threading.Event()
+
+    def produce(index):
+        for job in jobs[index::producers]:
+            queue.push_job(job)
+
+    def consume(index):
+        count = 0
+        while True:
+            if queue.empty and done.is_set():
+                break
+            if queue.pop_job(block=True, timeout=0.01) is not None:
+                count += 1
+        popped[index] = count
+
+    producer_threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    consumer_threads = [threading.Thread(target=consume, args=(i,)) for i in range(consumers)]
+
+    start_time = monotonic()
+    for thread in consumer_threads + producer_threads:
+        thread.start()
+    for thread in producer_threads:
+        thread.join()
+    done.set()
+    for thread in consumer_threads:
+        thread.join()
+    elapsed = monotonic() - start_time
+
+    assert sum(popped) == len(jobs)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--jobs", type=int, default=200000)
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--consumers", type=int, default=64)
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 4, 16])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rand = random.Random(args.seed)
+    jobs = [WeightedJob(rand.randint(0, 100)) for _ in range(args.jobs)]
+
+    queues = [("JobQueue", JobQueue)]
+    for shards in args.shards:
+        queues.append(("ShardedJobQueue(%d)" % shards,
+                       lambda shards=shards: ShardedJobQueue(shards)))
+
+    print("%d jobs, %d producers, %d consumers" % (args.jobs, args.producers, args.consumers))
+    print("%22s %12s %14s" % ("queue", "time (s)", "jobs / s"))
+    for name, queue_type in queues:
+        elapsed = run_benchmark(queue_type(), jobs, args.producers, args.consumers)
+        print("%22s %12.3f %14.0f" % (name, elapsed, len(jobs) / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+""" Micro-benchmark for evaluating deep LabelExprs with
+LabelExpr.matches() compared to the function returned
+by LabelExpr.compile().
+
+    python -m benchmarks.bench_label_expr --evaluations 10000 """
+import argparse
+import random
+from artisan.compat import monotonic
+from artisan.scheduler import Label
+
+
+def chain_expr(depth):
+    """ `0 & 1 & 2 & ... & depth` """
+    label_expr = Label("0")
+    for i in range(1, depth):
+        label_expr = label_expr & Label(str(i))
+    return label_expr
+
+
+def balanced_expr(depth, rand):
+    """ Full binary tree of random `&`, `|` and `~` operators. """
+    if depth == 0:
+        return Label(str(rand.randint(0, 31)))
+    left = balanced_expr(depth - 1, rand)
+    right = balanced_expr(depth - 1, rand)
+    if rand.random() < 0.2:
+        left = ~left
+    return left & right if rand.random() < 0.5 else left | right
+
+
+def nested_expr(depth):
+    """ Alternates `&`, `|` and `~` at every level. """
+    label_expr = Label("0")
+    for i in range(1, depth):
+        if i % 2:
+            label_expr = Label(str(i)) & label_expr
+        else:
+            label_expr = ~(Label(str(i)) | label_expr)
+    return label_expr
+
+
+def time_evaluations(func, label_sets, evaluations):
+    start_time = monotonic()
+    for i in range(evaluations):
+        func(label_sets[i % len(label_sets)])
+    return monotonic() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--evaluations", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rand = random.Random(args.seed)
+    label_sets = [[str(i) for i in range(32) if rand.random() < 0.7] for _ in range(64)]
+    expressions = [("chain (64)", chain_expr(64)),
+                   ("balanced (depth 8)", balanced_expr(8, rand)),
+                   ("nested (depth 64)", nested_expr(64))]
+
+    print("%20s %14s %14s %10s" % ("expression", "matches (s)", "compiled (s)", "speedup"))
+    for name, label_expr in expressions:
+        compile_time = monotonic()
+        evaluate = label_expr.compile()
+        compile_time = monotonic() - compile_time
+        for labels in label_sets:
+            assert evaluate(labels) == label_expr.matches(labels)
+        matches_time = time_evaluations(label_expr.matches, label_sets, args.evaluations)
+        compiled_time = time_evaluations(evaluate, label_sets, args.evaluations)
+        speedup = matches_time / compiled_time
+        print("%20s %14.3f %14.3f %9.1fx" % (name, matches_time, compiled_time, speedup))
+        print("%20s compiled in %.3f ms" % ("", compile_time * 1000.0))
+
+
+if __name__ == "__main__":
+    main()
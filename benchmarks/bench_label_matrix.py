@@ -0,0 +1,62 @@
+""" Benchmark for matching many LabelExprs against the labels
+of many workers one pair at a time with LabelExpr.matches(),
+with compiled LabelRegistry masks, and with match_matrix().
+
+    python -m benchmarks.bench_label_matrix --exprs 2000 --workers 200 """
+import argparse
+import random
+from artisan.compat import monotonic, numpy
+from artisan.scheduler import Label, LabelRegistry
+
+
+def random_label_expr(rand, depth, names):
+    if depth == 0 or rand.random() < 0.3:
+        return Label(rand.choice(names))
+    choice = rand.randint(0, 2)
+    if choice == 0:
+        return ~random_label_expr(rand, depth - 1, names)
+    left = random_label_expr(rand, depth - 1, names)
+    right = random_label_expr(rand, depth - 1, names)
+    if choice == 1:
+        return left & right
+    return left | right
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--exprs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=200)
+    parser.add_argument("--labels", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rand = random.Random(args.seed)
+    names = ["label-%d" % i for i in range(args.labels)]
+    label_exprs = [random_label_expr(rand, 4, names) for _ in range(args.exprs)]
+    label_sets = [[name for name in names if rand.random() < 0.3] for _ in range(args.workers)]
+
+    print("%d expressions, %d workers, %d labels" % (args.exprs, args.workers, args.labels))
+    print("%16s %12s" % ("method", "time (s)"))
+
+    start_time = monotonic()
+    expected = [[label_expr.matches(labels) for labels in label_sets]
+                for label_expr in label_exprs]
+    print("%16s %12.3f" % ("matches", monotonic() - start_time))
+
+    registry = LabelRegistry()
+    start_time = monotonic()
+    masks = [registry.mask(labels) for labels in label_sets]
+    result = [[evaluate(mask) for mask in masks]
+              for evaluate in [registry.compile(label_expr) for label_expr in label_exprs]]
+    print("%16s %12.3f" % ("compiled masks", monotonic() - start_time))
+    assert result == expected
+
+    if numpy is not None:
+        start_time = monotonic()
+        matrix = registry.match_matrix(label_exprs, label_sets)
+        print("%16s %12.3f" % ("match_matrix", monotonic() - start_time))
+        assert matrix.tolist() == expected
+
+
+if __name__ == "__main__":
+    main()
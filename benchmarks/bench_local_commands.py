@@ -0,0 +1,48 @@
+""" Benchmark for running many concurrent LocalCommands, reporting
+the threads that are alive and the CPU time used by this process
+while every command runs `sleep`.
+
+    python -m benchmarks.bench_local_commands --commands 2000 --sleep 5 """
+import argparse
+import os
+import resource
+import threading
+from artisan.compat import monotonic
+from artisan.worker import LocalWorker
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--sleep", type=float, default=5.0)
+    args = parser.parse_args()
+
+    worker = LocalWorker()
+    start_time = monotonic()
+    start_cpu = cpu_time()
+    commands = [worker.execute("sleep %s" % args.sleep) for _ in range(args.commands)]
+    spawn_time = monotonic() - start_time
+    threads = threading.active_count()
+    wait_cpu = cpu_time()
+
+    for command in commands:
+        command.wait()
+    total_time = monotonic() - start_time
+    failed = sum(1 for command in commands if command.exit_status != 0)
+
+    print("commands:        %d (%d failed)" % (args.commands, failed))
+    print("pid:             %d" % os.getpid())
+    print("threads:         %d" % threads)
+    print("spawn time:      %.3f s" % spawn_time)
+    print("total time:      %.3f s" % total_time)
+    print("cpu spawning:    %.3f s" % (wait_cpu - start_cpu))
+    print("cpu waiting:     %.3f s" % (cpu_time() - wait_cpu))
+
+
+if __name__ == "__main__":
+    main()
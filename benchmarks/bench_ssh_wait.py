@@ -0,0 +1,61 @@
+""" Benchmark for the CPU used by this process while many remote
+commands sleep and a thread waits on each of them.
+
+    python -m benchmarks.bench_ssh_wait --host localhost --user $USER --commands 200 --sleep 30
+
+Any other arguments for paramiko's `SSHClient.connect()` can be given
+with `--password` or `--key-filename`. Connections are opened for every
+`--commands-per-connection` commands since servers limit the number of
+sessions on one connection. """
+import argparse
+import resource
+import threading
+from artisan.compat import monotonic
+from artisan.worker import SshWorker
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--key-filename", default=None)
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--commands-per-connection", type=int, default=8)
+    parser.add_argument("--sleep", type=float, default=30.0)
+    args = parser.parse_args()
+
+    per_connection = args.commands_per_connection
+    connections = (args.commands + per_connection - 1) // per_connection
+    workers = [SshWorker(args.host, args.user, password=args.password,
+                         key_filename=args.key_filename) for _ in range(connections)]
+    commands = [workers[i // per_connection].execute("sleep %s" % args.sleep)
+                for i in range(args.commands)]
+
+    threads = [threading.Thread(target=command.wait) for command in commands]
+    start_time = monotonic()
+    start_cpu = cpu_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = monotonic() - start_time
+    used_cpu = cpu_time() - start_cpu
+    failed = sum(1 for command in commands if command.exit_status != 0)
+    for worker in workers:
+        worker.close()
+
+    print("commands:      %d (%d failed)" % (args.commands, failed))
+    print("connections:   %d" % connections)
+    print("wall time:     %.3f s" % wall_time)
+    print("cpu time:      %.3f s" % used_cpu)
+    print("cpu usage:     %.1f%% of one core" % (100.0 * used_cpu / wall_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+""" Benchmark for acquire latency of a WorkerPool when many
+threads acquire and release workers that are slow to build.
+
+    python -m benchmarks.bench_worker_pool --threads 16 --build-time 0.05
+
+The factory sleeps for `--build-time` seconds to stand in for
+the connection and setup of a remote worker. """
+import argparse
+import threading
+import time
+from artisan.compat import monotonic
+from artisan.worker import BaseWorker, WorkerPool
+
+
+class SlowWorker(BaseWorker):
+    def __init__(self, build_time):
+        super(SlowWorker, self).__init__("user", "localhost")
+        time.sleep(build_time)
+
+
+def run_benchmark(pool, threads, acquires):
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def run():
+        for _ in range(acquires):
+            start_time = monotonic()
+            worker = pool.acquire()
+            latency = monotonic() - start_time
+            pool.release(worker)
+            with latencies_lock:
+                latencies.append(latency)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start_time = monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = monotonic() - start_time
+    latencies.sort()
+    return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--acquires", type=int, default=20)
+    parser.add_argument("--build-time", type=float, default=0.05)
+    args = parser.parse_args()
+
+    def new_pool():
+        return WorkerPool(args.threads, SlowWorker, args.build_time)
+
+    def reuse_pool():
+        pool = new_pool()
+        pool.enable_worker_reuse()
+        return pool
+
+    def prewarmed_pool():
+        pool = new_pool()
+        pool.set_min_idle(args.threads, creation_interval=0.0)
+        while pool.workers_idle < args.threads:
+            time.sleep(0.01)
+        return pool
+
+    print("%d threads each acquiring %d times, %.3fs to build a worker" %
+          (args.threads, args.acquires, args.build_time))
+    print("%12s %10s %14s %14s" % ("pool", "time (s)", "median (ms)", "p99 (ms)"))
+    for name, make_pool in [("new", new_pool), ("reuse", reuse_pool),
+                            ("prewarmed", prewarmed_pool)]:
+        pool = make_pool()
+        elapsed, median, p99 = run_benchmark(pool, args.threads, args.acquires)
+        pool.close()
+        print("%12s %10.3f %14.3f %14.3f" % (name, elapsed, median * 1000.0, p99 * 1000.0))
+
+
+if __name__ == "__main__":
+    main()
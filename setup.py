@@ -21,6 +21,7 @@ if __name__ == "__main__":
                           "enum34==1.1.6",
                           "monotonic==1.2",
                           "paramiko==2.1.0"],
+        extras_require={"numpy": ["numpy"]},
         keywords=["artisan",
                   "farm",
                   "worker",
@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 import tempfile
@@ -90,6 +91,81 @@ class _BaseWorkerTestCase(object):
         self.assertEqual(command.stdout, b'')
         self.assertEqual(command.exit_status, 0)
 
+    def test_iter_stdout(self):
+        worker = self.make_worker()
+        command = worker.execute(sys.executable + " -c \"import sys; sys.stdout.write('Hello')\"")
+        self.assertEqual(b''.join(command.iter_stdout(5.0)), b'Hello')
+        self.assertEqual(command.exit_status, 0)
+        self.assertEqual(command.stdout, b'Hello')
+
+    def test_iter_stderr(self):
+        worker = self.make_worker()
+        command = worker.execute(sys.executable + " -c \"import sys; sys.stderr.write('Hello')\"")
+        self.assertEqual(b''.join(command.iter_stderr(5.0)), b'Hello')
+
+    def test_iter_lines(self):
+        worker = self.make_worker()
+        code = "import sys; sys.stdout.write('a\\nbc\\n\\nd')"
+        command = worker.execute("%s -c \"%s\"" % (sys.executable, code))
+        self.assertEqual(list(command.iter_lines(5.0)), [b'a\n', b'bc\n', b'\n', b'd'])
+
+    def test_output_callbacks(self):
+        worker = self.make_worker()
+        stdout = []
+        stderr = []
+        code = "import sys; sys.stdout.write('out'); sys.stderr.write('err')"
+        command = worker.execute("%s -c \"%s\"" % (sys.executable, code))
+        command.add_stdout_callback(stdout.append)
+        command.add_stderr_callback(stderr.append)
+        command.wait(5.0)
+        self.assertEqual(b''.join(stdout), b'out')
+        self.assertEqual(b''.join(stderr), b'err')
+
+    def test_output_not_retained(self):
+        worker = self.make_worker()
+        command = worker.execute(sys.executable + " -c \"import sys; sys.stdout.write('Hello')\"")
+        command.retain_output = False
+        stdout = []
+        command.add_stdout_callback(stdout.append)
+        self.assertEqual(b''.join(command.iter_stdout(5.0)), b'Hello')
+        self.assertEqual(b''.join(stdout), b'Hello')
+        self.assertEqual(command.stdout, b'')
+
+    def test_output_retention(self):
+        worker = self.make_worker()
+        worker.set_output_retention(3)
+        command = worker.execute(sys.executable + " -c \"import sys; sys.stdout.write('Hello')\"")
+        command.wait(5.0)
+        self.assertEqual(command.stdout, b'llo')
+
+    def test_output_retention_spill(self):
+        worker = self.make_worker()
+        command = worker.execute(sys.executable + " -c \"import sys; sys.stdout.write('Hello')\"")
+        command.set_output_retention(3, spill=True)
+        command.wait(5.0)
+        self.assertEqual(command.stdout, b'Hello')
+        self.assertEqual(command.stdout_tail, b'llo')
+
+    def test_close_command_removes_spill_files(self):
+        worker = self.make_worker()
+        command = worker.execute(sys.executable + " -c \"import sys; sys.stdout.write('Hello')\"")
+        command.set_output_retention(3, spill=True)
+        command.wait(5.0)
+        self.assertTrue(command._stdout.spilled)
+        command.close()
+        self.assertFalse(command._stdout.spilled)
+        self.assertFalse(command._stderr.spilled)
+        self.assertEqual(command.stdout, b'llo')
+
+    def test_close_worker_removes_spill_files(self):
+        worker = self.make_worker()
+        worker.set_output_retention(3, spill=True)
+        command = worker.execute("sleep 1")
+        self.assertTrue(command._stdout.spilled)
+        worker.close()
+        self.assertFalse(command._stdout.spilled)
+        self.assertFalse(command._stderr.spilled)
+
     def test_exit_status(self):
         worker = self.make_worker()
         for exit_status in range(10):
@@ -138,6 +214,15 @@ class _BaseWorkerTestCase(object):
         command.wait(1.0)
         self.assertIn(1, array)
 
+    def test_wait_after_cancel(self):
+        worker = self.make_worker()
+        command = worker.execute("sleep 5")
+        command.cancel()
+        start_time = monotonic()
+        command.wait()
+        self.assertLess(monotonic() - start_time, 1.0)
+        self.assertTrue(command.cancelled)
+
     def test_close_worker(self):
         worker = self.make_worker()
         command = worker.execute("sleep 1")
@@ -305,6 +390,18 @@ class _BaseWorkerTestCase(object):
         worker._python_executable = sys.executable
         self.assertEqual(worker.python_version, tuple(sys.version_info)[:3])
 
+    def test_slots(self):
+        worker = self.make_worker()
+        worker._python_executable = sys.executable
+        self.assertEqual(worker.slots, multiprocessing.cpu_count())
+
+    def test_slots_configured(self):
+        worker = self.make_worker()
+        worker.slots = 3
+        self.assertEqual(worker.slots, 3)
+        with self.assertRaises(ValueError):
+            worker.slots = 0
+
     def test_execute_python_stdout(self):
         worker = self.make_worker()
         command = worker.execute_python("import sys; sys.stdout.write('Hello, world!')")
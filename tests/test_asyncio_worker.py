@@ -0,0 +1,197 @@
+import os
+import sys
+import tempfile
+from artisan.worker import LocalWorker
+from artisan.worker.base_command import BaseCommand
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from artisan.worker import AsyncLocalWorker, AsyncWorker
+    from artisan.worker.asyncio_worker import _AsyncCommandAdapter
+
+
+def collect(loop, iterator):
+    items = []
+    while True:
+        try:
+            items.append(loop.run_until_complete(iterator.__anext__()))
+        except StopAsyncIteration:  # noqa: F821
+            return items
+
+
+@unittest.skipIf(sys.version_info < (3, 6), "Async workers require Python 3.6+")
+class _AsyncWorkerTestCase(object):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+    def run_until_complete(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def execute(self, code):
+        worker = self.make_worker()
+        return self.run_until_complete(worker.execute("%s -c \"%s\"" % (sys.executable, code)))
+
+    def test_wait(self):
+        command = self.execute("import sys; sys.stdout.write('out'); sys.exit(3)")
+        self.assertEqual(self.run_until_complete(command.wait(5.0)), 3)
+        self.assertTrue(command.done)
+        self.assertEqual(command.exit_status, 3)
+        self.assertEqual(command.stdout, b'out')
+
+    def test_stderr(self):
+        command = self.execute("import sys; sys.stderr.write('err')")
+        self.run_until_complete(command.wait(5.0))
+        self.assertEqual(command.stderr, b'err')
+        self.assertEqual(command.stdout, b'')
+
+    def test_wait_timeout(self):
+        command = self.execute("import time; time.sleep(5)")
+        self.assertIsNone(self.run_until_complete(command.wait(0.1)))
+        self.assertFalse(command.done)
+        command.cancel()
+        self.assertRaises(ValueError, command.cancel)
+        self.run_until_complete(command.wait(5.0))
+        self.assertTrue(command.cancelled)
+
+    def test_iter_lines(self):
+        command = self.execute("import sys; sys.stdout.write('a\\\\nb\\\\nc')")
+        self.assertEqual(collect(self.loop, command.iter_lines(5.0)), [b'a\n', b'b\n', b'c'])
+
+    def test_iter_stdout_not_retained(self):
+        command = self.execute("import sys; sys.stdout.write('Hello')")
+        command.retain_output = False
+        self.assertEqual(b''.join(collect(self.loop, command.iter_stdout(5.0))), b'Hello')
+        self.assertEqual(command.stdout, b'')
+
+    def test_callbacks(self):
+        commands = []
+        command = self.execute("import sys")
+        command.add_callback(commands.append)
+        self.run_until_complete(command.wait(5.0))
+        command.add_callback(commands.append)
+        self.assertEqual(commands, [command, command])
+
+    def test_many_commands(self):
+        worker = self.make_worker()
+        commands = self.run_until_complete(asyncio.gather(*[worker.execute("exit %d" % (i % 4))
+                                                            for i in range(20)]))
+        statuses = self.run_until_complete(asyncio.gather(*[command.wait(5.0)
+                                                            for command in commands]))
+        self.assertEqual(statuses, [i % 4 for i in range(20)])
+
+    def test_file_operations(self):
+        worker = self.make_worker()
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, "file")
+        with open(path, "w") as f:
+            f.write("Hello")
+        self.assertEqual(self.run_until_complete(worker.list_directory(tmp)), ["file"])
+        self.assertTrue(self.run_until_complete(worker.is_file(path)))
+        self.assertEqual(self.run_until_complete(worker.stat_file(path)).st_size, 5)
+        moved_path = os.path.join(tmp, "moved")
+        self.run_until_complete(worker.put_file(path, moved_path))
+        self.assertTrue(os.path.isfile(moved_path))
+        self.run_until_complete(worker.remove_file(moved_path))
+        self.assertFalse(self.run_until_complete(worker.is_file(moved_path)))
+        os.rmdir(tmp)
+
+
+class TestAsyncLocalWorker(_AsyncWorkerTestCase, unittest.TestCase):
+    def make_worker(self):
+        worker = AsyncLocalWorker()
+        self.addCleanup(worker.worker.close)
+        return worker
+
+
+class TestAsyncWorkerAdapter(_AsyncWorkerTestCase, unittest.TestCase):
+    def make_worker(self):
+        worker = AsyncWorker(LocalWorker())
+        self.addCleanup(worker.worker.close)
+        return worker
+
+
+class PipeCommand(BaseCommand):
+    """ Command that's read from a pipe and waited on through its
+    descriptor the same way as an SSH channel. It exits once the
+    write end is closed. """
+    def __init__(self, worker):
+        super(PipeCommand, self).__init__(worker, "pipe")
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self.reads = 0
+
+    def _fileno(self):
+        if self._cancelled or self._exit_status is not None:
+            return None
+        return self.read_fd
+
+    def _read_all(self, timeout=0.0):
+        self.reads += 1
+        try:
+            data = os.read(self.read_fd, 65536)
+        except BlockingIOError:
+            return self._exit_status, b'', b''
+        if data:
+            self._stdout.append(data)
+        else:
+            os.close(self.read_fd)
+            self._exit_status = 0
+        return self._exit_status, data, b''
+
+    def cancel(self):
+        self._cancelled = True
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class CountingExecutor(ThreadPoolExecutor if sys.version_info >= (3, 6) else object):
+    def __init__(self):
+        super(CountingExecutor, self).__init__(1)
+        self.calls = []
+
+    def submit(self, func, *args, **kwargs):
+        self.calls.append(func)
+        return super(CountingExecutor, self).submit(func, *args, **kwargs)
+
+
+@unittest.skipIf(sys.version_info < (3, 6), "Async workers require Python 3.6+")
+class TestAsyncCommandAdapterDescriptor(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self.executor = CountingExecutor()
+        self.addCleanup(self.executor.shutdown)
+        worker = LocalWorker()
+        self.addCleanup(worker.close)
+        self.command = PipeCommand(worker)
+        self.adapter = _AsyncCommandAdapter(None, self.command, self.executor)
+
+    def test_read_by_event_loop(self):
+        lines = self.adapter.iter_lines(5.0)
+        os.write(self.command.write_fd, b'a\n')
+        first = self.loop.run_until_complete(lines.__anext__())
+        os.write(self.command.write_fd, b'b\n')
+        os.close(self.command.write_fd)
+        self.assertEqual([first] + collect(self.loop, lines), [b'a\n', b'b\n'])
+        self.assertEqual(self.loop.run_until_complete(self.adapter.wait(5.0)), 0)
+        self.assertNotIn(self.command._read_all, self.executor.calls)
+        self.assertLess(self.command.reads, 10)
+
+    def test_cancel_while_waiting(self):
+        self.assertIsNone(self.loop.run_until_complete(self.adapter.wait(0.1)))
+        self.adapter.cancel()
+        self.assertIsNone(self.loop.run_until_complete(self.adapter.wait(5.0)))
+        self.assertTrue(self.adapter.done)
+        self.assertTrue(self.adapter.cancelled)
+        self.assertNotIn(self.command._read_all, self.executor.calls)
@@ -0,0 +1,133 @@
+import sys
+import threading
+import time
+from artisan.scheduler import Autoscaler, Job, JobQueue
+from artisan.worker import LocalWorker, WorkerPool
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class TestAutoscaler(unittest.TestCase):
+    def make_autoscaler(self, max_workers=1, min_workers=1, ceiling=8, **kwargs):
+        queue = JobQueue()
+        pool = WorkerPool(max_workers, LocalWorker)
+        pool.enable_worker_reuse()
+        self.addCleanup(pool.close)
+        autoscaler = Autoscaler(queue, pool, min_workers, ceiling, **kwargs)
+        return queue, pool, autoscaler
+
+    def acquire_all(self, pool):
+        workers = []
+        while True:
+            worker = pool.acquire(0.0)
+            if worker is None:
+                break
+            workers.append(worker)
+        self.addCleanup(lambda: [pool.release(worker) for worker in workers])
+        return workers
+
+    def test_invalid_arguments(self):
+        queue = JobQueue()
+        pool = WorkerPool(1, LocalWorker)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, -1, 4)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, 4, 2)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, 0, 0)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, 1, 4, scale_up_utilization=0.0)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, 1, 4,
+                          scale_up_utilization=0.5, scale_down_utilization=0.5)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, 1, 4, cooldown=-1.0)
+        self.assertRaises(ValueError, Autoscaler, queue, pool, 1, 4, interval=0.0)
+
+    def test_no_change_when_idle_at_floor(self):
+        _, pool, autoscaler = self.make_autoscaler(1, min_workers=1)
+        self.assertEqual(autoscaler.scale(), 1)
+        self.assertEqual(pool.max_workers, 1)
+
+    def test_scale_up_to_queue_depth(self):
+        queue, pool, autoscaler = self.make_autoscaler(2)
+        self.acquire_all(pool)
+        queue.push_jobs([Job() for _ in range(3)])
+        self.assertEqual(autoscaler.scale(), 5)
+        self.assertEqual(pool.max_workers, 5)
+
+    def test_scale_up_to_waiting_acquires(self):
+        _, pool, autoscaler = self.make_autoscaler(1)
+        self.acquire_all(pool)
+        workers = []
+        threads = [threading.Thread(target=lambda: workers.append(pool.acquire()))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        end_time = time.time() + 5.0
+        while pool.workers_waiting < 5 and time.time() < end_time:
+            time.sleep(0.01)
+        self.assertEqual(pool.workers_waiting, 5)
+        self.assertEqual(autoscaler.scale(), 6)
+        for thread in threads:
+            thread.join(5.0)
+        self.assertEqual(pool.workers_waiting, 0)
+        pool.release_many(workers)
+
+    def test_scale_up_capped_at_ceiling(self):
+        queue, pool, autoscaler = self.make_autoscaler(2, ceiling=4)
+        self.acquire_all(pool)
+        queue.push_jobs([Job() for _ in range(10)])
+        self.assertEqual(autoscaler.scale(), 4)
+
+    def test_no_scale_up_with_free_workers(self):
+        queue, pool, autoscaler = self.make_autoscaler(4)
+        pool.release(pool.acquire())
+        queue.push_job(Job())
+        self.assertEqual(autoscaler.scale(), 4)
+
+    def test_scale_down_after_cooldown(self):
+        queue, pool, autoscaler = self.make_autoscaler(2, cooldown=0.1)
+        self.acquire_all(pool)
+        queue.push_jobs([Job() for _ in range(8)])
+        self.assertEqual(autoscaler.scale(), 8)
+        queue.pop_jobs(8)
+        # Cooling down after scaling up.
+        self.assertEqual(autoscaler.scale(), 8)
+        time.sleep(0.15)
+        # Two workers in use need three to stay below 80% utilization.
+        self.assertEqual(autoscaler.scale(), 3)
+
+    def test_scale_down_to_floor(self):
+        _, pool, autoscaler = self.make_autoscaler(8, min_workers=2, cooldown=0.0)
+        self.assertEqual(autoscaler.scale(), 2)
+
+    def test_scale_down_closes_idle_workers(self):
+        _, pool, autoscaler = self.make_autoscaler(4, min_workers=1, cooldown=0.0)
+        workers = self.acquire_all(pool)
+        while workers:
+            pool.release(workers.pop())
+        self.assertEqual(pool.workers_idle, 4)
+        self.assertEqual(autoscaler.scale(), 1)
+        self.assertEqual(pool.workers_idle, 1)
+
+    def test_hysteresis(self):
+        _, pool, autoscaler = self.make_autoscaler(4, cooldown=0.0)
+        worker1 = pool.acquire()
+        worker2 = pool.acquire()
+        # 50% utilization is between the thresholds.
+        self.assertEqual(autoscaler.scale(), 4)
+        pool.release(worker2)
+        self.assertEqual(autoscaler.scale(), 2)
+        pool.release(worker1)
+
+    def test_start_stop(self):
+        queue, pool, autoscaler = self.make_autoscaler(1, interval=0.01)
+        self.acquire_all(pool)
+        queue.push_jobs([Job() for _ in range(3)])
+        autoscaler.start()
+        self.assertTrue(autoscaler.running)
+        self.assertRaises(ValueError, autoscaler.start)
+        end_time = time.time() + 5.0
+        while pool.max_workers != 4 and time.time() < end_time:
+            time.sleep(0.01)
+        self.assertEqual(pool.max_workers, 4)
+        self.assertTrue(autoscaler.stop(5.0))
+        self.assertFalse(autoscaler.running)
@@ -0,0 +1,325 @@
+import sys
+import threading
+import time
+from artisan.scheduler import (
+    Dispatcher,
+    Job,
+    JobQueue,
+    JobStatus,
+    Label,
+    ShardedJobQueue
+)
+from artisan.exceptions import JobFailureException
+from artisan.worker import LocalWorker, WorkerPool
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class RecordingJob(Job):
+    def __init__(self, result=None, error=None, delay=0.0):
+        super(RecordingJob, self).__init__()
+        self.result = result
+        self.error = error
+        self.delay = delay
+        self.worker = None
+        self.done = threading.Event()
+
+    def run(self, worker):
+        self.worker = worker
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return self.result
+        finally:
+            self.done.set()
+
+
+def wait_for_status(test, job, timeout=5.0):
+    test.assertTrue(job.done.wait(timeout))
+    end_time = time.time() + timeout
+    while job.status == JobStatus.ACTIVE and time.time() < end_time:
+        time.sleep(0.01)
+
+
+class TestDispatcher(unittest.TestCase):
+    def make_dispatcher(self, concurrency=1, max_workers=1, queue=None, factory=LocalWorker,
+                        match_attempts=100):
+        queue = JobQueue() if queue is None else queue
+        pool = WorkerPool(max_workers, factory)
+        dispatcher = Dispatcher(queue, pool, concurrency, retry_interval=0.05,
+                                match_attempts=match_attempts)
+        dispatcher.start()
+        self.addCleanup(dispatcher.stop)
+        return queue, pool, dispatcher
+
+    def test_invalid_concurrency(self):
+        self.assertRaises(ValueError, Dispatcher, JobQueue(), WorkerPool(1, LocalWorker), 0)
+        self.assertRaises(ValueError, Dispatcher, JobQueue(), WorkerPool(1, LocalWorker),
+                          match_attempts=0)
+
+    def test_run_job(self):
+        queue, pool, dispatcher = self.make_dispatcher()
+        job = RecordingJob()
+        self.assertEqual(job.status, JobStatus.SCHEDULED)
+        queue.push_job(job)
+        wait_for_status(self, job)
+        self.assertEqual(job.status, JobStatus.SUCCESS)
+        self.assertIsInstance(job.worker, LocalWorker)
+        self.assertTrue(job.worker.closed)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_job_statuses(self):
+        queue, _, dispatcher = self.make_dispatcher()
+        unstable = RecordingJob(result=JobStatus.UNSTABLE)
+        failure = RecordingJob(error=RuntimeError("failed"))
+        jobs = [unstable, failure]
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+        self.assertEqual(unstable.status, JobStatus.UNSTABLE)
+        self.assertEqual(failure.status, JobStatus.FAILURE)
+        self.assertIsInstance(failure.exception, RuntimeError)
+
+        metrics = dispatcher.metrics
+        self.assertEqual(metrics.jobs_unstable, 1)
+        self.assertEqual(metrics.jobs_failed, 1)
+        self.assertEqual(metrics.jobs_succeeded, 0)
+
+    def test_label_expr_matching_worker(self):
+        labels = ["linux", "windows"]
+
+        def step(worker):
+            worker.labels.add(labels.pop(0))
+
+        queue, pool, dispatcher = self.make_dispatcher(max_workers=2)
+        pool.enable_worker_reuse()
+        pool.add_worker_setup_step(step)
+        windows = RecordingJob()
+        windows.label_expr = Label("windows")
+        queue.push_job(windows)
+        wait_for_status(self, windows)
+        self.assertEqual(windows.status, JobStatus.SUCCESS)
+        self.assertIn("windows", windows.worker.labels)
+
+        # The idle Worker that matches is acquired again.
+        linux = RecordingJob()
+        linux.label_expr = Label("linux")
+        queue.push_job(linux)
+        wait_for_status(self, linux)
+        self.assertEqual(linux.status, JobStatus.SUCCESS)
+        self.assertIn("linux", linux.worker.labels)
+        self.assertEqual(dispatcher.metrics.jobs_failed, 0)
+
+    def test_label_expr_not_matched(self):
+        def step(worker):
+            worker.labels.add("linux")
+
+        queue, pool, dispatcher = self.make_dispatcher()
+        pool.add_worker_setup_step(step)
+        matched = RecordingJob()
+        matched.label_expr = Label("linux")
+        not_matched = RecordingJob()
+        not_matched.label_expr = Label("windows")
+        queue.push_jobs([not_matched, matched])
+        wait_for_status(self, matched)
+        self.assertEqual(matched.status, JobStatus.SUCCESS)
+        time.sleep(0.2)
+        self.assertEqual(not_matched.status, JobStatus.SCHEDULED)
+        self.assertIs(not_matched.worker, None)
+        self.assertEqual(dispatcher.metrics.jobs_active, 0)
+        self.assertEqual(dispatcher.metrics.jobs_failed, 0)
+
+        # Stopping leaves the Job in the queue.
+        self.assertTrue(dispatcher.stop(timeout=5.0))
+        self.assertEqual(queue.pop_job(), not_matched)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_label_expr_never_matched(self):
+        workers = []
+
+        def factory():
+            workers.append(LocalWorker())
+            return workers[-1]
+
+        queue, pool, dispatcher = self.make_dispatcher(factory=factory, match_attempts=3)
+        pool.enable_worker_reuse()
+        not_matched = RecordingJob()
+        not_matched.label_expr = "gpu"
+        jobs = [RecordingJob() for _ in range(50)]
+        queue.push_jobs([not_matched] + jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+        end_time = time.time() + 5.0
+        while not_matched.status == JobStatus.SCHEDULED and time.time() < end_time:
+            time.sleep(0.01)
+
+        # Jobs that can't match fail instead of building a Worker each retry.
+        self.assertEqual(not_matched.status, JobStatus.FAILURE)
+        self.assertIsInstance(not_matched.exception, JobFailureException)
+        self.assertIs(not_matched.worker, None)
+        self.assertLessEqual(len(workers), 4)
+        metrics = dispatcher.metrics
+        self.assertEqual(metrics.jobs_active, 0)
+        self.assertEqual(metrics.jobs_succeeded, 50)
+        self.assertEqual(metrics.jobs_failed, 1)
+
+    def test_string_label_expr(self):
+        def step(worker):
+            worker.labels.add("linux")
+
+        queue, pool, dispatcher = self.make_dispatcher()
+        pool.add_worker_setup_step(step)
+        matched = RecordingJob()
+        matched.label_expr = "linux & ~windows"
+        invalid = RecordingJob()
+        invalid.label_expr = "linux &"
+        queue.push_jobs([invalid, matched])
+        wait_for_status(self, matched)
+        self.assertEqual(matched.status, JobStatus.SUCCESS)
+        self.assertEqual(invalid.status, JobStatus.FAILURE)
+        self.assertIsInstance(invalid.exception, ValueError)
+        self.assertEqual(dispatcher.metrics.jobs_active, 0)
+
+    def test_acquire_error(self):
+        errors = [RuntimeError("failed")]
+
+        def factory():
+            if errors:
+                raise errors.pop()
+            return LocalWorker()
+
+        queue, pool, dispatcher = self.make_dispatcher(factory=factory)
+        failed = RecordingJob()
+        succeeded = RecordingJob()
+        queue.push_jobs([failed, succeeded])
+        wait_for_status(self, succeeded)
+        self.assertEqual(succeeded.status, JobStatus.SUCCESS)
+        self.assertEqual(failed.status, JobStatus.FAILURE)
+        self.assertIsInstance(failed.exception, RuntimeError)
+        self.assertIs(failed.worker, None)
+        metrics = dispatcher.metrics
+        self.assertEqual(metrics.jobs_active, 0)
+        self.assertEqual(metrics.jobs_failed, 1)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_release_error(self):
+        def step(worker):
+            raise RuntimeError("failed")
+
+        queue, pool, dispatcher = self.make_dispatcher()
+        pool.add_worker_cleanup_step(step)
+        jobs = [RecordingJob(), RecordingJob()]
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+            self.assertEqual(job.status, JobStatus.SUCCESS)
+        end_time = time.time() + 5.0
+        while dispatcher.metrics.jobs_active and time.time() < end_time:
+            time.sleep(0.01)
+        self.assertEqual(dispatcher.metrics.jobs_active, 0)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_concurrency(self):
+        queue, _, dispatcher = self.make_dispatcher(concurrency=4, max_workers=4)
+        jobs = [RecordingJob(delay=0.2) for _ in range(4)]
+        start_time = time.time()
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+        self.assertLess(time.time() - start_time, 0.7)
+        self.assertEqual(len(set(id(job.worker) for job in jobs)), 4)
+
+    def test_metrics(self):
+        queue, _, dispatcher = self.make_dispatcher()
+        jobs = [RecordingJob(delay=0.05) for _ in range(3)]
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+        metrics = dispatcher.metrics
+        self.assertEqual(metrics.jobs_active, 0)
+        self.assertEqual(metrics.jobs_succeeded, 3)
+        self.assertGreaterEqual(metrics.total_run_time, 0.15)
+        self.assertGreaterEqual(metrics.max_run_time, 0.05)
+        self.assertGreater(metrics.max_queue_time, 0.0)
+        self.assertGreaterEqual(metrics.total_queue_time, metrics.max_queue_time)
+
+    def test_stop(self):
+        queue, _, dispatcher = self.make_dispatcher(concurrency=3, max_workers=3)
+        self.assertTrue(dispatcher.running)
+        self.assertTrue(dispatcher.stop(timeout=5.0))
+        self.assertFalse(dispatcher.running)
+        job = RecordingJob()
+        queue.push_job(job)
+        self.assertFalse(job.done.wait(0.1))
+        self.assertEqual(job.status, JobStatus.SCHEDULED)
+
+    def test_start_twice(self):
+        _, _, dispatcher = self.make_dispatcher()
+        self.assertRaises(ValueError, dispatcher.start)
+
+    def test_sharded_job_queue(self):
+        queue, _, dispatcher = self.make_dispatcher(concurrency=2, max_workers=2,
+                                                    queue=ShardedJobQueue(2))
+        jobs = [RecordingJob() for _ in range(10)]
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+            self.assertEqual(job.status, JobStatus.SUCCESS)
+        self.assertTrue(dispatcher.stop(timeout=5.0))
+
+    def test_slots_share_worker(self):
+        queue = JobQueue()
+        pool = WorkerPool(1, LocalWorker)
+
+        def set_slots(worker):
+            worker.slots = 4
+        pool.add_worker_setup_step(set_slots)
+        dispatcher = Dispatcher(queue, pool, concurrency=4, slots=True)
+        dispatcher.start()
+        self.addCleanup(dispatcher.stop)
+
+        jobs = [RecordingJob(delay=0.2) for _ in range(4)]
+        start_time = time.time()
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+            self.assertEqual(job.status, JobStatus.SUCCESS)
+        self.assertLess(time.time() - start_time, 0.7)
+        self.assertEqual(len(set(job.worker for job in jobs)), 1)
+
+    def test_slots_job_cost(self):
+        queue = JobQueue()
+        pool = WorkerPool(2, LocalWorker)
+
+        def set_slots(worker):
+            worker.slots = 2
+        pool.add_worker_setup_step(set_slots)
+        dispatcher = Dispatcher(queue, pool, concurrency=2, slots=True)
+        dispatcher.start()
+        self.addCleanup(dispatcher.stop)
+
+        jobs = [RecordingJob(delay=0.2) for _ in range(2)]
+        for job in jobs:
+            job.cost = 2
+        queue.push_jobs(jobs)
+        for job in jobs:
+            wait_for_status(self, job)
+        self.assertIsNot(jobs[0].worker, jobs[1].worker)
+
+
+class TestJobQueueWakeup(unittest.TestCase):
+    def test_wakeup(self):
+        for queue in [JobQueue(), ShardedJobQueue(2)]:
+            results = []
+            thread = threading.Thread(target=lambda: results.append(queue.pop_job(block=True)))
+            thread.start()
+            time.sleep(0.1)
+            queue.wakeup()
+            thread.join(5.0)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(results, [None])
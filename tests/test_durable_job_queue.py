@@ -0,0 +1,186 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from artisan.scheduler import durable_job_queue
+from artisan.scheduler import (
+    DurableJobQueue,
+    Job
+)
+from tests.test_job_queue import WeightedJob, weight_rule
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class TestDurableJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, "queue.wal")
+
+    def make_queue(self, **kwargs):
+        queue = DurableJobQueue(self.path, **kwargs)
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_empty_queue(self):
+        queue = self.make_queue()
+        self.assertTrue(queue.empty)
+        self.assertEqual(queue.path, self.path)
+        self.assertTrue(os.path.isfile(self.path))
+
+    def test_recover_pushed_jobs(self):
+        queue = self.make_queue()
+        for weight in [1, 2, 3]:
+            queue.push_job(WeightedJob(weight))
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [1, 2, 3])
+        self.assertIsInstance(queue.pop_job(), Job)
+
+    def test_recover_without_popped_jobs(self):
+        queue = self.make_queue()
+        queue.push_jobs(WeightedJob(weight) for weight in range(5))
+        queue.pop_jobs(2)
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [2, 3, 4])
+
+    def test_recovered_jobs_fifo_with_new_jobs(self):
+        queue = self.make_queue()
+        queue.push_job(WeightedJob(1))
+        queue.push_job(WeightedJob(2))
+        queue.pop_job()
+        queue.close()
+
+        queue = self.make_queue()
+        queue.push_job(WeightedJob(3))
+        self.assertEqual([job.weight for job in queue.pop_jobs(2)], [2, 3])
+
+    def test_recovered_jobs_reprioritized(self):
+        queue = self.make_queue()
+        queue.push_jobs(WeightedJob(weight) for weight in [1, 3, 2])
+        queue.close()
+
+        queue = self.make_queue()
+        queue.add_priority_rule(weight_rule)
+        self.assertEqual([job.weight for job in queue.jobs], [3, 2, 1])
+
+    def test_recovered_job_status(self):
+        queue = self.make_queue()
+        queue.push_job(Job())
+        queue.close()
+
+        queue = self.make_queue()
+        job = queue.pop_job()
+        self.assertIs(job.status, Job().status)
+
+    def test_torn_record_is_truncated(self):
+        queue = self.make_queue()
+        queue.push_job(WeightedJob(1))
+        queue.push_job(WeightedJob(2))
+        queue.close()
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 3)
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [1])
+        queue.push_job(WeightedJob(3))
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [1, 3])
+
+    def test_corrupt_record_ends_log(self):
+        queue = self.make_queue()
+        queue.push_job(WeightedJob(1))
+        queue.close()
+        size = os.path.getsize(self.path)
+        queue = self.make_queue()
+        queue.push_job(WeightedJob(2))
+        queue.close()
+        with open(self.path, "r+b") as f:
+            f.seek(size + 30)
+            f.write(b"\xff")
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [1])
+
+    def test_not_a_log(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a write-ahead log")
+        self.assertRaises(ValueError, DurableJobQueue, self.path)
+
+    def test_compaction(self):
+        queue = self.make_queue(compact_records=10)
+        queue.push_jobs(WeightedJob(weight) for weight in range(20))
+        size = os.path.getsize(self.path)
+        for _ in range(15):
+            queue.pop_job()
+        self.assertLess(os.path.getsize(self.path), size)
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [15, 16, 17, 18, 19])
+
+    def test_compaction_fails(self):
+        def replace(src, dst):
+            raise OSError("Destination exists.")
+
+        queue = self.make_queue(compact_records=10)
+        queue.push_jobs(WeightedJob(weight) for weight in range(20))
+        original = durable_job_queue.replace
+        durable_job_queue.replace = replace
+        try:
+            popped = [queue.pop_job() for _ in range(15)]
+        finally:
+            durable_job_queue.replace = original
+        self.assertEqual([job.weight for job in popped], list(range(15)))
+        self.assertEqual(os.listdir(self.tmpdir), ["queue.wal"])
+        queue.push_job(WeightedJob(20))
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [15, 16, 17, 18, 19, 20])
+
+    def test_compact(self):
+        queue = self.make_queue()
+        queue.push_jobs(WeightedJob(weight) for weight in range(3))
+        queue.pop_job()
+        queue.compact()
+        queue.push_job(WeightedJob(3))
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual([job.weight for job in queue.jobs], [1, 2, 3])
+
+    def test_concurrent_pushes(self):
+        queue = self.make_queue()
+
+        def push(start):
+            for weight in range(start, start + 50):
+                queue.push_job(WeightedJob(weight))
+
+        threads = [threading.Thread(target=push, args=(i * 50,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        queue.close()
+
+        queue = self.make_queue()
+        self.assertEqual(sorted(job.weight for job in queue.jobs), list(range(200)))
+
+    def test_no_sync(self):
+        queue = self.make_queue(sync=False)
+        queue.push_job(WeightedJob(1))
+
+        other_queue = self.make_queue()
+        self.assertEqual([job.weight for job in other_queue.jobs], [1])
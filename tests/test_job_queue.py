@@ -1,14 +1,26 @@
 import itertools
 import sys
+import threading
+import time
 from artisan.scheduler import (
+    BatchPriorityRule,
     JobQueue,
     Job
 )
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 if sys.version_info >= (2, 7):
     import unittest
 else:
     import unittest2 as unittest
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
 
 
 class WeightedJob(Job):
@@ -25,6 +37,19 @@ def reverse_weight_rule(job):
     return 1000 - getattr(job, "weight", 0)
 
 
+def batch_weight_rule(jobs):
+    return [getattr(job, "weight", 0) for job in jobs]
+
+
+def push_later(queue, job, delay):
+    def push():
+        time.sleep(delay)
+        queue.push_job(job)
+    thread = threading.Thread(target=push)
+    thread.start()
+    return thread
+
+
 class TestJobQueue(unittest.TestCase):
     def test_empty_queue_init(self):
         queue = JobQueue()
@@ -96,3 +121,251 @@ class TestJobQueue(unittest.TestCase):
         queue.remove_priority_rule(rule)
         queue.add_priority_rule(reverse_weight_rule)
         self.assertEqual(queue.peek_job().weight, 1)
+
+    def test_equal_priority_fifo(self):
+        queue = JobQueue()
+        queue.add_priority_rule(weight_rule)
+        jobs = [WeightedJob(1) for _ in range(10)]
+        for job in jobs:
+            queue.push_job(job)
+        for job in jobs:
+            self.assertIs(queue.pop_job(), job)
+
+    def test_equal_priority_fifo_after_reorder(self):
+        queue = JobQueue()
+        jobs = [WeightedJob(i % 2) for i in range(10)]
+        for job in jobs:
+            queue.push_job(job)
+        queue.add_priority_rule(weight_rule)
+        expected = [job for job in jobs if job.weight == 1] + [job for job in jobs if job.weight == 0]
+        self.assertEqual(queue.jobs, expected)
+        for job in expected:
+            self.assertIs(queue.pop_job(), job)
+
+    def test_jobs_priority_order(self):
+        queue = JobQueue()
+        queue.add_priority_rule(weight_rule)
+        for weight in [5, 3, 9, 1, 7]:
+            queue.push_job(WeightedJob(weight))
+        self.assertEqual([job.weight for job in queue.jobs], [9, 7, 5, 3, 1])
+        self.assertEqual(queue.peek_job().weight, 9)
+
+    def test_add_rule_only_evaluates_new_rule(self):
+        calls = []
+
+        def counting_rule(job):
+            calls.append(job)
+            return job.weight
+
+        queue = JobQueue()
+        queue.add_priority_rule(counting_rule)
+        for weight in range(5):
+            queue.push_job(WeightedJob(weight))
+        self.assertEqual(len(calls), 5)
+
+        queue.add_priority_rule(reverse_weight_rule)
+        self.assertEqual(len(calls), 5)
+
+    def test_remove_rule_does_not_evaluate_rules(self):
+        calls = []
+
+        def counting_rule(job):
+            calls.append(job)
+            return job.weight
+
+        queue = JobQueue()
+        queue.add_priority_rule(counting_rule)
+        rule = queue.add_priority_rule(lambda job: -2 * job.weight)
+        for weight in range(5):
+            queue.push_job(WeightedJob(weight))
+        self.assertEqual(queue.peek_job().weight, 0)
+
+        del calls[:]
+        queue.remove_priority_rule(rule)
+        self.assertEqual(calls, [])
+        self.assertEqual([job.weight for job in queue.jobs], [4, 3, 2, 1, 0])
+
+    def test_remove_rule_not_in_queue(self):
+        queue = JobQueue()
+        other_queue = JobQueue()
+        rule = other_queue.add_priority_rule(weight_rule)
+        self.assertRaises(ValueError, queue.remove_priority_rule, rule)
+
+    def test_pop_block_waits_for_push(self):
+        queue = JobQueue()
+        job = Job()
+        thread = push_later(queue, job, 0.1)
+        self.assertIs(queue.pop_job(block=True, timeout=5.0), job)
+        thread.join()
+        self.assertTrue(queue.empty)
+
+    def test_pop_block_no_timeout(self):
+        queue = JobQueue()
+        job = Job()
+        thread = push_later(queue, job, 0.1)
+        self.assertIs(queue.pop_job(block=True), job)
+        thread.join()
+
+    def test_pop_block_timeout(self):
+        queue = JobQueue()
+        start_time = monotonic()
+        self.assertIs(queue.pop_job(block=True, timeout=0.1), None)
+        self.assertGreaterEqual(monotonic() - start_time, 0.1)
+
+    def test_peek_block_waits_for_push(self):
+        queue = JobQueue()
+        job = Job()
+        thread = push_later(queue, job, 0.1)
+        self.assertIs(queue.peek_job(block=True, timeout=5.0), job)
+        thread.join()
+        self.assertFalse(queue.empty)
+
+    def test_peek_block_timeout(self):
+        queue = JobQueue()
+        self.assertIs(queue.peek_job(block=True, timeout=0.1), None)
+
+    def test_pop_block_woken_with_peek_waiting(self):
+        queue = JobQueue()
+        job = Job()
+        results = {}
+
+        def wait(name, func, timeout):
+            results[name] = func(block=True, timeout=timeout)
+
+        threads = [threading.Thread(target=wait, args=("peek", queue.peek_job, 0.5)),
+                   threading.Thread(target=wait, args=("pop", queue.pop_job, 5.0))]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        queue.push_job(job)
+        for thread in threads:
+            thread.join()
+        self.assertIs(results["pop"], job)
+        self.assertIn(results["peek"], [job, None])
+
+    def test_push_jobs(self):
+        queue = JobQueue()
+        queue.add_priority_rule(weight_rule)
+        queue.push_job(WeightedJob(5))
+        queue.push_jobs(WeightedJob(weight) for weight in [3, 9, 1, 7])
+        self.assertEqual([job.weight for job in queue.jobs], [9, 7, 5, 3, 1])
+
+    def test_push_jobs_small_batch(self):
+        queue = JobQueue()
+        queue.add_priority_rule(weight_rule)
+        queue.push_jobs(WeightedJob(weight) for weight in range(100))
+        queue.push_jobs([WeightedJob(50), WeightedJob(200)])
+        weights = [job.weight for job in queue.jobs]
+        self.assertEqual(weights, sorted(weights, reverse=True))
+        self.assertEqual(weights[0], 200)
+
+    def test_push_jobs_empty(self):
+        queue = JobQueue()
+        queue.push_jobs([])
+        self.assertTrue(queue.empty)
+
+    def test_push_jobs_fifo(self):
+        queue = JobQueue()
+        jobs = [Job() for _ in range(10)]
+        queue.push_job(jobs[0])
+        queue.push_jobs(jobs[1:])
+        self.assertEqual(queue.pop_jobs(10), jobs)
+
+    def test_pop_jobs(self):
+        queue = JobQueue()
+        queue.add_priority_rule(weight_rule)
+        queue.push_jobs(WeightedJob(weight) for weight in range(10))
+        self.assertEqual([job.weight for job in queue.pop_jobs(3)], [9, 8, 7])
+        self.assertEqual([job.weight for job in queue.pop_jobs(100)], [6, 5, 4, 3, 2, 1, 0])
+        self.assertTrue(queue.empty)
+        self.assertEqual(queue.pop_jobs(3), [])
+
+    def test_pop_jobs_block_waits_for_push(self):
+        queue = JobQueue()
+        job = Job()
+        thread = push_later(queue, job, 0.1)
+        self.assertEqual(queue.pop_jobs(5, block=True, timeout=5.0), [job])
+        thread.join()
+
+    def test_pop_jobs_block_timeout(self):
+        queue = JobQueue()
+        self.assertEqual(queue.pop_jobs(5, block=True, timeout=0.1), [])
+
+    def test_push_jobs_wakes_multiple_waiters(self):
+        queue = JobQueue()
+        results = []
+
+        def wait():
+            results.append(queue.pop_job(block=True, timeout=5.0))
+
+        threads = [threading.Thread(target=wait) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        jobs = [Job() for _ in range(3)]
+        queue.push_jobs(jobs)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(map(id, results)), sorted(map(id, jobs)))
+
+    def test_batch_rule_ordering(self):
+        queue = JobQueue()
+        queue.add_priority_rule(batch_weight_rule, batch=True)
+        for weight in [5, 3, 9, 1, 7]:
+            queue.push_job(WeightedJob(weight))
+        self.assertEqual([job.weight for job in queue.jobs], [9, 7, 5, 3, 1])
+
+    def test_batch_rule_reorder_queue(self):
+        queue = JobQueue()
+        queue.push_jobs(WeightedJob(weight) for weight in [5, 3, 9, 1, 7])
+        rule = queue.add_priority_rule(batch_weight_rule, batch=True)
+        self.assertIsInstance(rule, BatchPriorityRule)
+        self.assertEqual([job.weight for job in queue.jobs], [9, 7, 5, 3, 1])
+        queue.remove_priority_rule(rule)
+        self.assertEqual([job.weight for job in queue.jobs], [5, 3, 9, 1, 7])
+
+    def test_batch_rule_called_once_for_push_jobs(self):
+        calls = []
+
+        def rule(jobs):
+            calls.append(len(jobs))
+            return batch_weight_rule(jobs)
+
+        queue = JobQueue()
+        queue.add_priority_rule(rule, batch=True)
+        queue.push_jobs(WeightedJob(weight) for weight in range(100))
+        self.assertEqual(calls, [100])
+        self.assertEqual(queue.peek_job().weight, 99)
+
+    def test_batch_and_plain_rules_agree(self):
+        weights = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5]
+        batch_queue = JobQueue()
+        batch_queue.add_priority_rule(batch_weight_rule, batch=True)
+        batch_queue.add_priority_rule(reverse_weight_rule)
+        batch_queue.push_jobs(WeightedJob(weight) for weight in weights)
+        plain_queue = JobQueue()
+        plain_queue.add_priority_rule(weight_rule)
+        plain_queue.add_priority_rule(reverse_weight_rule)
+        for weight in weights:
+            plain_queue.push_job(WeightedJob(weight))
+        self.assertEqual([job.weight for job in batch_queue.jobs],
+                         [job.weight for job in plain_queue.jobs])
+
+    def test_batch_rule_wrong_length(self):
+        queue = JobQueue()
+        queue.add_priority_rule(lambda jobs: [1], batch=True)
+        self.assertRaises(ValueError, queue.push_jobs, [Job(), Job()])
+
+    def test_batch_rule_not_a_number(self):
+        queue = JobQueue()
+        queue.add_priority_rule(lambda jobs: ["a" for _ in jobs], batch=True)
+        self.assertRaises(ValueError, queue.push_job, Job())
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed.")
+    def test_batch_rule_numpy_array(self):
+        queue = JobQueue()
+        queue.add_priority_rule(lambda jobs: numpy.array(batch_weight_rule(jobs)) * 2.0,
+                                batch=True)
+        queue.push_jobs(WeightedJob(weight) for weight in range(1000))
+        queue.push_job(WeightedJob(500))
+        self.assertEqual([job.weight for job in queue.pop_jobs(3)], [999, 998, 997])
@@ -1,5 +1,10 @@
+import itertools
+import os
+import random
+import subprocess
 import sys
 from artisan.scheduler import Label, LabelExpr, string_to_label_expr
+from artisan.scheduler.label import _LRUCache
 
 if sys.version_info >= (2, 7):
     import unittest
@@ -7,6 +12,31 @@ else:
     import unittest2 as unittest
 
 
+def run_python(script, **environment):
+    """ Runs `script` in a new interpreter from the root of the
+    repository and returns what it writes to stdout. """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, **environment)
+    proc = subprocess.Popen([sys.executable, "-c", script], cwd=root,
+                            env=environment, stdout=subprocess.PIPE)
+    output = proc.communicate()[0]
+    assert proc.returncode == 0
+    return output
+
+
+def random_label_expr(rand, depth, names):
+    if depth == 0 or rand.random() < 0.2:
+        return Label(rand.choice(names))
+    choice = rand.randint(0, 2)
+    if choice == 0:
+        return ~random_label_expr(rand, depth - 1, names)
+    left = random_label_expr(rand, depth - 1, names)
+    right = random_label_expr(rand, depth - 1, names)
+    if choice == 1:
+        return left & right
+    return left | right
+
+
 class TestLabelExpr(unittest.TestCase):
     def test_simple_label(self):
         label1 = Label("1")
@@ -70,3 +100,184 @@ class TestLabelExpr(unittest.TestCase):
 
         for label_expr in data:
             self.assertTrue(label_expr == label_expr)
+
+    def test_compile_matches(self):
+        rand = random.Random(0)
+        names = ["a", "b", "c", "d"]
+        label_sets = []
+        for i in range(len(names) + 1):
+            label_sets.extend(list(combo) for combo in itertools.combinations(names, i))
+        for _ in range(200):
+            label_expr = random_label_expr(rand, 5, names)
+            evaluate = label_expr.compile()
+            for labels in label_sets:
+                self.assertEqual(evaluate(labels), label_expr.matches(labels))
+
+    def test_compile_label_objects(self):
+        evaluate = (Label("1") | Label("2")).compile()
+        self.assertTrue(evaluate([Label("0"), Label("1")]))
+        self.assertFalse(evaluate([Label("0"), Label("3")]))
+
+    def test_compile_set_of_labels(self):
+        evaluate = (Label("1") & ~Label("2")).compile()
+        self.assertTrue(evaluate(set(["1", "3"])))
+        self.assertFalse(evaluate(set(["1", "2"])))
+
+    def test_compile_long_chain(self):
+        label_expr = Label("0")
+        for i in range(1, 2000):
+            label_expr = label_expr & Label(str(i))
+        evaluate = label_expr.compile()
+        labels = set(str(i) for i in range(2000))
+        self.assertTrue(evaluate(labels))
+        labels.remove("1000")
+        self.assertFalse(evaluate(labels))
+
+    def test_compile_deeply_nested(self):
+        label_expr = Label("0")
+        for i in range(1, 500):
+            if i % 2:
+                label_expr = Label(str(i)) & label_expr
+            else:
+                label_expr = ~(Label(str(i)) | label_expr)
+        evaluate = label_expr.compile()
+        for labels in [[], ["0"], ["1", "3"], [str(i) for i in range(500)]]:
+            self.assertEqual(evaluate(labels), label_expr.matches(labels))
+
+    def test_string_to_label_expr(self):
+        data = [("a", Label("a")),
+                ("~a", ~Label("a")),
+                ("a & b", Label("a") & Label("b")),
+                ("a | b & c", Label("a") | (Label("b") & Label("c"))),
+                ("~a & b", (~Label("a")) & Label("b")),
+                ("~(a | b)", ~(Label("a") | Label("b"))),
+                ("a & b & c", (Label("a") & Label("b")) & Label("c")),
+                ("us-east.1 | gpu:2", Label("us-east.1") | Label("gpu:2"))]
+        for string, label_expr in data:
+            self.assertEqual(string_to_label_expr(string), label_expr)
+
+    def test_string_to_label_expr_str_round_trip(self):
+        rand = random.Random(0)
+        for _ in range(100):
+            label_expr = random_label_expr(rand, 5, ["a", "b", "c", "d"])
+            self.assertEqual(string_to_label_expr(str(label_expr)), label_expr)
+
+    def test_string_to_label_expr_invalid(self):
+        for string in ["", "   ", "a b", "a &", "& a", "a ~ b", "(a", "a)", "[a)", "()",
+                       "__import__('os').system('true')", "a' | 'b"]:
+            self.assertRaises(ValueError, string_to_label_expr, string)
+
+    def test_string_to_label_expr_cached(self):
+        label_expr = string_to_label_expr("(a | b) & c")
+        self.assertIs(string_to_label_expr("(a | b) & c"), label_expr)
+        self.assertIs(string_to_label_expr("( a|b )&c"), label_expr)
+        self.assertIsNot(string_to_label_expr("(a | b) & d"), label_expr)
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache = _LRUCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIs(cache.get("b"), None)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+        # Using the same keys many times doesn't evict them.
+        for _ in range(100):
+            cache.get("a")
+            cache.get("c")
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        cache.set("d", 4)
+        self.assertIs(cache.get("a"), None)
+        self.assertEqual(cache.get("d"), 4)
+
+    def test_equal_after_normalizing(self):
+        a, b, c = Label("a"), Label("b"), Label("c")
+        data = [(a & b, b & a),
+                (a | b, b | a),
+                (~~a, a),
+                (a & a, a),
+                ((a & b) & c, a & (b & c)),
+                (a & (b | c) & a, (c | b) & a),
+                (~(a & ~~b), ~(b & a))]
+        for left, right in data:
+            self.assertEqual(left, right)
+            self.assertEqual(hash(left), hash(right))
+            self.assertEqual(left.canonical_key, right.canonical_key)
+        self.assertNotEqual(a & b, a | b)
+        self.assertNotEqual(a, ~a)
+        self.assertEqual(len(set([a & b, b & a, a & b & b])), 1)
+
+    def test_hash_after_unpickling_in_another_process(self):
+        # String hashes are randomized differently in each process.
+        script = ("import sys; from artisan.compat import pickle; "
+                  "from artisan.scheduler import string_to_label_expr; "
+                  "label_expr = string_to_label_expr('(a | b) & ~c'); hash(label_expr); "
+                  "sys.stdout.write(repr(pickle.dumps(label_expr, 2)))")
+        output = run_python(script, PYTHONHASHSEED="1")
+
+        script = ("import sys; from artisan.compat import pickle; "
+                  "from artisan.scheduler import string_to_label_expr; "
+                  "recovered = pickle.loads(%s); "
+                  "fresh = string_to_label_expr('(a | b) & ~c'); "
+                  "sys.stdout.write(str(recovered == fresh and fresh in set([recovered])))"
+                  % output.decode("ascii"))
+        output = run_python(script, PYTHONHASHSEED="2")
+        self.assertEqual(output.strip(), b"True")
+
+    def test_label_hash(self):
+        self.assertEqual(hash(Label("a")), hash("a"))
+        self.assertEqual(hash(~~Label("a")), hash("a"))
+        self.assertIn(Label("a"), set(["a", "b"]))
+        self.assertEqual(~~Label("a"), "a")
+        self.assertNotEqual(Label("a"), 1)
+        self.assertNotEqual(Label("a"), ~Label("a"))
+
+    def test_normalize(self):
+        a, b, c = Label("a"), Label("b"), Label("c")
+        self.assertEqual(str((b & a & b).normalize()), "([a] & [b])")
+        self.assertEqual(str((~~c | (b | a)).normalize()), "([([a] | [b])] | [c])")
+        self.assertEqual(str((~~~a).normalize()), "~[a]")
+
+    def test_normalize_constants(self):
+        a, b = Label("a"), Label("b")
+        never = (a & ~a).normalize()
+        always = (b | ~b).normalize()
+        self.assertEqual(str(never), "False")
+        self.assertEqual(str(always), "True")
+        self.assertFalse(never.matches(["a"]))
+        self.assertTrue(always.matches([]))
+        self.assertEqual((b & (a | ~a)).normalize(), b)
+        self.assertEqual(str(~(a & ~a)), "~[([a] & [~[a]])]")
+        self.assertTrue((~(a & ~a)).compile()([]))
+        self.assertFalse((a & b & ~a).compile()(["a", "b"]))
+
+    def test_normalize_matches(self):
+        rand = random.Random(2)
+        names = ["a", "b", "c"]
+        label_sets = []
+        for i in range(len(names) + 1):
+            label_sets.extend(list(combo) for combo in itertools.combinations(names, i))
+        for _ in range(300):
+            label_expr = random_label_expr(rand, 5, names)
+            normalized = label_expr.normalize()
+            self.assertEqual(normalized, label_expr)
+            self.assertEqual(normalized.normalize().canonical_key, normalized.canonical_key)
+            for labels in label_sets:
+                self.assertEqual(normalized.matches(labels), label_expr.matches(labels))
+
+    def test_normalize_deeply_nested(self):
+        label_expr = Label("0")
+        for i in range(1, 2000):
+            if i % 2:
+                label_expr = Label(str(i)) & label_expr
+            else:
+                label_expr = ~~(Label(str(i)) | label_expr)
+        self.assertEqual(label_expr.normalize(), label_expr)
+        self.assertEqual(hash(label_expr.normalize()), hash(label_expr))
+
+    def test_compile_shared_between_equal_expressions(self):
+        label_expr = Label("x") & ~Label("y")
+        self.assertIs(label_expr.compile(), (~~~Label("y") & Label("x")).compile())
@@ -0,0 +1,116 @@
+import itertools
+import random
+import sys
+from artisan.scheduler import Label, LabelIndex
+from artisan.worker import LocalWorker, WorkerGroup, WorkerPool
+from tests.test_label_expr import random_label_expr
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class LabeledWorker(object):
+    def __init__(self, *labels):
+        self.labels = set(labels)
+
+
+def _safe_close(worker):
+    try:
+        worker.close()
+    except Exception:
+        pass
+
+
+class TestLabelIndex(unittest.TestCase):
+    def test_find_label(self):
+        index = LabelIndex()
+        worker1 = LabeledWorker("a", "b")
+        worker2 = LabeledWorker("b")
+        index.add_worker(worker1)
+        index.add_worker(worker2)
+        self.assertEqual(index.find_workers(Label("a")), set([worker1]))
+        self.assertEqual(index.find_workers(Label("b")), set([worker1, worker2]))
+        self.assertEqual(index.find_workers(Label("c")), set())
+        self.assertEqual(index.workers_with_label("b"), set([worker1, worker2]))
+
+    def test_find_operators(self):
+        index = LabelIndex()
+        worker1 = LabeledWorker("a", "b")
+        worker2 = LabeledWorker("b", "c")
+        worker3 = LabeledWorker()
+        for worker in [worker1, worker2, worker3]:
+            index.add_worker(worker)
+        self.assertEqual(index.find_workers(Label("a") & Label("b")), set([worker1]))
+        self.assertEqual(index.find_workers(Label("a") | Label("c")), set([worker1, worker2]))
+        self.assertEqual(index.find_workers(~Label("b")), set([worker3]))
+        self.assertEqual(index.find_workers(Label("b") & ~Label("a")), set([worker2]))
+        self.assertEqual(index.find_workers("~a & ~c"), set([worker3]))
+
+    def test_find_matches(self):
+        rand = random.Random(0)
+        names = ["a", "b", "c", "d"]
+        index = LabelIndex()
+        workers = []
+        for i in range(len(names) + 1):
+            for combo in itertools.combinations(names, i):
+                worker = LabeledWorker(*combo)
+                index.add_worker(worker)
+                workers.append(worker)
+        for _ in range(200):
+            label_expr = random_label_expr(rand, 5, names)
+            expected = set(worker for worker in workers
+                           if label_expr.matches(list(worker.labels)))
+            self.assertEqual(index.find_workers(label_expr), expected)
+
+    def test_find_does_not_modify_index(self):
+        index = LabelIndex()
+        worker1 = LabeledWorker("a", "b")
+        worker2 = LabeledWorker("a")
+        index.add_worker(worker1)
+        index.add_worker(worker2)
+        index.find_workers(Label("a")).clear()
+        index.find_workers(Label("a") & Label("b"))
+        index.find_workers(Label("a") & ~Label("b"))
+        self.assertEqual(index.find_workers(Label("a")), set([worker1, worker2]))
+
+    def test_remove_and_update_worker(self):
+        index = LabelIndex()
+        worker = LabeledWorker("a")
+        index.add_worker(worker)
+        self.assertRaises(ValueError, index.add_worker, worker)
+        worker.labels = set(["b"])
+        index.update_worker(worker)
+        self.assertEqual(index.find_workers(Label("a")), set())
+        self.assertEqual(index.find_workers(Label("b")), set([worker]))
+        index.remove_worker(worker)
+        self.assertEqual(index.find_workers(Label("b")), set())
+        self.assertEqual(index.workers, set())
+        self.assertRaises(ValueError, index.remove_worker, worker)
+
+    def test_worker_group(self):
+        group = WorkerGroup()
+        worker1 = LocalWorker()
+        worker1.labels.add("gpu")
+        worker2 = LocalWorker()
+        self.addCleanup(_safe_close, worker1)
+        self.addCleanup(_safe_close, worker2)
+        group.add_worker(worker1)
+        group.add_worker(worker2)
+        self.assertEqual(group.find_workers("gpu"), set([worker1]))
+        self.assertEqual(group.find_workers("~gpu"), set([worker2]))
+        group.remove_worker(worker1)
+        self.assertEqual(group.find_workers("gpu"), set())
+
+    def test_worker_pool(self):
+        def step(worker):
+            worker.labels.add("linux")
+
+        pool = WorkerPool(2, LocalWorker)
+        pool.add_worker_setup_step(step)
+        worker = pool.acquire(0.1)
+        self.addCleanup(_safe_close, worker)
+        self.assertEqual(pool.find_workers(Label("linux")), set([worker]))
+        pool.release(worker)
+        self.assertEqual(pool.find_workers(Label("linux")), set())
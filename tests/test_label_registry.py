@@ -0,0 +1,102 @@
+import itertools
+import random
+import sys
+from artisan.compat import numpy
+from artisan.scheduler import Label, LabelRegistry
+from artisan.worker import LocalWorker
+from tests.test_label_expr import random_label_expr
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class TestLabelRegistry(unittest.TestCase):
+    def test_intern(self):
+        registry = LabelRegistry()
+        self.assertEqual(registry.intern("a"), 0)
+        self.assertEqual(registry.intern(Label("b")), 1)
+        self.assertEqual(registry.intern(Label("a")), 0)
+        self.assertEqual(registry.intern("b"), 1)
+        self.assertEqual(registry.labels, ["a", "b"])
+
+    def test_mask(self):
+        registry = LabelRegistry()
+        mask = registry.mask(["a", "c", Label("b")])
+        self.assertEqual(mask, 0b111)
+        self.assertEqual(registry.mask(["c"]), 0b010)
+        self.assertEqual(registry.mask([]), 0)
+        self.assertEqual(registry.mask_labels(mask), ["a", "c", "b"])
+
+    def test_compile_matches(self):
+        rand = random.Random(0)
+        registry = LabelRegistry()
+        names = ["a", "b", "c", "d"]
+        label_sets = []
+        for i in range(len(names) + 1):
+            label_sets.extend(list(combo) for combo in itertools.combinations(names, i))
+        for _ in range(200):
+            label_expr = random_label_expr(rand, 5, names)
+            evaluate = registry.compile(label_expr)
+            for labels in label_sets:
+                self.assertEqual(evaluate(registry.mask(labels)), label_expr.matches(labels))
+
+    def test_compile_deeply_nested(self):
+        registry = LabelRegistry()
+        label_expr = Label("0")
+        for i in range(1, 500):
+            if i % 2:
+                label_expr = Label(str(i)) & label_expr
+            else:
+                label_expr = ~(Label(str(i)) | label_expr)
+        evaluate = registry.compile(label_expr)
+        for labels in [[], ["0"], ["1", "3"], [str(i) for i in range(500)]]:
+            self.assertEqual(evaluate(registry.mask(labels)), label_expr.matches(labels))
+
+    def test_match_matrix(self):
+        rand = random.Random(1)
+        registry = LabelRegistry()
+        names = ["a", "b", "c", "d", "e"]
+        label_exprs = [random_label_expr(rand, 4, names) for _ in range(50)]
+        label_sets = [[name for name in names if rand.random() < 0.5] for _ in range(40)]
+        matrix = registry.match_matrix(label_exprs, label_sets)
+        self.assertEqual(len(matrix), len(label_exprs))
+        for row, label_expr in enumerate(label_exprs):
+            self.assertEqual(list(matrix[row]),
+                             [label_expr.matches(labels) for labels in label_sets])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed.")
+    def test_match_matrix_numpy(self):
+        registry = LabelRegistry()
+        matrix = registry.match_matrix([Label("a") & ~Label("b"), Label("c")],
+                                       [["a"], ["a", "b"], ["c"]])
+        self.assertIsInstance(matrix, numpy.ndarray)
+        self.assertEqual(matrix.shape, (2, 3))
+        self.assertEqual(matrix.tolist(), [[True, False, False], [False, False, True]])
+
+    def test_match_matrix_empty(self):
+        registry = LabelRegistry()
+        self.assertEqual(len(registry.match_matrix([], [["a"]])), 0)
+        self.assertEqual(len(registry.match_matrix([Label("a")], [])[0]), 0)
+
+    def test_match_workers(self):
+        registry = LabelRegistry()
+        worker1 = LocalWorker()
+        worker1.labels.update(["gpu", "linux"])
+        worker2 = LocalWorker()
+        worker2.labels.add("linux")
+        matrix = registry.match_workers([Label("gpu"), Label("linux") & ~Label("gpu")],
+                                        [worker1, worker2])
+        self.assertEqual([list(row) for row in matrix], [[True, False], [False, True]])
+
+    def test_match_matrix_equal_expressions(self):
+        registry = LabelRegistry()
+        a, b = Label("a"), Label("b")
+        matrix = registry.match_matrix([a & b, b & a, ~~a, a & ~a],
+                                       [["a"], ["a", "b"], []])
+        self.assertEqual([list(row) for row in matrix], [[False, True, False],
+                                                         [False, True, False],
+                                                         [True, True, False],
+                                                         [False, False, False]])
+        self.assertIs(registry.compile(a & b), registry.compile(b & a))
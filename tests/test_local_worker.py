@@ -1,4 +1,6 @@
 import sys
+import threading
+import time
 from tests.base_worker_test import _BaseWorkerTestCase, _safe_close
 from artisan.worker import LocalWorker, LocalCommand
 
@@ -19,3 +21,30 @@ class TestLocalWorker(unittest.TestCase, _BaseWorkerTestCase):
         worker = LocalWorker()
         self.addCleanup(_safe_close, worker)
         return worker
+
+    def test_completed_commands_pruned(self):
+        worker = self.make_worker()
+        for _ in range(100):
+            worker.execute("exit 0").wait(5.0)
+        self.assertLess(len(worker._commands), 64)
+
+    def test_iter_lines_streams_output(self):
+        worker = self.make_worker()
+        code = "import sys, time; print('a'); sys.stdout.flush(); time.sleep(1.0); print('b')"
+        command = worker.execute("%s -c \"%s\"" % (sys.executable, code))
+        self.addCleanup(command.wait, 5.0)
+        start_time = time.time()
+        lines = command.iter_lines(5.0)
+        self.assertEqual(next(lines).strip(), b'a')
+        self.assertLess(time.time() - start_time, 0.9)
+        self.assertEqual(next(lines).strip(), b'b')
+
+    def test_many_commands_few_threads(self):
+        worker = self.make_worker()
+        threads = threading.active_count()
+        commands = [worker.execute("sleep 0.2") for _ in range(50)]
+        if sys.version_info >= (3, 4) and sys.platform != "win32":
+            self.assertLessEqual(threading.active_count(), threads + 1)
+        for command in commands:
+            command.wait(5.0)
+            self.assertEqual(command.exit_status, 0)
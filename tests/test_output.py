@@ -0,0 +1,91 @@
+import sys
+from artisan.worker import OutputBuffer
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class TestOutputBuffer(unittest.TestCase):
+    def test_getvalue(self):
+        output = OutputBuffer()
+        self.assertEqual(output.getvalue(), b'')
+        output.append(b'a')
+        output.append(b'')
+        output.append(b'bc')
+        self.assertEqual(output.getvalue(), b'abc')
+        output.append(b'd')
+        self.assertEqual(output.getvalue(), b'abcd')
+        self.assertEqual(output.size, 4)
+
+    def test_subscribe(self):
+        output = OutputBuffer()
+        output.append(b'a')
+        subscriber = output.subscribe()
+        output.append(b'b')
+        self.assertEqual(list(subscriber), [b'a', b'b'])
+        output.unsubscribe(subscriber)
+        output.append(b'c')
+        self.assertEqual(list(subscriber), [b'a', b'b'])
+
+    def test_callback(self):
+        output = OutputBuffer()
+        chunks = []
+        output.add_callback(chunks.append)
+        output.append(b'a')
+        output.append(b'')
+        output.append(b'b')
+        self.assertEqual(chunks, [b'a', b'b'])
+
+    def test_not_retained(self):
+        output = OutputBuffer()
+        output.append(b'a')
+        output.retain = False
+        self.assertEqual(output.getvalue(), b'')
+        subscriber = output.subscribe()
+        output.append(b'b')
+        self.assertEqual(output.getvalue(), b'')
+        self.assertEqual(output.size, 0)
+        self.assertEqual(list(subscriber), [b'b'])
+
+    def test_limit(self):
+        output = OutputBuffer()
+        output.set_limit(4)
+        output.append(b'abc')
+        output.append(b'def')
+        self.assertEqual(output.getvalue(), b'cdef')
+        output.append(b'ghijkl')
+        self.assertEqual(output.getvalue(), b'ijkl')
+        self.assertEqual(output.size, 4)
+        self.assertEqual(output.total_size, 12)
+
+    def test_limit_existing_output(self):
+        output = OutputBuffer()
+        output.append(b'abcdef')
+        output.set_limit(2)
+        self.assertEqual(output.getvalue(), b'ef')
+
+    def test_limit_negative(self):
+        self.assertRaises(ValueError, OutputBuffer().set_limit, -1)
+
+    def test_spill(self):
+        output = OutputBuffer()
+        self.addCleanup(output.close)
+        output.append(b'ab')
+        output.set_limit(3, spill=True)
+        self.assertTrue(output.spilled)
+        output.append(b'cd')
+        self.assertEqual(output.getvalue(), b'abcd')
+        output.append(b'ef')
+        self.assertEqual(output.getvalue(), b'abcdef')
+        self.assertEqual(output.tail(), b'def')
+        self.assertEqual(output.size, 3)
+
+    def test_close_spill(self):
+        output = OutputBuffer()
+        output.set_limit(0, spill=True)
+        output.append(b'ab')
+        output.close()
+        self.assertFalse(output.spilled)
+        self.assertEqual(output.getvalue(), b'')
@@ -0,0 +1,113 @@
+import sys
+import threading
+from artisan.scheduler import (
+    ShardedJobQueue,
+    Job
+)
+from tests.test_job_queue import (
+    WeightedJob,
+    push_later,
+    reverse_weight_rule,
+    weight_rule
+)
+
+if sys.version_info >= (2, 7):
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class TestShardedJobQueue(unittest.TestCase):
+    def test_no_shards(self):
+        self.assertRaises(ValueError, ShardedJobQueue, 0)
+
+    def test_empty(self):
+        queue = ShardedJobQueue(4)
+        self.assertTrue(queue.empty)
+        queue.push_job(Job())
+        self.assertFalse(queue.empty)
+        queue.pop_job()
+        self.assertTrue(queue.empty)
+        self.assertIs(queue.pop_job(), None)
+        self.assertIs(queue.peek_job(), None)
+
+    def test_pop_ordering_across_shards(self):
+        queue = ShardedJobQueue(4)
+        queue.add_priority_rule(weight_rule)
+        for weight in [5, 3, 9, 1, 7, 2, 8]:
+            queue.push_job(WeightedJob(weight))
+        self.assertEqual([job.weight for job in queue.jobs], [9, 8, 7, 5, 3, 2, 1])
+        self.assertEqual(queue.peek_job().weight, 9)
+        self.assertEqual([queue.pop_job().weight for _ in range(7)], [9, 8, 7, 5, 3, 2, 1])
+
+    def test_equal_priority_fifo_across_shards(self):
+        queue = ShardedJobQueue(3)
+        jobs = [Job() for _ in range(10)]
+        for job in jobs:
+            queue.push_job(job)
+        for job in jobs:
+            self.assertIs(queue.pop_job(), job)
+
+    def test_push_jobs_pop_jobs(self):
+        queue = ShardedJobQueue(4)
+        queue.add_priority_rule(weight_rule)
+        queue.push_jobs(WeightedJob(weight) for weight in range(10))
+        self.assertEqual([job.weight for job in queue.pop_jobs(3)], [9, 8, 7])
+        self.assertEqual([job.weight for job in queue.pop_jobs(100)], [6, 5, 4, 3, 2, 1, 0])
+        self.assertEqual(queue.pop_jobs(1), [])
+
+    def test_reorder_rules(self):
+        queue = ShardedJobQueue(4)
+        queue.push_jobs(WeightedJob(weight) for weight in [1, 2, 3])
+        rule = queue.add_priority_rule(weight_rule)
+        self.assertEqual(queue.priority_rules, [rule])
+        self.assertEqual(queue.peek_job().weight, 3)
+        queue.remove_priority_rule(rule)
+        queue.add_priority_rule(reverse_weight_rule)
+        self.assertEqual(queue.peek_job().weight, 1)
+        self.assertRaises(ValueError, queue.remove_priority_rule, rule)
+
+    def test_pop_block_waits_for_push(self):
+        queue = ShardedJobQueue(4)
+        job = Job()
+        thread = push_later(queue, job, 0.1)
+        self.assertIs(queue.pop_job(block=True, timeout=5.0), job)
+        thread.join()
+
+    def test_pop_block_timeout(self):
+        queue = ShardedJobQueue(4)
+        self.assertIs(queue.pop_job(block=True, timeout=0.1), None)
+        self.assertEqual(queue.pop_jobs(2, block=True, timeout=0.1), [])
+
+    def test_many_producers_and_consumers(self):
+        queue = ShardedJobQueue(4)
+        jobs = [Job() for _ in range(2000)]
+        popped = []
+        popped_lock = threading.Lock()
+
+        def produce(start):
+            for job in jobs[start::4]:
+                queue.push_job(job)
+
+        def consume():
+            while True:
+                job = queue.pop_job(block=True, timeout=1.0)
+                if job is None:
+                    return
+                with popped_lock:
+                    popped.append(job)
+
+        consumers = [threading.Thread(target=consume) for _ in range(8)]
+        producers = [threading.Thread(target=produce, args=(i,)) for i in range(4)]
+        for thread in consumers + producers:
+            thread.start()
+        for thread in producers + consumers:
+            thread.join()
+        self.assertEqual(sorted(map(id, popped)), sorted(map(id, jobs)))
+
+    def test_peek_block_waits_for_push(self):
+        queue = ShardedJobQueue(2)
+        job = Job()
+        thread = push_later(queue, job, 0.1)
+        self.assertIs(queue.peek_job(block=True, timeout=5.0), job)
+        thread.join()
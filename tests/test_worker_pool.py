@@ -1,5 +1,8 @@
 import sys
-from artisan.worker import WorkerPool, LocalWorker
+import threading
+import time
+from artisan.scheduler import Label
+from artisan.worker import WorkerGroup, WorkerPool, LocalWorker
 
 if sys.version_info >= (2, 7):
     import unittest
@@ -15,6 +18,31 @@ def _safe_close(pool):
             pass
 
 
+class LiveWorkerFactory(object):
+    """ Builds LocalWorkers after `delay` seconds and counts
+    the most workers that have been open at once. """
+    def __init__(self, delay):
+        self.delay = delay
+        self.live = 0
+        self.max_live = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        worker = LocalWorker()
+        close = worker.close
+
+        def close_worker():
+            with self.lock:
+                self.live -= 1
+            close()
+        worker.close = close_worker
+        with self.lock:
+            self.live += 1
+            self.max_live = max(self.max_live, self.live)
+        return worker
+
+
 class TestWorkerPool(unittest.TestCase):
     def make_pool(self, max_workers=1):
         pool = WorkerPool(max_workers, lambda: LocalWorker())
@@ -119,3 +147,633 @@ class TestWorkerPool(unittest.TestCase):
         pool = self.make_pool(1)
         worker = pool.acquire(0.1)
         self.assertIs(worker.pool, pool)
+
+    def make_reuse_pool(self, max_workers=1, **kwargs):
+        pool = self.make_pool(max_workers)
+        pool.enable_worker_reuse(**kwargs)
+        self.addCleanup(pool.close_idle_workers)
+        return pool
+
+    def test_reuse_worker(self):
+        pool = self.make_reuse_pool(1)
+        worker1 = pool.acquire(0.1)
+        pool.release(worker1)
+        self.assertFalse(worker1.closed)
+        self.assertEqual(pool.workers_idle, 1)
+        self.assertEqual(pool.workers_free, 1)
+        worker2 = pool.acquire(0.1)
+        self.assertIs(worker1, worker2)
+        self.assertEqual(pool.workers_idle, 0)
+        self.assertIs(pool.acquire(0.1), None)
+
+    def test_reuse_most_recently_released(self):
+        pool = self.make_reuse_pool(2)
+        worker1 = pool.acquire(0.1)
+        worker2 = pool.acquire(0.1)
+        pool.release(worker1)
+        pool.release(worker2)
+        self.assertIs(pool.acquire(0.1), worker2)
+
+    def test_reuse_matching_label_expr(self):
+        pool = self.make_reuse_pool(2)
+        worker1 = pool.acquire(0.1)
+        worker2 = pool.acquire(0.1)
+        worker1.labels.add("linux")
+        pool.release(worker1)
+        pool.release(worker2)
+        self.assertIs(pool.acquire(0.1, label_expr="linux"), worker1)
+        pool.release(worker1)
+
+        # A new worker is created rather than acquiring one that doesn't match.
+        worker3 = pool.acquire(0.1, label_expr=Label("windows"))
+        self.assertNotIn(worker3, [worker1, worker2])
+        pool.release(worker3)
+
+    def test_find_idle_workers(self):
+        pool = self.make_reuse_pool(2)
+        worker1 = pool.acquire(0.1)
+        worker2 = pool.acquire(0.1)
+        worker1.labels.add("linux")
+        pool.release(worker1)
+        self.assertEqual(pool.find_idle_workers(Label("linux")), [worker1])
+        self.assertEqual(pool.find_idle_workers("~linux"), [])
+        pool.release(worker2)
+        self.assertEqual(pool.find_idle_workers("~linux"), [worker2])
+
+    def test_reuse_setup_once_cleanup_every_release(self):
+        calls = []
+        pool = self.make_reuse_pool(1)
+        pool.add_worker_setup_step(lambda w: calls.append("setup"))
+        pool.add_worker_cleanup_step(lambda w: calls.append("cleanup"))
+        for _ in range(3):
+            pool.release(pool.acquire(0.1))
+        self.assertEqual(calls, ["setup", "cleanup", "cleanup", "cleanup"])
+
+    def test_reuse_max_uses(self):
+        pool = self.make_reuse_pool(1, max_uses=2)
+        worker1 = pool.acquire(0.1)
+        pool.release(worker1)
+        self.assertIs(pool.acquire(0.1), worker1)
+        pool.release(worker1)
+        self.assertTrue(worker1.closed)
+        self.assertEqual(pool.workers_idle, 0)
+        self.assertIsNot(pool.acquire(0.1), worker1)
+
+    def test_reuse_max_idle_time(self):
+        pool = self.make_reuse_pool(1, max_idle_time=0.05)
+        worker1 = pool.acquire(0.1)
+        pool.release(worker1)
+        time.sleep(0.1)
+        worker2 = pool.acquire(0.1)
+        self.assertIsNot(worker1, worker2)
+        self.assertTrue(worker1.closed)
+
+    def test_reuse_health_check(self):
+        healthy = [False]
+        pool = self.make_reuse_pool(1, health_check=lambda w: healthy[0])
+        worker1 = pool.acquire(0.1)
+        pool.release(worker1)
+        worker2 = pool.acquire(0.1)
+        self.assertIsNot(worker1, worker2)
+        self.assertTrue(worker1.closed)
+        healthy[0] = True
+        pool.release(worker2)
+        self.assertIs(pool.acquire(0.1), worker2)
+
+    def test_reuse_health_check_raises(self):
+        def health_check(_):
+            raise RuntimeError()
+
+        pool = self.make_reuse_pool(1, health_check=health_check)
+        worker1 = pool.acquire(0.1)
+        pool.release(worker1)
+        self.assertIsNot(pool.acquire(0.1), worker1)
+        self.assertTrue(worker1.closed)
+
+    def test_reuse_closed_worker_not_reused(self):
+        pool = self.make_reuse_pool(1)
+        worker1 = pool.acquire(0.1)
+        worker1.close()
+        pool.release(worker1)
+        self.assertEqual(pool.workers_idle, 0)
+        self.assertIsNot(pool.acquire(0.1), worker1)
+
+    def test_close_idle_workers(self):
+        pool = self.make_reuse_pool(2)
+        workers = [pool.acquire(0.1), pool.acquire(0.1)]
+        for worker in workers:
+            pool.release(worker)
+        pool.close_idle_workers()
+        self.assertEqual(pool.workers_idle, 0)
+        self.assertTrue(all(worker.closed for worker in workers))
+
+    def wait_for_idle(self, pool, count, timeout=5.0):
+        end_time = time.time() + timeout
+        while pool.workers_idle < count and time.time() < end_time:
+            time.sleep(0.01)
+        self.assertEqual(pool.workers_idle, count)
+
+    def test_min_idle(self):
+        calls = []
+        pool = self.make_pool(3)
+        self.addCleanup(pool.close)
+        pool.add_worker_setup_step(lambda w: calls.append(w))
+        pool.set_min_idle(2, creation_interval=0.0)
+        self.wait_for_idle(pool, 2)
+        self.assertEqual(len(calls), 2)
+
+        worker = pool.acquire(0.1)
+        self.assertIn(worker, calls)
+        self.wait_for_idle(pool, 2)
+        self.assertEqual(len(calls), 3)
+
+        # Only one more worker fits in the pool.
+        pool.acquire(0.1)
+        time.sleep(0.1)
+        self.assertEqual(pool.workers_idle, 1)
+        self.assertEqual(len(calls), 3)
+
+    def test_min_idle_rate_limited(self):
+        pool = self.make_pool(5)
+        self.addCleanup(pool.close)
+        pool.set_min_idle(5, creation_interval=0.2)
+        time.sleep(0.1)
+        self.assertEqual(pool.workers_idle, 1)
+        self.wait_for_idle(pool, 2)
+
+    def test_min_idle_factory_fails(self):
+        attempts = []
+
+        def factory():
+            attempts.append(None)
+            if len(attempts) == 1:
+                raise RuntimeError()
+            return LocalWorker()
+
+        pool = WorkerPool(1, factory)
+        self.addCleanup(pool.close)
+        pool.set_min_idle(1, creation_interval=0.05)
+        self.wait_for_idle(pool, 1)
+        self.assertEqual(len(attempts), 2)
+
+    def test_min_idle_expired_replaced(self):
+        pool = self.make_pool(1)
+        self.addCleanup(pool.close)
+        pool.enable_worker_reuse(max_idle_time=0.1)
+        pool.set_min_idle(1, creation_interval=0.0)
+        self.wait_for_idle(pool, 1)
+        worker = pool._idle[0][0]
+        time.sleep(0.3)
+        self.assertTrue(worker.closed)
+        self.wait_for_idle(pool, 1)
+
+    def test_close(self):
+        pool = self.make_pool(2)
+        pool.set_min_idle(2, creation_interval=0.0)
+        self.wait_for_idle(pool, 2)
+        workers = [worker for worker, _ in pool._idle]
+        pool.close()
+        self.assertEqual(pool.workers_idle, 0)
+        self.assertTrue(all(worker.closed for worker in workers))
+        self.assertRaises(ValueError, pool.set_min_idle, 1)
+
+        worker = pool.acquire(0.1)
+        pool.release(worker)
+        self.assertTrue(worker.closed)
+
+    def test_min_idle_negative(self):
+        pool = self.make_pool(1)
+        self.assertRaises(ValueError, pool.set_min_idle, -1)
+
+    def test_acquire_builds_workers_in_parallel(self):
+        def factory():
+            time.sleep(0.2)
+            return LocalWorker()
+
+        def slow_step(_):
+            time.sleep(0.2)
+
+        pool = WorkerPool(4, factory)
+        self.addCleanup(_safe_close, pool)
+        pool.add_worker_setup_step(slow_step)
+        workers = []
+        threads = [threading.Thread(target=lambda: workers.append(pool.acquire(5.0)))
+                   for _ in range(4)]
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.time() - start_time, 1.0)
+        self.assertEqual(len(set(map(id, workers))), 4)
+        self.assertEqual(pool.workers_used, 4)
+
+    def test_release_not_blocked_by_factory(self):
+        building = threading.Event()
+
+        def factory():
+            if pool.workers_used:
+                building.set()
+                time.sleep(0.5)
+            return LocalWorker()
+
+        pool = WorkerPool(2, factory)
+        self.addCleanup(_safe_close, pool)
+        worker = pool.acquire(0.1)
+        thread = threading.Thread(target=pool.acquire)
+        thread.start()
+        self.assertTrue(building.wait(5.0))
+        start_time = time.time()
+        pool.release(worker)
+        self.assertLess(time.time() - start_time, 0.25)
+        thread.join()
+
+    def test_factory_error_releases_capacity(self):
+        def factory():
+            raise RuntimeError()
+
+        pool = WorkerPool(1, factory)
+        self.assertRaises(RuntimeError, pool.acquire, 0.1)
+        self.assertRaises(RuntimeError, pool.acquire, 0.1)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_setup_step_error_closes_worker(self):
+        workers = []
+
+        def step(worker):
+            workers.append(worker)
+            raise RuntimeError()
+
+        pool = self.make_pool(1)
+        pool.add_worker_setup_step(step)
+        self.assertRaises(RuntimeError, pool.acquire, 0.1)
+        self.assertTrue(workers[0].closed)
+        self.assertEqual(pool.workers_free, 1)
+
+    def test_min_idle_counts_workers_being_acquired(self):
+        factory = LiveWorkerFactory(0.2)
+        pool = WorkerPool(2, factory)
+        self.addCleanup(pool.close)
+        workers = []
+        threads = [threading.Thread(target=lambda: workers.append(pool.acquire()))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        pool.set_min_idle(2, creation_interval=0.0)
+        for thread in threads:
+            thread.join()
+        time.sleep(0.3)
+        self.assertEqual(factory.max_live, 2)
+        pool.release_many(workers)
+
+    def test_acquire_counts_workers_being_prewarmed(self):
+        factory = LiveWorkerFactory(0.2)
+        pool = WorkerPool(1, factory)
+        self.addCleanup(pool.close)
+        pool.set_min_idle(1, creation_interval=0.0)
+        time.sleep(0.05)
+        worker = pool.acquire()
+        time.sleep(0.3)
+        self.assertEqual(factory.max_live, 1)
+        pool.release(worker)
+
+    def test_acquire_label_expr_closes_idle_worker(self):
+        factory = LiveWorkerFactory(0.0)
+        pool = WorkerPool(2, factory)
+        pool.enable_worker_reuse()
+        self.addCleanup(pool.close)
+        worker1 = pool.acquire()
+        worker2 = pool.acquire()
+        pool.release(worker1)
+        pool.release(worker2)
+
+        # The oldest idle worker that doesn't match is closed.
+        worker3 = pool.acquire(label_expr=Label("linux"))
+        self.assertEqual(factory.max_live, 2)
+        self.assertTrue(worker1.closed)
+        self.assertFalse(worker2.closed)
+        self.assertEqual(pool.workers_idle, 1)
+        pool.release(worker3)
+
+    def test_min_idle_builds_in_parallel(self):
+        def factory():
+            time.sleep(0.3)
+            return LocalWorker()
+
+        pool = WorkerPool(3, factory)
+        self.addCleanup(pool.close)
+        pool.set_min_idle(3, creation_interval=0.0)
+        start_time = time.time()
+        self.wait_for_idle(pool, 3)
+        self.assertLess(time.time() - start_time, 0.8)
+
+    def test_resize_grow_wakes_waiter(self):
+        pool = self.make_pool(1)
+        worker = pool.acquire()
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire(5.0)))
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual(acquired, [])
+        pool.resize(2)
+        thread.join(5.0)
+        self.assertIsNotNone(acquired[0])
+        self.assertEqual(pool.workers_used, 2)
+        pool.release(acquired[0])
+        pool.release(worker)
+
+    def test_resize_shrink(self):
+        pool = self.make_pool(2)
+        worker1 = pool.acquire()
+        worker2 = pool.acquire()
+        pool.resize(1)
+        self.assertEqual(pool.workers_free, 0)
+        pool.release(worker1)
+        self.assertIsNone(pool.acquire(0.1))
+        pool.release(worker2)
+        worker3 = pool.acquire(0.1)
+        self.assertIsNotNone(worker3)
+        pool.release(worker3)
+
+    def test_resize_shrink_closes_idle_workers(self):
+        pool = self.make_reuse_pool(3)
+        workers = [pool.acquire() for _ in range(3)]
+        for worker in workers:
+            pool.release(worker)
+        self.assertEqual(pool.workers_idle, 3)
+        pool.resize(1)
+        self.assertEqual(pool.workers_idle, 1)
+        self.assertEqual(sum(1 for worker in workers if worker.closed), 2)
+
+    def test_resize_negative(self):
+        pool = self.make_pool(1)
+        self.assertRaises(ValueError, pool.resize, -1)
+
+    def start_waiter(self, pool, order, name, priority=0, tenant=None, timeout=5.0):
+        """ Starts a thread that acquires a worker, records `name` in
+        `order` and releases it, then waits until it's queued. """
+        waiting = len(pool._waiters)
+
+        def run():
+            worker = pool.acquire(timeout, priority=priority, tenant=tenant)
+            if worker is not None:
+                order.append(name)
+                pool.release(worker)
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.addCleanup(thread.join, 5.0)
+        end_time = time.time() + 5.0
+        while len(pool._waiters) == waiting and time.time() < end_time:
+            time.sleep(0.001)
+        self.assertEqual(len(pool._waiters), waiting + 1)
+        return thread
+
+    def test_acquire_priority_order(self):
+        pool = self.make_pool(1)
+        worker = pool.acquire()
+        order = []
+        threads = [self.start_waiter(pool, order, name, priority)
+                   for name, priority in [("low", 0), ("high1", 10),
+                                          ("medium", 5), ("high2", 10)]]
+        pool.release(worker)
+        for thread in threads:
+            thread.join(5.0)
+        self.assertEqual(order, ["high1", "high2", "medium", "low"])
+
+    def test_acquire_not_taken_by_new_caller(self):
+        pool = self.make_pool(1)
+        worker = pool.acquire()
+        order = []
+        thread = self.start_waiter(pool, order, "waiting")
+        pool.release(worker)
+        thread.join(5.0)
+        self.assertEqual(order, ["waiting"])
+
+    def test_acquire_tenant_fairness(self):
+        pool = self.make_pool(1)
+        pool.enable_tenant_fairness()
+        worker = pool.acquire()
+        order = []
+        threads = [self.start_waiter(pool, order, name, tenant=name[0])
+                   for name in ["a1", "a2", "a3", "b1", "b2", "c1"]]
+        pool.release(worker)
+        for thread in threads:
+            thread.join(5.0)
+        self.assertEqual(order, ["a1", "b1", "c1", "a2", "b2", "a3"])
+
+    def test_acquire_without_tenant_fairness_is_fifo(self):
+        pool = self.make_pool(1)
+        worker = pool.acquire()
+        order = []
+        threads = [self.start_waiter(pool, order, name, tenant=name[0])
+                   for name in ["a1", "a2", "b1"]]
+        pool.release(worker)
+        for thread in threads:
+            thread.join(5.0)
+        self.assertEqual(order, ["a1", "a2", "b1"])
+
+    def test_acquire_timeout_leaves_queue(self):
+        pool = self.make_pool(1)
+        worker = pool.acquire()
+        self.assertIsNone(pool.acquire(0.05, priority=3))
+        self.assertEqual(pool._waiters, [])
+        pool.release(worker)
+        self.assertIsNotNone(pool.acquire(0.0))
+
+    def test_acquire_stats(self):
+        pool = self.make_pool(1)
+        worker = pool.acquire()
+        self.assertIsNone(pool.acquire(0.0, priority=1))
+        order = []
+        thread = self.start_waiter(pool, order, "waiting", priority=1)
+        self.assertEqual(pool.acquire_stats[1].waiting, 1)
+        time.sleep(0.05)
+        pool.release(worker)
+        thread.join(5.0)
+
+        stats = pool.acquire_stats
+        self.assertEqual(stats[0].acquired, 1)
+        self.assertEqual(stats[0].max_wait_time, 0.0)
+        self.assertEqual(stats[1].acquired, 1)
+        self.assertEqual(stats[1].timed_out, 1)
+        self.assertEqual(stats[1].waiting, 0)
+        self.assertGreaterEqual(stats[1].max_wait_time, 0.04)
+        self.assertEqual(stats[1].total_wait_time, stats[1].max_wait_time)
+
+    def test_acquire_many(self):
+        pool = self.make_pool(3)
+        group = pool.acquire_many(3, 0.1)
+        self.assertIsInstance(group, WorkerGroup)
+        self.assertEqual(len(set(group.workers)), 3)
+        self.assertEqual(pool.workers_used, 3)
+        pool.release_many(group)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_acquire_many_invalid_count(self):
+        pool = self.make_pool(2)
+        self.assertRaises(ValueError, pool.acquire_many, 0)
+        self.assertRaises(ValueError, pool.acquire_many, 3)
+
+    def test_acquire_many_all_or_nothing(self):
+        pool = self.make_pool(3)
+        worker = pool.acquire()
+        self.assertIsNone(pool.acquire_many(3, 0.05))
+        self.assertEqual(pool.workers_used, 1)
+        self.assertEqual(pool._reserved, 1)
+        self.assertEqual(pool.workers_free, 2)
+        pool.release(worker)
+
+    def test_acquire_many_competing_groups(self):
+        pool = self.make_pool(3)
+        group1 = pool.acquire_many(2)
+        groups = []
+        thread = threading.Thread(target=lambda: groups.append(pool.acquire_many(2, 5.0)))
+        thread.start()
+        self.addCleanup(thread.join, 5.0)
+        end_time = time.time() + 5.0
+        while not pool._waiters and time.time() < end_time:
+            time.sleep(0.001)
+
+        # The waiting group doesn't hold the free worker and
+        # single acquires can't overtake it to take it either.
+        self.assertEqual(pool.workers_used, 2)
+        self.assertIsNone(pool.acquire(0.0))
+        pool.release_many(group1)
+        thread.join(5.0)
+        self.assertEqual(len(groups[0].workers), 2)
+        pool.release_many(groups[0])
+
+    def test_acquire_many_after_shrinking(self):
+        pool = self.make_pool(4)
+        worker = pool.acquire()
+        groups = []
+        thread = threading.Thread(target=lambda: groups.append(pool.acquire_many(4, 1.5)))
+        thread.start()
+        self.addCleanup(thread.join, 5.0)
+        end_time = time.time() + 5.0
+        while not pool._waiters and time.time() < end_time:
+            time.sleep(0.001)
+
+        # The group can't fit after shrinking so it doesn't block others.
+        pool.resize(2)
+        other_worker = pool.acquire(0.5)
+        self.assertIsNotNone(other_worker)
+        pool.release(other_worker)
+        thread.join(5.0)
+        self.assertEqual(groups, [None])
+        pool.release(worker)
+
+    def test_acquire_many_after_shrinking_and_growing(self):
+        pool = self.make_pool(4)
+        group = pool.acquire_many(2)
+        groups = []
+        thread = threading.Thread(target=lambda: groups.append(pool.acquire_many(3, 5.0)))
+        thread.start()
+        self.addCleanup(thread.join, 5.0)
+        end_time = time.time() + 5.0
+        while not pool._waiters and time.time() < end_time:
+            time.sleep(0.001)
+        pool.resize(2)
+        pool.resize(4)
+        pool.release_many(group)
+        thread.join(5.0)
+        self.assertEqual(len(groups[0].workers), 3)
+        pool.release_many(groups[0])
+
+    def test_acquire_many_reuses_idle_workers(self):
+        pool = self.make_reuse_pool(3)
+        worker = pool.acquire()
+        pool.release(worker)
+        group = pool.acquire_many(3)
+        self.assertIn(worker, group.workers)
+        pool.release_many(group)
+        self.assertEqual(pool.workers_idle, 3)
+
+    def test_acquire_many_builds_in_parallel(self):
+        def factory():
+            time.sleep(0.3)
+            return LocalWorker()
+
+        pool = WorkerPool(4, factory)
+        self.addCleanup(_safe_close, pool)
+        start_time = time.time()
+        group = pool.acquire_many(4)
+        self.assertLess(time.time() - start_time, 0.8)
+        self.assertEqual(len(set(group.workers)), 4)
+
+    def test_acquire_many_build_error(self):
+        lock = threading.Lock()
+        workers = []
+
+        def factory():
+            with lock:
+                if len(workers) == 2:
+                    raise RuntimeError()
+                worker = LocalWorker()
+                workers.append(worker)
+                return worker
+
+        pool = WorkerPool(3, factory)
+        self.assertRaises(RuntimeError, pool.acquire_many, 3)
+        self.assertTrue(all(worker.closed for worker in workers))
+        self.assertEqual(pool.workers_used, 0)
+        self.assertEqual(pool._reserved, 0)
+
+    def make_slot_pool(self, max_workers=2, slots=4):
+        pool = self.make_pool(max_workers)
+
+        def set_slots(worker):
+            worker.slots = slots
+        pool.add_worker_setup_step(set_slots)
+        return pool
+
+    def test_acquire_slot_packs_workers(self):
+        pool = self.make_slot_pool(2, slots=4)
+        workers = [pool.acquire_slot(timeout=0.1) for _ in range(4)]
+        self.assertEqual(len(set(workers)), 1)
+        self.assertEqual(pool.workers_used, 1)
+        worker = pool.acquire_slot(timeout=0.1)
+        self.assertIsNot(worker, workers[0])
+        self.assertEqual(pool.workers_used, 2)
+
+        for other_worker in workers:
+            pool.release_slot(other_worker)
+        self.assertEqual(pool.workers_used, 1)
+        pool.release_slot(worker)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_acquire_slot_best_fit(self):
+        pool = self.make_slot_pool(2, slots=4)
+        worker1 = pool.acquire_slot(3)
+        worker2 = pool.acquire_slot(2)
+        self.assertIsNot(worker1, worker2)
+        # Both workers fit a cost of one but `worker1` has less room.
+        self.assertIs(pool.acquire_slot(1, 0.1), worker1)
+        self.assertIs(pool.acquire_slot(2, 0.1), worker2)
+        self.assertIsNone(pool.acquire_slot(1, 0.05))
+
+    def test_acquire_slot_cost_above_slots(self):
+        pool = self.make_slot_pool(1, slots=2)
+        worker = pool.acquire_slot(5)
+        self.assertIsNone(pool.acquire_slot(1, 0.05))
+        pool.release_slot(worker, 5)
+        self.assertEqual(pool.workers_used, 0)
+
+    def test_acquire_slot_waits_for_slots(self):
+        pool = self.make_slot_pool(1, slots=2)
+        worker = pool.acquire_slot(2)
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire_slot(1, 5.0)))
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(acquired, [])
+        pool.release_slot(worker, 1)
+        thread.join(5.0)
+        self.assertIs(acquired[0], worker)
+
+    def test_acquire_slot_invalid(self):
+        pool = self.make_slot_pool(1)
+        self.assertRaises(ValueError, pool.acquire_slot, 0)
+        worker = pool.acquire()
+        self.assertRaises(ValueError, pool.release_slot, worker)